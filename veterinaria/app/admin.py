@@ -1,6 +1,109 @@
-from django.contrib import admin
-from .models import CITA_VETERINARIA, SERVICIO
+from django import forms
+from django.contrib import admin, messages
+from django.db import IntegrityError
+from django.shortcuts import redirect, render
+from django.urls import path
+
+from . import importar, pacientes
+from .models import AUDITORIA, CITA_VETERINARIA, DUEÑO, MASCOTA, MSG_CHOQUE, SERVICIO, choque_de_bloque
+
+
+class ImportarCitasForm(forms.Form):
+    archivo = forms.FileField(help_text="CSV o XLSX con las columnas de la exportación de citas.")
+
+
+class CitaAdmin(admin.ModelAdmin):
+    change_list_template = "admin/app/cita_veterinaria/change_list.html"
+
+    def get_urls(self):
+        urls = [
+            path("importar/", self.admin_site.admin_view(self.importar_view), name="app_cita_veterinaria_importar"),
+        ]
+        return urls + super().get_urls()
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        # CITA_VETERINARIA.clean() ya revisa el bloque; esto cubre a quien lo
+        # ocupó entre la validación y el INSERT
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except IntegrityError as e:
+            if not choque_de_bloque(e):
+                raise
+            messages.error(request, MSG_CHOQUE)
+            return redirect(request.get_full_path())
+
+    def importar_view(self, request):
+        if not self.has_add_permission(request):
+            messages.error(request, "No tienes permisos para importar citas.")
+            return redirect("admin:app_cita_veterinaria_changelist")
+
+        form = ImportarCitasForm(request.POST or None, request.FILES or None)
+        resultado = None
+        if request.method == "POST" and form.is_valid():
+            archivo = form.cleaned_data["archivo"]
+            resultado = importar.importar_citas(importar.leer_filas(archivo.file, archivo.name))
+            messages.success(
+                request,
+                f"{resultado['importadas']} de {resultado['leidas']} citas importadas, "
+                f"{len(resultado['rechazos'])} rechazadas.",
+            )
+
+        ctx = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Importar citas",
+            "form": form,
+            "resultado": resultado,
+            "rechazos": resultado["rechazos"][:500] if resultado else [],
+        }
+        return render(request, "admin/app/cita_veterinaria/importar.html", ctx)
+
+
+class ServicioAdmin(admin.ModelAdmin):
+    # Las llaves únicas sin acentos se validan en SERVICIO.clean()
+    list_display = ("nombre", "precio")
+    search_fields = ("nombre",)
+
+
+class BuscarNormalizadoMixin:
+    # search_fields van sobre las llaves normalizadas: "López" busca "lopez"
+    def get_search_results(self, request, queryset, search_term):
+        return super().get_search_results(request, queryset, pacientes.llave(search_term))
+
+
+class DueñoAdmin(BuscarNormalizadoMixin, admin.ModelAdmin):
+    list_display = ("nombre",)
+    search_fields = ("nombre_norm",)
+
+
+class MascotaAdmin(BuscarNormalizadoMixin, admin.ModelAdmin):
+    list_display = ("nombre", "especie", "dueño")
+    list_select_related = ("dueño",)
+    search_fields = ("nombre_norm", "dueño__nombre_norm")
+    autocomplete_fields = ("dueño",)
+
+
+class AuditoriaAdmin(admin.ModelAdmin):
+    # Solo lectura: la bitácora no se edita ni se borra
+    list_display = ("fecha", "modelo", "objeto_id", "accion", "usuario")
+    list_filter = ("modelo", "accion", "fecha")
+    search_fields = ("usuario", "=objeto_id")
+    date_hierarchy = "fecha"
+    readonly_fields = ("fecha", "modelo", "objeto_id", "accion", "cambios", "usuario")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 # Register your models here.
-admin.site.register(CITA_VETERINARIA)
-admin.site.register(SERVICIO)
\ No newline at end of file
+admin.site.register(CITA_VETERINARIA, CitaAdmin)
+admin.site.register(SERVICIO, ServicioAdmin)
+admin.site.register(DUEÑO, DueñoAdmin)
+admin.site.register(MASCOTA, MascotaAdmin)
+admin.site.register(AUDITORIA, AuditoriaAdmin)
@@ -0,0 +1,312 @@
+import atexit
+import contextvars
+import logging
+import queue
+import threading
+import time
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.utils import timezone
+
+# Bitácora de cambios de citas y servicios (tabla AUDITORIA, solo inserción).
+# Cada alta / cambio / baja arma un evento con el diff {campo: [antes, después]}
+# y, al hacer commit, lo deja en una cola en memoria con tope. Un hilo de
+# fondo la vacía en lotes (bulk_create en una transacción), así el POST no
+# paga un INSERT más. Los valores "antes" salen de lo que se leyó de la base
+# (from_db), sin consultas extra. Al salir el proceso se escribe lo pendiente.
+# Si la cola se llena: AUDITORIA_SI_LLENA = "esperar" (espera un poco y, si
+# sigue llena, escribe en el hilo del request: nada se pierde) o "descartar".
+
+logger = logging.getLogger(__name__)
+
+# Campos auditados por modelo (attname)
+CAMPOS = {
+    "cita_veterinaria": (
+        "nombre_dueño", "nombre_mascota", "especie", "fecha_cita", "motivo", "estatus", "servicio_id",
+    ),
+    "servicio": ("nombre", "precio", "descripcion"),
+}
+
+_usuario = contextvars.ContextVar("auditoria_usuario", default=None)
+
+_cola = None
+_hilo = None
+_alto = threading.Event()
+_lock = threading.Lock()
+_contadores = {"encolados": 0, "escritos": 0, "sincronos": 0, "descartados": 0, "fallidos": 0}
+
+
+def _opcion(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+# --- Captura ---
+
+def instantanea(obj):
+    """Valores auditados de `obj` que están cargados (para el "antes")."""
+    return {c: obj.__dict__[c] for c in CAMPOS[obj._meta.model_name] if c in obj.__dict__}
+
+
+def _normalizar(modelo, campo, valor):
+    # "350" y Decimal("350.00") son el mismo precio
+    if valor is None:
+        return None
+    return modelo._meta.get_field(campo).to_python(valor)
+
+
+def _diff(modelo, antes, despues):
+    cambios = {}
+    for campo, valor in despues.items():
+        if campo not in antes:
+            continue
+        a, d = _normalizar(modelo, campo, antes[campo]), _normalizar(modelo, campo, valor)
+        if a != d:
+            cambios[campo] = [a, d]
+    return cambios
+
+
+def _evento(modelo, objeto_id, accion, cambios):
+    return {
+        "fecha": timezone.now(),
+        "modelo": modelo._meta.model_name,
+        "objeto_id": objeto_id,
+        "accion": accion,
+        "cambios": cambios,
+        "usuario": _usuario_actual(),
+    }
+
+
+def _usuario_actual():
+    request = _usuario.get()
+    user = getattr(request, "user", None)
+    return user.get_username() if user is not None and user.is_authenticated else ""
+
+
+def registrar(obj, accion, using=None):
+    """Alta / cambio / baja de una instancia (ver signals.py)."""
+    if not _opcion("AUDITORIA_ACTIVA", True):
+        return
+    modelo = type(obj)
+    ahora = instantanea(obj)
+    if accion == "alta":
+        cambios = {c: [None, _normalizar(modelo, c, v)] for c, v in ahora.items()}
+    elif accion == "baja":
+        cambios = {c: [_normalizar(modelo, c, v), None] for c, v in ahora.items()}
+    else:
+        cambios = _diff(modelo, getattr(obj, "_auditoria", {}), ahora)
+        if not cambios:
+            return
+    obj._auditoria = ahora
+    _al_confirmar(_evento(modelo, obj.pk, accion, cambios), using)
+
+
+def registrar_cambios(modelo, antes, despues, using=None):
+    """Cambios de un update() masivo: antes / después = {pk: {campo: valor}}."""
+    if not _opcion("AUDITORIA_ACTIVA", True):
+        return
+    for pk, valores in despues.items():
+        cambios = _diff(modelo, antes.get(pk, {}), valores)
+        if cambios:
+            _al_confirmar(_evento(modelo, pk, "cambio", cambios), using)
+
+
+def _al_confirmar(evento, using):
+    # Solo lo que llega a la base: si la transacción se revierte no se audita
+    transaction.on_commit(partial(encolar, evento), using=using or DEFAULT_DB_ALIAS)
+
+
+# --- Cola y escritura ---
+
+def _obtener_cola():
+    global _cola
+    if _cola is None:
+        with _lock:
+            if _cola is None:
+                _cola = queue.Queue(maxsize=_opcion("AUDITORIA_COLA_MAX", 10000))
+    return _cola
+
+
+def encolar(evento):
+    cola = _obtener_cola()
+    try:
+        cola.put_nowait(evento)
+    except queue.Full:
+        if _opcion("AUDITORIA_SI_LLENA", "esperar") == "descartar":
+            _contar("descartados")
+            logger.warning("Cola de auditoría llena: se descartó un evento de %s %s",
+                           evento["modelo"], evento["objeto_id"])
+            return
+        try:
+            cola.put(evento, timeout=_opcion("AUDITORIA_ESPERA_SEGUNDOS", 0.05))
+        except queue.Full:
+            # El hilo no alcanza: este request escribe su propio evento
+            _contar("sincronos")
+            escribir([evento])
+            return
+    _contar("encolados")
+    _asegurar_hilo()
+
+
+def _contar(nombre, n=1):
+    with _lock:
+        _contadores[nombre] += n
+
+
+def escribir(lote):
+    from .models import AUDITORIA
+
+    for intento in range(3):
+        try:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                AUDITORIA.objects.using(DEFAULT_DB_ALIAS).bulk_create([AUDITORIA(**e) for e in lote])
+            _contar("escritos", len(lote))
+            return
+        except Exception:
+            if intento == 2:
+                _contar("fallidos", len(lote))
+                logger.exception("No se pudieron escribir %s eventos de auditoría", len(lote))
+                return
+            time.sleep(0.5 * (intento + 1))
+
+
+def _tomar_lote(cola, espera):
+    try:
+        lote = [cola.get(timeout=espera)]
+    except queue.Empty:
+        return []
+    tope = _opcion("AUDITORIA_LOTE", 500)
+    while len(lote) < tope:
+        try:
+            lote.append(cola.get_nowait())
+        except queue.Empty:
+            break
+    return lote
+
+
+def _trabajar():
+    cola = _obtener_cola()
+    while not _alto.is_set():
+        lote = _tomar_lote(cola, _opcion("AUDITORIA_INTERVALO_SEGUNDOS", 1.0))
+        if lote:
+            close_old_connections()
+            escribir(lote)
+    close_old_connections()
+
+
+def _asegurar_hilo():
+    global _hilo
+    if _hilo is not None or not _opcion("AUDITORIA_HILO", True):
+        return
+    with _lock:
+        if _hilo is None:
+            _alto.clear()
+            _hilo = threading.Thread(target=_trabajar, name="auditoria", daemon=True)
+            _hilo.start()
+            atexit.register(detener)
+
+
+def vaciar():
+    """Escribe en este hilo todo lo que hay en la cola. Regresa cuántos eventos."""
+    cola = _obtener_cola()
+    total = 0
+    while lote := _tomar_lote(cola, 0):
+        escribir(lote)
+        total += len(lote)
+    return total
+
+
+def detener(timeout=5):
+    """Para el hilo y escribe lo pendiente (se registra con atexit)."""
+    global _hilo
+    with _lock:
+        hilo, _hilo = _hilo, None
+    if hilo is not None:
+        _alto.set()
+        hilo.join(timeout)
+    vaciar()
+
+
+def reiniciar():
+    """Tira lo pendiente sin escribirlo y pone los contadores en cero (pruebas)."""
+    cola = _obtener_cola()
+    while _tomar_lote(cola, 0):
+        pass
+    with _lock:
+        for nombre in _contadores:
+            _contadores[nombre] = 0
+
+
+def estado():
+    # La cola primero: _obtener_cola también toma _lock (no es reentrante)
+    pendientes = _obtener_cola().qsize()
+    with _lock:
+        return dict(_contadores, pendientes=pendientes)
+
+
+def texto_prometheus():
+    # Contadores de este proceso, para /metricas/
+    datos = estado()
+    lineas = [
+        "# HELP veterinaria_auditoria_pendientes Eventos de auditoría en la cola.",
+        "# TYPE veterinaria_auditoria_pendientes gauge",
+        f"veterinaria_auditoria_pendientes {datos.pop('pendientes')}",
+        "# HELP veterinaria_auditoria_eventos_total Eventos de auditoría por resultado.",
+        "# TYPE veterinaria_auditoria_eventos_total counter",
+    ]
+    lineas += [f'veterinaria_auditoria_eventos_total{{resultado="{k}"}} {v}' for k, v in sorted(datos.items())]
+    return "\n".join(lineas) + "\n"
+
+
+# --- Consulta ---
+
+def historial(modelo=None, objeto_id=None, usuario=None, desde=None, hasta=None, accion=None):
+    """Eventos de la bitácora, del más reciente al más antiguo."""
+    from .models import AUDITORIA
+
+    qs = AUDITORIA.objects.order_by("-fecha", "-id")
+    if modelo:
+        qs = qs.filter(modelo=modelo)
+    if objeto_id is not None:
+        qs = qs.filter(objeto_id=objeto_id)
+    if usuario:
+        qs = qs.filter(usuario=usuario)
+    if accion:
+        qs = qs.filter(accion=accion)
+    if desde:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha__lt=hasta)
+    return qs
+
+
+# --- Usuario del request ---
+
+class AuditoriaMiddleware:
+    # Deja el request en un ContextVar para saber quién hizo el cambio
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _usuario.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _usuario.reset(token)
+
+    async def __acall__(self, request):
+        token = _usuario.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _usuario.reset(token)
@@ -0,0 +1,140 @@
+import hashlib
+import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Búsqueda de citas del lado de la base de datos.
+# Cada cita guarda en `busqueda` el texto normalizado (minúsculas y sin
+# acentos) de dueño, mascota, especie, estatus y nombre del servicio.
+# En SQLite ese texto además se indexa en una tabla FTS5 con tokenizer
+# trigram, que permite buscar subcadenas sin recorrer toda la tabla.
+
+FTS_TABLA = "app_cita_busqueda"
+# Lo mismo para los servicios, sobre `nombre_norm`
+FTS_SERVICIOS = "app_servicio_busqueda"
+MIN_TRIGRAMA = 3  # trigram no puede buscar términos más cortos
+# Mayor carácter posible: [texto, texto + FIN) es el rango de "empieza con"
+FIN = "\U0010ffff"
+
+_fts_disponible = {}  # tabla -> existe
+
+
+# Helper para filtrar
+def strip_accents(text):
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return text
+
+
+@lru_cache(maxsize=65536)
+def normalizar(texto):
+    return strip_accents((texto or "").lower()).strip()
+
+
+def hash_descripcion(descripcion):
+    # Llave única de la descripción de un servicio (texto de hasta 250): sha1
+    # del texto normalizado y con espacios simples; sin descripción no hay
+    # llave (NULL no choca)
+    texto = " ".join(normalizar(descripcion).split())
+    return hashlib.sha1(texto.encode()).hexdigest() if texto else None
+
+
+def texto_busqueda(nombre_dueño, nombre_mascota, especie, estatus, servicio_nombre):
+    partes = (nombre_dueño, nombre_mascota, especie, estatus, servicio_nombre)
+    return "\n".join(normalizar(p) for p in partes)
+
+
+def fts_disponible(tabla=FTS_TABLA):
+    if tabla not in _fts_disponible:
+        if connection.vendor != "sqlite":
+            _fts_disponible[tabla] = False
+        else:
+            with connection.cursor() as cur:
+                cur.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name=%s", [tabla]
+                )
+                _fts_disponible[tabla] = cur.fetchone() is not None
+    return _fts_disponible[tabla]
+
+
+def crear_fts(cursor, tabla=FTS_TABLA):
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla} USING fts5(busqueda, tokenize='trigram')"
+    )
+
+
+def borrar_fts(ids, using="default", tabla=FTS_TABLA):
+    if not ids or not fts_disponible(tabla):
+        return
+    with connections[using].cursor() as cur:
+        for i in range(0, len(ids), 500):
+            bloque = ids[i:i + 500]
+            cur.execute(
+                f"DELETE FROM {tabla} WHERE rowid IN ({', '.join(['%s'] * len(bloque))})", bloque
+            )
+
+
+def sincronizar_fts(pares, using="default", tabla=FTS_TABLA):
+    # pares: lista de (id, busqueda)
+    if not pares or not fts_disponible(tabla):
+        return
+    borrar_fts([pk for pk, _ in pares], using, tabla)
+    with connections[using].cursor() as cur:
+        cur.executemany(f"INSERT INTO {tabla}(rowid, busqueda) VALUES (%s, %s)", pares)
+
+
+def _coincide_fts(tabla, texto):
+    frase = '"' + texto.replace('"', '""') + '"'
+    return RawSQL(f"SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s", [frase])
+
+
+def filtrar_citas(qs, q):
+    q_normal = normalizar(q)
+    if not q_normal:
+        return qs
+    if fts_disponible() and len(q_normal) >= MIN_TRIGRAMA:
+        return qs.filter(id__in=_coincide_fts(FTS_TABLA, q_normal))
+    return qs.filter(busqueda__contains=q_normal)
+
+
+# Búsqueda de servicios: texto contra `nombre_norm`, números contra `precio`.
+# Con 3 letras o más busca la subcadena en el índice FTS5 de los nombres;
+# con menos (o sin FTS) busca los nombres que empiezan así, como rango sobre
+# el índice único de `nombre_norm`. Ninguno de los dos recorre la tabla.
+# Acepta "350", "<500", ">=200", "200-400" (también con "$" y comas).
+_RE_PRECIO = re.compile(r"^(<=|>=|<|>|=)?\s*\$?\s*(\d+(?:\.\d{1,2})?)$")
+_RE_RANGO = re.compile(r"^\$?\s*(\d+(?:\.\d{1,2})?)\s*-\s*\$?\s*(\d+(?:\.\d{1,2})?)$")
+_LOOKUPS = {"<": "lt", "<=": "lte", ">": "gt", ">=": "gte", "=": "exact", None: "exact"}
+
+
+def parsear_precio(q):
+    # Regresa un Q sobre `precio` o None si la búsqueda no es numérica
+    texto = q.replace(",", "").strip()
+    try:
+        m = _RE_RANGO.match(texto)
+        if m:
+            bajo, alto = sorted((Decimal(m.group(1)), Decimal(m.group(2))))
+            return Q(precio__gte=bajo, precio__lte=alto)
+        m = _RE_PRECIO.match(texto)
+        if m:
+            return Q(**{f"precio__{_LOOKUPS[m.group(1)]}": Decimal(m.group(2))})
+    except InvalidOperation:
+        pass
+    return None
+
+
+def filtrar_servicios(qs, q):
+    por_precio = parsear_precio(q)
+    if por_precio is not None:
+        return qs.filter(por_precio)
+    q_normal = normalizar(q)
+    if not q_normal:
+        return qs
+    if fts_disponible(FTS_SERVICIOS) and len(q_normal) >= MIN_TRIGRAMA:
+        return qs.filter(id__in=_coincide_fts(FTS_SERVICIOS, q_normal))
+    return qs.filter(nombre_norm__gte=q_normal, nombre_norm__lt=q_normal + FIN)
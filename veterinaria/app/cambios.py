@@ -0,0 +1,93 @@
+import base64
+
+from django.db import router
+from django.db.models import Q
+
+from .models import CITA_BORRADA, CITA_VETERINARIA, ultima_secuencia
+
+# Feed de cambios de citas.
+# Cada cita creada o modificada toma el siguiente número de una secuencia
+# global (columna indexada `secuencia`) y cada baja deja un registro en
+# CITA_BORRADA con su propio número (ver models.py). El cliente guarda un
+# token opaco y pide solo lo que cambió después: una consulta por índice
+# para las citas y otra para las bajas.
+# El token lleva (secuencia, id) de la última cita entregada, para poder
+# partir en páginas un lote con la misma secuencia (bulk_create / update),
+# y la última baja entregada. id = 0 quiere decir "toda esa secuencia".
+
+LIMITE = 500
+
+
+class TokenInvalido(ValueError):
+    pass
+
+
+def token(secuencia, cita_id, bajas):
+    texto = f"{secuencia}.{cita_id}.{bajas}"
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def leer_token(texto):
+    try:
+        relleno = "=" * (-len(texto) % 4)
+        secuencia, cita_id, bajas = (int(p) for p in base64.urlsafe_b64decode(texto + relleno).decode().split("."))
+    except (ValueError, UnicodeDecodeError):
+        raise TokenInvalido("Token de cambios inválido.")
+    if min(secuencia, cita_id, bajas) < 0:
+        raise TokenInvalido("Token de cambios inválido.")
+    return secuencia, cita_id, bajas
+
+
+def token_actual(using=None):
+    """Token que no trae nada de lo que ya existe (para la página recién cargada)."""
+    ultima = ultima_secuencia(using or router.db_for_read(CITA_VETERINARIA))
+    return token(ultima, 0, ultima)
+
+
+def _consultas(texto, limite):
+    secuencia, cita_id, bajas = leer_token(texto)
+    despues = Q(secuencia__gt=secuencia)
+    if cita_id:
+        # El >= de afuera deja que SQLite busque por rango en el índice
+        despues = Q(secuencia__gte=secuencia) & (despues | Q(id__gt=cita_id))
+    citas = (
+        CITA_VETERINARIA.objects.select_related("servicio")
+        .filter(despues)
+        .order_by("secuencia", "id")[:limite + 1]
+    )
+    borradas = CITA_BORRADA.objects.filter(secuencia__gt=bajas).order_by("secuencia").values_list("cita_id", "secuencia")
+    return (secuencia, cita_id, bajas), citas, borradas
+
+
+def _armar(inicio, citas, borradas, limite):
+    secuencia, cita_id, bajas = inicio
+    hay_mas = len(citas) > limite
+    citas = citas[:limite]
+    if citas:
+        ultima = citas[-1]
+        # Si la página se cortó, se sigue desde esta cita; si no, la secuencia ya está completa
+        secuencia, cita_id = ultima.secuencia, (ultima.pk if hay_mas else 0)
+    if borradas:
+        bajas = borradas[-1][1]
+    return {
+        "citas": citas,
+        "borradas": [pk for pk, _ in borradas],
+        "token": token(secuencia, cita_id, bajas),
+        "hay_mas": hay_mas,
+    }
+
+
+def cambios_desde(texto, limite=LIMITE):
+    """
+    Citas creadas o modificadas y ids borrados después del token `texto`.
+    Regresa {"citas", "borradas", "token", "hay_mas"}; con hay_mas hay que
+    volver a pedir con el token nuevo.
+    """
+    inicio, citas, borradas = _consultas(texto, limite)
+    return _armar(inicio, list(citas), list(borradas), limite)
+
+
+async def acambios_desde(texto, limite=LIMITE):
+    # Igual que cambios_desde, con el ORM asíncrono
+    inicio, citas, borradas = _consultas(texto, limite)
+    return _armar(inicio, [c async for c in citas], [b async for b in borradas], limite)
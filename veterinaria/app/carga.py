@@ -0,0 +1,475 @@
+import contextvars
+import http.client
+import io
+import json
+import multiprocessing
+import random
+import secrets
+import sys
+import threading
+import time
+from datetime import timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.models import Group, User
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.urls import reverse
+from django.utils import timezone
+
+from .disponibilidad import SLOTS
+from .models import CITA_VETERINARIA, DUEÑO, SERVICIO
+from .roles import ROLE_ADMIN, ROLE_EMP
+
+# Prueba de carga de un día de clínica contra la aplicación WSGI completa
+# (middlewares, sesiones, plantillas, base de datos), no contra vistas sueltas.
+# Cada cliente virtual es un hilo que repite acciones elegidas al azar según
+# los pesos del escenario (escenario_carga.json), con una pausa entre ellas.
+# Los clientes se pueden repartir en varios procesos. Se llama directo a
+# veterinaria.wsgi.application o se va por HTTP a un servidor local.
+# Resultado por nombre de URL: solicitudes/s, p50/p95/p99, códigos de
+# respuesta y cuántas veces la base respondió "database is locked".
+# Úsalo en una copia de la base: crea usuarios y citas (y los borra al final).
+
+PREFIJO = "Carga"  # dueño de las citas que crea la prueba (para limpiarlas)
+USUARIO = "carga_{grupo}_{n}"
+ROLES = {"Administrador": ROLE_ADMIN, "Empleado": ROLE_EMP}
+DIAS_ADELANTE = 3650  # las reservas van lejos de las citas reales
+POR_PROCESO = 10**6  # bloques reservables por proceso (no se enciman entre procesos)
+HOST = "localhost"
+
+ACCIONES_PUBLICAS = {"index"}
+ACCIONES_PERSONAL = {"panel", "buscar", "reservar", "estatus", "eliminar"}
+
+# Excepciones de los requests en curso (el handler las convierte en 500).
+# Una lista en un ContextVar: también la ven las vistas async (async_to_sync
+# copia el contexto, y la lista es la misma).
+_excepciones = contextvars.ContextVar("carga_excepciones", default=None)
+
+
+def _al_fallar(sender, **kwargs):
+    lista = _excepciones.get()
+    if lista is not None:
+        lista.append(sys.exc_info()[1])
+
+
+def es_bloqueo(error):
+    # SQLite: "database is locked" (o "database table is locked" en memoria compartida)
+    return isinstance(error, OperationalError) and "is locked" in str(error)
+
+
+# --- Escenario ---
+
+def cargar_escenario(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        escenario = json.load(f)
+    return validar_escenario(escenario)
+
+
+def validar_escenario(escenario):
+    escenario = {
+        "duracion_segundos": 30, "calentamiento_segundos": 2, "procesos": 1,
+        "busquedas": ["firulais"], **escenario,
+    }
+    if not escenario.get("clientes"):
+        raise ValueError("El escenario no tiene clientes.")
+    for grupo in escenario["clientes"]:
+        nombre = grupo.get("nombre", "?")
+        rol = grupo.get("rol")
+        if rol is not None and rol not in ROLES:
+            raise ValueError(f"{nombre}: rol desconocido {rol!r} (usa {', '.join(ROLES)} o null).")
+        permitidas = ACCIONES_PUBLICAS | (ACCIONES_PERSONAL if rol else set())
+        acciones = grupo.get("acciones") or {}
+        desconocidas = set(acciones) - permitidas
+        if desconocidas:
+            raise ValueError(f"{nombre}: acciones no válidas para rol={rol}: {', '.join(sorted(desconocidas))}.")
+        if not acciones or sum(acciones.values()) <= 0:
+            raise ValueError(f"{nombre}: sin acciones con peso.")
+        grupo.setdefault("cantidad", 1)
+        grupo.setdefault("pausa_ms", [0, 0])
+    return escenario
+
+
+# --- Clientes (con cookies y CSRF como un navegador) ---
+
+class _Cliente:
+    def __init__(self):
+        self.cookies = {}
+
+    def _encabezados(self, metodo):
+        encabezados = {"Accept": "text/html,application/json"}
+        if self.cookies:
+            encabezados["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if metodo == "POST" and "csrftoken" in self.cookies:
+            encabezados["X-CSRFToken"] = self.cookies["csrftoken"]
+        return encabezados
+
+    def _guardar_cookies(self, valores):
+        for valor in valores:
+            for nombre, morsel in SimpleCookie(valor).items():
+                if morsel["max-age"] == "0" or morsel.value == "":
+                    self.cookies.pop(nombre, None)
+                else:
+                    self.cookies[nombre] = morsel.value
+
+    def pedir(self, metodo, ruta, datos=None):
+        """Regresa (status, cuerpo, excepciones del request)."""
+        raise NotImplementedError
+
+
+class ClienteWSGI(_Cliente):
+    # Llama a la aplicación WSGI en este proceso
+    def __init__(self, aplicacion):
+        super().__init__()
+        self.aplicacion = aplicacion
+
+    def pedir(self, metodo, ruta, datos=None):
+        partes = urlsplit(ruta)
+        cuerpo = urlencode(datos or {}).encode()
+        environ = {
+            "REQUEST_METHOD": metodo, "PATH_INFO": partes.path, "QUERY_STRING": partes.query,
+            "SERVER_NAME": HOST, "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "REMOTE_ADDR": "127.0.0.1",
+            "CONTENT_TYPE": "application/x-www-form-urlencoded", "CONTENT_LENGTH": str(len(cuerpo)),
+            "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(cuerpo),
+            "wsgi.errors": sys.stderr, "wsgi.multithread": True, "wsgi.multiprocess": True, "wsgi.run_once": False,
+            "HTTP_HOST": HOST,
+        }
+        for nombre, valor in self._encabezados(metodo).items():
+            environ["HTTP_" + nombre.upper().replace("-", "_")] = valor
+
+        estado = {}
+
+        def start_response(status, headers, exc_info=None):
+            estado["status"] = int(status.split(" ", 1)[0])
+            estado["headers"] = headers
+
+        excepciones = []
+        token = _excepciones.set(excepciones)
+        try:
+            respuesta = self.aplicacion(environ, start_response)
+            try:
+                contenido = b"".join(respuesta)
+            finally:
+                # request_finished: cierra / recicla la conexión a la base
+                if hasattr(respuesta, "close"):
+                    respuesta.close()
+        finally:
+            _excepciones.reset(token)
+        self._guardar_cookies(v for k, v in estado["headers"] if k.lower() == "set-cookie")
+        return estado["status"], contenido, excepciones
+
+
+class ClienteHTTP(_Cliente):
+    # Va por HTTP a un servidor ya levantado (runserver, gunicorn, ...)
+    def __init__(self, url):
+        super().__init__()
+        partes = urlsplit(url)
+        self.host, self.puerto = partes.hostname, partes.port or 80
+
+    def pedir(self, metodo, ruta, datos=None):
+        cuerpo = urlencode(datos or {}).encode() if metodo == "POST" else None
+        encabezados = self._encabezados(metodo)
+        if cuerpo is not None:
+            encabezados["Content-Type"] = "application/x-www-form-urlencoded"
+        conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=60)
+        try:
+            conexion.request(metodo, ruta, body=cuerpo, headers=encabezados)
+            respuesta = conexion.getresponse()
+            contenido = respuesta.read()
+            self._guardar_cookies(respuesta.headers.get_all("Set-Cookie") or [])
+            return respuesta.status, contenido, []
+        finally:
+            conexion.close()
+
+
+# --- Cliente virtual ---
+
+class Visitante:
+    def __init__(self, cliente, grupo, usuario, contexto, rng, registrar):
+        self.cliente = cliente
+        self.grupo = grupo
+        self.usuario = usuario
+        self.ctx = contexto
+        self.rng = rng
+        self.registrar = registrar
+        self.mias = []  # citas que reservó y siguen Pendiente: (id, datos del formulario)
+        acciones = grupo["acciones"]
+        self.nombres, self.pesos = list(acciones), list(acciones.values())
+
+    def _pedir(self, nombre_url, metodo, ruta, datos=None):
+        inicio = time.perf_counter()
+        try:
+            status, cuerpo, excepciones = self.cliente.pedir(metodo, ruta, datos)
+        except (OSError, http.client.HTTPException) as e:
+            self.registrar(nombre_url, inicio, time.perf_counter() - inicio, 0, False, repr(e))
+            return 0, b""
+        bloqueo = any(es_bloqueo(e) for e in excepciones) or (status >= 500 and b"is locked" in cuerpo)
+        self.registrar(nombre_url, inicio, time.perf_counter() - inicio, status, bloqueo, None)
+        return status, cuerpo
+
+    def entrar(self):
+        ruta = reverse("login")
+        self._pedir("login", "GET", ruta)  # cookie csrftoken
+        status, _ = self._pedir("login", "POST", ruta, {"username": self.usuario[0], "password": self.usuario[1]})
+        return status == 302
+
+    def paso(self):
+        getattr(self, "accion_" + self.rng.choices(self.nombres, self.pesos)[0])()
+
+    def accion_index(self):
+        self._pedir("index", "GET", reverse("index"))
+
+    def accion_panel(self):
+        self._pedir("citas", "GET", reverse("citas"))
+
+    def accion_buscar(self):
+        self._pedir("citas", "GET", reverse("citas") + "?" + urlencode({"q": self.rng.choice(self.ctx["busquedas"])}))
+
+    def accion_reservar(self):
+        k = self.ctx["siguiente_bloque"]()
+        dia = self.ctx["primer_dia"] + timedelta(days=k // len(SLOTS))
+        dueño = f"{PREFIJO} {self.ctx['proceso']} {k}"
+        datos = {
+            "nombre_dueño": dueño, "nombre_mascota": self.rng.choice(["Firulais", "Luna", "Michi", "Rocky"]),
+            "especie_select": self.rng.choice(["Perro", "Gato"]), "fecha_cita": dia.isoformat(),
+            "hora_cita": SLOTS[k % len(SLOTS)], "motivo": "Prueba de carga",
+            "servicio": self.rng.choice(self.ctx["servicios"]),
+        }
+        status, _ = self._pedir("citas", "POST", reverse("citas"), datos)
+        if status != 302:
+            self.ctx["contar"]("reservas_rechazadas")
+            return
+        self.ctx["contar"]("reservas")
+        # Como en la pantalla: buscar la cita recién creada para tener su id
+        status, cuerpo = self._pedir("citas_lista", "GET", reverse("citas_lista") + "?" + urlencode({"q": dueño}))
+        if status == 200:
+            for c in json.loads(cuerpo)["citas"]:
+                if c["nombre_dueño"] == dueño.title():
+                    self.mias.append((c["id"], datos))
+
+    def _una_mia(self):
+        if not self.mias:
+            self.accion_reservar()
+            return None
+        return self.mias.pop(self.rng.randrange(len(self.mias)))
+
+    def accion_estatus(self):
+        cita = self._una_mia()
+        if cita:
+            pk, datos = cita
+            self._pedir("citas_edit", "POST", reverse("citas_edit", args=[pk]), {**datos, "estatus": "Cancelada"})
+
+    def accion_eliminar(self):
+        cita = self._una_mia()
+        if cita:
+            self._pedir("citas_eliminar", "GET", reverse("citas_eliminar", args=[cita[0]]))
+
+
+# --- Preparación y limpieza (ORM, misma base que el servidor) ---
+
+def preparar(escenario):
+    """Crea / actualiza los usuarios de la prueba. Regresa {grupo: [(usuario, contraseña)]}."""
+    usuarios = {}
+    for grupo in escenario["clientes"]:
+        if not grupo.get("rol"):
+            continue
+        rol = Group.objects.get_or_create(name=ROLES[grupo["rol"]])[0]
+        lista = usuarios[grupo["nombre"]] = []
+        for n in range(grupo["cantidad"]):
+            nombre = USUARIO.format(grupo=grupo["nombre"], n=n)
+            contraseña = secrets.token_urlsafe(12)
+            user = User.objects.get_or_create(username=nombre)[0]
+            user.set_password(contraseña)
+            user.save()
+            user.groups.set([rol])
+            lista.append((nombre, contraseña))
+    return usuarios
+
+
+def limpiar():
+    """Borra las citas, dueños / mascotas y usuarios que creó la prueba."""
+    CITA_VETERINARIA.objects.filter(nombre_dueño__startswith=PREFIJO + " ").delete()
+    for dueño in DUEÑO.objects.filter(nombre_norm__startswith=PREFIJO.lower() + " ", citas__isnull=True).distinct():
+        dueño.mascotas.all().delete()
+        dueño.delete()
+    User.objects.filter(username__startswith="carga_").delete()
+
+
+# --- Ejecución ---
+
+def _correr_proceso(escenario, asignados, usuarios, url, proceso, semilla):
+    """Corre los clientes `asignados` [(grupo, n)] en hilos; regresa (muestras, conteos)."""
+    if url:
+        def nuevo_cliente():
+            return ClienteHTTP(url)
+    else:
+        from veterinaria.wsgi import application
+
+        def nuevo_cliente():
+            return ClienteWSGI(application)
+        got_request_exception.connect(_al_fallar, dispatch_uid="carga")
+
+    muestras = []
+    conteos = {"reservas": 0, "reservas_rechazadas": 0, "logins_fallidos": 0}
+    candado = threading.Lock()
+    bloques = iter(range(proceso * POR_PROCESO, (proceso + 1) * POR_PROCESO))
+    contexto = {
+        "proceso": proceso,
+        "primer_dia": timezone.localdate() + timedelta(days=DIAS_ADELANTE),
+        "servicios": list(SERVICIO.objects.values_list("pk", flat=True)),
+        "busquedas": escenario["busquedas"],
+    }
+    connections.close_all()
+    if not contexto["servicios"]:
+        raise ValueError("No hay servicios; corre sembrar_datos primero.")
+
+    def siguiente_bloque():
+        with candado:
+            return next(bloques)
+
+    def contar(clave):
+        with candado:
+            conteos[clave] += 1
+
+    contexto.update(siguiente_bloque=siguiente_bloque, contar=contar)
+    arranque = time.perf_counter()
+    medir_desde = arranque + escenario["calentamiento_segundos"]
+    fin = medir_desde + escenario["duracion_segundos"]
+
+    def registrar(nombre, inicio, segundos, status, bloqueo, error):
+        if inicio >= medir_desde:
+            with candado:
+                muestras.append((nombre, segundos, status, bloqueo, error))
+
+    def cliente(grupo, n):
+        rng = random.Random(f"{semilla}-{proceso}-{grupo['nombre']}-{n}")
+        usuario = usuarios.get(grupo["nombre"], [None] * (n + 1))[n]
+        visitante = Visitante(nuevo_cliente(), grupo, usuario, contexto, rng, registrar)
+        pausa_min, pausa_max = grupo["pausa_ms"]
+        try:
+            if usuario and not visitante.entrar():
+                contar("logins_fallidos")
+                return
+            while time.perf_counter() < fin:
+                visitante.paso()
+                time.sleep(rng.uniform(pausa_min, pausa_max) / 1000)
+        finally:
+            connections.close_all()
+
+    hilos = [threading.Thread(target=cliente, args=(grupo, n), daemon=True) for grupo, n in asignados]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    if not url:
+        got_request_exception.disconnect(dispatch_uid="carga")
+        # Lo que quedó en la cola de auditoría se escribe antes de salir
+        from . import auditoria
+        auditoria.detener()
+    return muestras, conteos
+
+
+def _hijo(cola, *args):
+    try:
+        cola.put(("ok", _correr_proceso(*args)))
+    except Exception as e:  # el padre lo reporta
+        cola.put(("error", repr(e)))
+
+
+def correr(escenario, usuarios, url=None, semilla=0):
+    """Corre el escenario y regresa el resumen (ver resumir)."""
+    procesos = max(1, int(escenario["procesos"]))
+    todos = [(grupo, n) for grupo in escenario["clientes"] for n in range(grupo["cantidad"])]
+    repartos = [todos[i::procesos] for i in range(procesos)]
+
+    inicio = timezone.now()
+    if procesos == 1:
+        muestras, conteos = _correr_proceso(escenario, repartos[0], usuarios, url, 0, semilla)
+    else:
+        # fork: los hijos heredan Django ya configurado; sin conexiones abiertas
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        cola = contexto.Queue()
+        hijos = [
+            contexto.Process(target=_hijo, args=(cola, escenario, reparto, usuarios, url, i, semilla))
+            for i, reparto in enumerate(repartos)
+        ]
+        for h in hijos:
+            h.start()
+        muestras, conteos = [], {}
+        for _ in hijos:
+            estado, valor = cola.get()
+            if estado == "error":
+                raise RuntimeError(f"Falló un proceso de carga: {valor}")
+            muestras += valor[0]
+            for clave, n in valor[1].items():
+                conteos[clave] = conteos.get(clave, 0) + n
+        for h in hijos:
+            h.join()
+
+    return resumir(muestras, escenario["duracion_segundos"]) | {
+        "inicio": inicio.isoformat(),
+        "destino": url or "wsgi",
+        "procesos": procesos,
+        "clientes": {g["nombre"]: g["cantidad"] for g in escenario["clientes"]},
+        "escenario": escenario,
+        "conteos": conteos,
+    }
+
+
+# --- Resultados ---
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _estadisticas(muestras, duracion):
+    tiempos = [m[1] * 1000 for m in muestras]
+    estatus = {}
+    for m in muestras:
+        estatus[str(m[2])] = estatus.get(str(m[2]), 0) + 1
+    return {
+        "solicitudes": len(muestras),
+        "por_segundo": round(len(muestras) / duracion, 2),
+        "p50_ms": round(percentil(tiempos, 50), 2),
+        "p95_ms": round(percentil(tiempos, 95), 2),
+        "p99_ms": round(percentil(tiempos, 99), 2),
+        "max_ms": round(max(tiempos), 2),
+        "estatus": dict(sorted(estatus.items())),
+        "errores": sum(1 for m in muestras if m[2] == 0 or m[2] >= 500),
+        "bloqueos": sum(1 for m in muestras if m[3]),
+    }
+
+
+def resumir(muestras, duracion):
+    por_vista = {}
+    for m in muestras:
+        por_vista.setdefault(m[0], []).append(m)
+    return {
+        "duracion_segundos": duracion,
+        "total": _estadisticas(muestras, duracion) if muestras else {"solicitudes": 0},
+        "vistas": {nombre: _estadisticas(ms, duracion) for nombre, ms in sorted(por_vista.items())},
+    }
+
+
+def tabla(resultado, base=None):
+    """Líneas de texto con el resumen; con `base` (otra corrida) agrega la diferencia."""
+    lineas = [f"{'vista':<16}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errores':>9}{'bloqueos':>10}"]
+    filas = list(resultado["vistas"].items()) + [("TOTAL", resultado["total"])]
+    for nombre, r in filas:
+        if not r.get("solicitudes"):
+            continue
+        linea = (f"{nombre:<16}{r['por_segundo']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                 f"{r['p99_ms']:>9.1f}{r['errores']:>9}{r['bloqueos']:>10}")
+        anterior = (base or {}).get("vistas", {}).get(nombre) if nombre != "TOTAL" else (base or {}).get("total")
+        if anterior and anterior.get("solicitudes"):
+            linea += (f"   req/s {_cambio(anterior['por_segundo'], r['por_segundo'])}"
+                      f"  p95 {_cambio(anterior['p95_ms'], r['p95_ms'])}")
+        lineas.append(linea)
+    return lineas
+
+
+def _cambio(antes, despues):
+    return f"{(despues - antes) / antes * 100:+.0f}%" if antes else "n/a"
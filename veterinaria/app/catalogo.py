@@ -0,0 +1,135 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+# Versión del catálogo de servicios.
+# Es una marca de tiempo (ms) guardada en la base (fila única de
+# CATALOGO_VERSION) que se renueva en la misma transacción que guarda,
+# actualiza o borra un SERVICIO (ver signals.py y ServicioQuerySet). Todos
+# los procesos leen la misma y no cambia mientras el catálogo no cambie.
+# Sirve como llave del cache de la página pública y como ETag / Last-Modified.
+# Cada proceso la recuerda CATALOGO_VERSION_SEGUNDOS en su cache, así que
+# otro proceso ve un cambio a lo más esos segundos después.
+
+_VERSION_KEY = "catalogo:version"
+
+
+def _segundos():
+    return getattr(settings, "CATALOGO_CACHE_SEGUNDOS", 300)
+
+
+def _segundos_version():
+    return getattr(settings, "CATALOGO_VERSION_SEGUNDOS", 5)
+
+
+def _ahora():
+    return int(time.time() * 1000)
+
+
+def _leer():
+    from .models import CATALOGO_VERSION
+
+    v = CATALOGO_VERSION.objects.filter(pk=1).values_list("version", flat=True).first()
+    if v is None:
+        v = CATALOGO_VERSION.objects.get_or_create(pk=1, defaults={"version": _ahora()})[0].version
+    return v
+
+
+async def _aleer():
+    from .models import CATALOGO_VERSION
+
+    v = await CATALOGO_VERSION.objects.filter(pk=1).values_list("version", flat=True).afirst()
+    if v is None:
+        v = (await CATALOGO_VERSION.objects.aget_or_create(pk=1, defaults={"version": _ahora()}))[0].version
+    return v
+
+
+def version():
+    v = cache.get(_VERSION_KEY)
+    if v is None:
+        v = _leer()
+        cache.set(_VERSION_KEY, v, _segundos_version())
+    return v
+
+
+async def aversion():
+    v = await cache.aget(_VERSION_KEY)
+    if v is None:
+        v = await _aleer()
+        await cache.aset(_VERSION_KEY, v, _segundos_version())
+    return v
+
+
+def ultima_modificacion(v=None):
+    return datetime.fromtimestamp((v or version()) / 1000, tz=dt_timezone.utc)
+
+
+def invalidar(using=None):
+    """Renueva la versión; si la transacción se revierte, la versión también."""
+    from .models import CATALOGO_VERSION
+
+    using = using or DEFAULT_DB_ALIAS
+    # Siempre hacia adelante, aunque dos cambios caigan en el mismo milisegundo
+    nueva = Greatest(F("version") + 1, Value(_ahora()), output_field=models.BigIntegerField())
+    with transaction.atomic(using=using, savepoint=False):
+        if not CATALOGO_VERSION.objects.using(using).filter(pk=1).update(version=nueva):
+            CATALOGO_VERSION.objects.using(using).get_or_create(pk=1, defaults={"version": _ahora()})
+    transaction.on_commit(lambda: cache.delete(_VERSION_KEY), using=using)
+
+
+def _serializar(filas):
+    contenido = json.dumps(
+        {
+            "campos": ["id", "nombre", "precio", "descripcion"],
+            "servicios": [[pk, nombre, f"{precio:.2f}", desc or ""] for pk, nombre, precio, desc in filas],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+    return contenido, hashlib.sha256(contenido).hexdigest()[:16]
+
+
+def _filas():
+    from .models import SERVICIO
+
+    return SERVICIO.objects.order_by("nombre").values_list("id", "nombre", "precio", "descripcion")
+
+
+def servicios_y_json():
+    """
+    Servicios por nombre (dicts, para la página pública) y el JSON del
+    catálogo, con una sola consulta; el JSON queda en el cache de la versión.
+    """
+    filas = list(_filas())
+    datos = _serializar(filas)
+    cache.set(f"catalogo:json:{version()}", datos, _segundos())
+    return [dict(zip(("id", "nombre", "precio", "descripcion"), f)) for f in filas], datos
+
+
+def catalogo_json():
+    """
+    JSON compacto del catálogo para el cotizador y su hash de contenido.
+    Se arma una vez por versión del catálogo y se guarda en el cache.
+    """
+    key = f"catalogo:json:{version()}"
+    datos = cache.get(key)
+    if datos is None:
+        datos = _serializar(_filas())
+        cache.set(key, datos, _segundos())
+    return datos
+
+
+async def acatalogo_json():
+    key = f"catalogo:json:{await aversion()}"
+    datos = await cache.aget(key)
+    if datos is None:
+        datos = _serializar([f async for f in _filas()])
+        await cache.aset(key, datos, _segundos())
+    return datos
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CITA_VETERINARIA
+
+# Cierre automático de citas vencidas.
+# Las citas "Pendiente" cuya fecha ya pasó (más un periodo de gracia) se
+# marcan como "No asistió". Se recorren por cursor (fecha_cita, id) sobre el
+# índice parcial de pendientes y cada lote es un UPDATE en su propia
+# transacción corta, para no retener el candado de escritura de SQLite.
+
+ESTATUS_ABIERTA = "Pendiente"
+ESTATUS_CIERRE = "No asistió"
+CHUNK_SIZE = 500
+
+
+def limite(gracia_horas=None):
+    if gracia_horas is None:
+        gracia_horas = getattr(settings, "CIERRE_GRACIA_HORAS", 24)
+    return timezone.now() - timedelta(hours=gracia_horas)
+
+
+def cerrar_vencidas(gracia_horas=None, chunk_size=CHUNK_SIZE, dry_run=False, pausa=0):
+    """
+    Cierra las pendientes vencidas por lotes. Regresa estadísticas:
+    {"limite", "candidatas", "cerradas", "omitidas", "lotes", "primera", "ultima", "segundos"}.
+    `omitidas` son las que cambiaron de estatus entre la lectura y el UPDATE.
+    """
+    inicio = time.monotonic()
+    corte = limite(gracia_horas)
+    stats = {
+        "limite": corte, "candidatas": 0, "cerradas": 0, "omitidas": 0,
+        "lotes": 0, "primera": None, "ultima": None, "segundos": 0.0,
+    }
+    vencidas = CITA_VETERINARIA.objects.filter(estatus=ESTATUS_ABIERTA, fecha_cita__lt=corte)
+    cursor = None
+    while True:
+        qs = vencidas
+        if cursor is not None:
+            fecha, pk = cursor
+            qs = qs.filter(Q(fecha_cita__gt=fecha) | Q(fecha_cita=fecha, id__gt=pk))
+        lote = list(qs.order_by("fecha_cita", "id").values_list("fecha_cita", "id")[:chunk_size])
+        if not lote:
+            break
+        cursor = lote[-1]
+        stats["lotes"] += 1
+        stats["candidatas"] += len(lote)
+        stats["primera"] = stats["primera"] or lote[0][0]
+        stats["ultima"] = lote[-1][0]
+        if dry_run:
+            continue
+
+        with transaction.atomic():
+            # Se vuelve a exigir "Pendiente" por si alguien la cambió mientras tanto
+            cerradas = CITA_VETERINARIA.objects.filter(
+                pk__in=[pk for _, pk in lote], estatus=ESTATUS_ABIERTA
+            ).update(estatus=ESTATUS_CIERRE)
+        stats["cerradas"] += cerradas
+        stats["omitidas"] += len(lote) - cerradas
+        if pausa:
+            # Deja pasar a otros escritores entre lotes
+            time.sleep(pausa)
+
+    stats["segundos"] = time.monotonic() - inicio
+    return stats
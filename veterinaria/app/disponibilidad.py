@@ -0,0 +1,182 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.utils import timezone
+
+# Motor de disponibilidad de horarios.
+# Por cada servicio y día se guarda un entero (bitmap): el bit i está
+# encendido si el bloque de 30 minutos número i (08:00 = bit 0) ya está
+# ocupado. Los bitmaps salen de una sola consulta por rango de fechas y se
+# guardan en el cache hasta que una cita se crea, se mueve o se cancela.
+
+HORA_INICIO = "08:00"
+HORA_FIN = "18:00"
+ESTATUS_LIBERA = ("Cancelada",)  # estatus que no ocupan el bloque
+MAX_DIAS = 62
+CACHE_SEGUNDOS = 60 * 60
+
+_VERSION_KEY = "disp:version"
+
+
+# Helpers de tiempo para el select de las horas cada media.
+@lru_cache(maxsize=None)
+def build_half_hour_slots(start=HORA_INICIO, end=HORA_FIN):
+    t0 = datetime.strptime(start, "%H:%M")
+    t1 = datetime.strptime(end, "%H:%M")
+    out = []
+    t = t0
+    while t <= t1:
+        out.append(t.strftime("%H:%M"))
+        t += timedelta(minutes=30)
+    return tuple(out)
+
+def floor_to_half_hour(dt):
+    minute = 0 if dt.minute < 30 else 30
+    return dt.replace(minute=minute, second=0, microsecond=0)
+
+def ceil_to_half_hour(dt):
+    m = dt.minute
+    if m in (0, 30):
+        return dt.replace(second=0, microsecond=0)
+    if m < 30:
+        return dt.replace(minute=30, second=0, microsecond=0)
+    return (dt + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+
+
+SLOTS = build_half_hour_slots()
+_INDICE = {h: i for i, h in enumerate(SLOTS)}
+
+
+def indice_slot(dt):
+    # Índice del bloque (en hora local) o None si cae fuera del horario
+    local = floor_to_half_hour(timezone.localtime(dt))
+    return _INDICE.get(local.strftime("%H:%M"))
+
+
+def _inicio_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min), timezone.get_current_timezone())
+
+
+def _version():
+    return cache.get(_VERSION_KEY, 0)
+
+
+def _key(version, servicio_id, dia):
+    return f"disp:{version}:{servicio_id}:{dia.isoformat()}"
+
+
+def _dias(desde, hasta):
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+def _ocupadas(servicio_id, faltan):
+    # Fechas de las citas activas en los días que no estaban en cache
+    from .models import CITA_VETERINARIA
+
+    return (
+        CITA_VETERINARIA.objects
+        .filter(
+            servicio_id=servicio_id,
+            fecha_cita__gte=_inicio_dia(faltan[0]),
+            fecha_cita__lt=_inicio_dia(faltan[-1] + timedelta(days=1)),
+        )
+        .exclude(estatus__in=ESTATUS_LIBERA)
+        .values_list("fecha_cita", flat=True)
+    )
+
+
+def _llenar(faltan, fechas):
+    nuevos = {d: 0 for d in faltan}
+    for fecha in fechas:
+        dia = timezone.localtime(fecha).date()
+        i = indice_slot(fecha)
+        if dia in nuevos and i is not None:
+            nuevos[dia] |= 1 << i
+    return nuevos
+
+
+def bitmaps(servicio_id, desde, hasta):
+    """
+    Regresa {fecha: bitmap} para cada día de [desde, hasta] del servicio.
+    Lo que no está en cache se calcula con una sola consulta por rango.
+    """
+    version = _version()
+    keys = {_key(version, servicio_id, d): d for d in _dias(desde, hasta)}
+    resultado = {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+
+    faltan = [d for d in keys.values() if d not in resultado]
+    if faltan:
+        nuevos = _llenar(faltan, _ocupadas(servicio_id, faltan).iterator())
+        cache.set_many({_key(version, servicio_id, d): b for d, b in nuevos.items()}, CACHE_SEGUNDOS)
+        resultado.update(nuevos)
+    return resultado
+
+
+async def abitmaps(servicio_id, desde, hasta):
+    # Versión asíncrona de bitmaps (cache y ORM async)
+    version = await cache.aget(_VERSION_KEY, 0)
+    keys = {_key(version, servicio_id, d): d for d in _dias(desde, hasta)}
+    resultado = {keys[k]: v for k, v in (await cache.aget_many(list(keys))).items()}
+
+    faltan = [d for d in keys.values() if d not in resultado]
+    if faltan:
+        nuevos = _llenar(faltan, [f async for f in _ocupadas(servicio_id, faltan).aiterator()])
+        await cache.aset_many({_key(version, servicio_id, d): b for d, b in nuevos.items()}, CACHE_SEGUNDOS)
+        resultado.update(nuevos)
+    return resultado
+
+
+def _libres(mapas, servicio_id, excluir):
+    if excluir is not None and excluir.servicio_id == servicio_id and excluir.estatus not in ESTATUS_LIBERA:
+        dia = timezone.localtime(excluir.fecha_cita).date()
+        i = indice_slot(excluir.fecha_cita)
+        if dia in mapas and i is not None:
+            mapas[dia] &= ~(1 << i)
+
+    ahora = timezone.localtime()
+    hoy = ahora.date()
+    libres = {}
+    for dia, ocupado in sorted(mapas.items()):
+        if dia < hoy:
+            libres[dia.isoformat()] = []
+            continue
+        horas = [h for i, h in enumerate(SLOTS) if not ocupado & (1 << i)]
+        if dia == hoy:
+            actual = ahora.strftime("%H:%M")
+            horas = [h for h in horas if h > actual]
+        libres[dia.isoformat()] = horas
+    return libres
+
+
+def slots_libres(servicio_id, desde, hasta, excluir=None):
+    """
+    {fecha_iso: [horas libres]} para el rango. `excluir` es una cita (la que
+    se está editando) cuyo bloque se cuenta como libre.
+    """
+    return _libres(bitmaps(servicio_id, desde, hasta), servicio_id, excluir)
+
+
+async def aslots_libres(servicio_id, desde, hasta, excluir=None):
+    return _libres(await abitmaps(servicio_id, desde, hasta), servicio_id, excluir)
+
+
+def invalidar(servicio_id, fecha):
+    if servicio_id is None or fecha is None:
+        return
+    dia = timezone.localtime(fecha).date()
+    cache.delete(_key(_version(), servicio_id, dia))
+
+
+def invalidar_todo():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+
+
+def parsear_dia(valor, default=None):
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,179 @@
+import gzip
+import io
+import json
+import mimetypes
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Pipeline de archivos estáticos, integrado a collectstatic:
+#  - nombres con hash del contenido (ManifestStaticFilesStorage), así cada
+#    archivo se puede mandar con cache "immutable";
+#  - variantes WebP/AVIF de las imágenes en varios anchos (Pillow), que la
+#    etiqueta {% imagen_responsiva %} pone en srcset/sizes;
+#  - copias .gz (y .br si está instalado el paquete brotli) de CSS/JS/SVG.
+# Sin manifest (desarrollo, o pruebas sin collectstatic) se usan los nombres
+# originales y las plantillas mandan la imagen original.
+
+IMAGENES = {".jpg", ".jpeg", ".png", ".webp", ".avif"}
+COMPRIMIBLES = {".css", ".js", ".svg", ".json", ".txt", ".map"}
+CALIDAD = {"avif": 55, "webp": 80}
+ARCHIVO_VARIANTES = "variantes.json"
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class EstaticosStorage(ManifestStaticFilesStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.variantes = self._cargar_variantes()
+
+    # --- Nombres con hash ---
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # Todavía no se corre collectstatic: nombre original
+            return name
+        return super().stored_name(name)
+
+    def es_inmutable(self, name):
+        """True si `name` es un archivo con hash (su contenido nunca cambia)."""
+        if not hasattr(self, "_inmutables"):
+            self._inmutables = set(self.hashed_files.values()) - set(self.hashed_files)
+        return name in self._inmutables
+
+    # --- Variantes de imágenes ---
+
+    def _cargar_variantes(self):
+        try:
+            with self.manifest_storage.open(ARCHIVO_VARIANTES) as f:
+                return json.loads(f.read().decode())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def srcset(self, name):
+        """{formato: "url 480w, url 960w"} de las variantes de `name`."""
+        resultado = {}
+        for formato, anchos in self.variantes.get(name, {}).items():
+            resultado[formato] = ", ".join(f"{self.url(variante)} {ancho}w" for ancho, variante in anchos)
+        return resultado
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Primero el hash de los originales (y el url() de los CSS) y el manifest
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        self.variantes = {}
+        carpetas = tuple(getattr(settings, "ESTATICOS_CARPETAS_IMAGENES", ("img/",)))
+        for name in sorted(paths):
+            if name.startswith(carpetas) and posixpath.splitext(name)[1].lower() in IMAGENES:
+                for variante, hashed in self._generar_variantes(name):
+                    yield variante, hashed, True
+        self.manifest_storage._save(ARCHIVO_VARIANTES, ContentFile(json.dumps(self.variantes).encode()))
+        self.save_manifest()
+
+        for hashed in sorted(set(self.hashed_files.values())):
+            if posixpath.splitext(hashed)[1].lower() in COMPRIMIBLES:
+                self._comprimir(hashed)
+        self.__dict__.pop("_inmutables", None)
+
+    def _generar_variantes(self, name):
+        from PIL import Image, ImageOps, features
+
+        formatos = [f for f in getattr(settings, "ESTATICOS_FORMATOS", ("avif", "webp")) if features.check(f)]
+        anchos = getattr(settings, "ESTATICOS_ANCHOS", (480, 960, 1600))
+        with self.open(self.hashed_files[self.hash_key(name)]) as f:
+            original = ImageOps.exif_transpose(Image.open(f))
+            original.load()
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info or "A" in original.mode else "RGB")
+
+        # Un ancho mayor que el original no aporta nada: se topa en el original
+        for ancho in sorted({min(a, original.width) for a in anchos}):
+            alto = max(1, round(original.height * ancho / original.width))
+            imagen = original if ancho == original.width else original.resize((ancho, alto), Image.LANCZOS)
+            for formato in formatos:
+                buffer = io.BytesIO()
+                imagen.save(buffer, format=formato.upper(), quality=CALIDAD[formato])
+                contenido = ContentFile(buffer.getvalue())
+                # img/a.jpg -> img/a.jpg-480.webp (a.jpg y a.png no chocan)
+                variante = f"{name}-{ancho}.{formato}"
+                hashed = self.hashed_name(variante, contenido)
+                if self.exists(hashed):
+                    self.delete(hashed)
+                self._save(hashed, contenido)
+                self.hashed_files[self.hash_key(variante)] = hashed
+                self.variantes.setdefault(name, {}).setdefault(formato, []).append([ancho, variante])
+                yield variante, hashed
+
+    def _comprimir(self, name):
+        with self.open(name) as f:
+            contenido = f.read()
+        copias = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+        brotli = _brotli()
+        if brotli is not None:
+            copias[".br"] = brotli.compress(contenido, quality=11)
+        for sufijo, comprimido in copias.items():
+            # Si no ahorra nada no vale la pena mandarlo comprimido
+            if len(comprimido) < len(contenido):
+                if self.exists(name + sufijo):
+                    self.delete(name + sufijo)
+                self._save(name + sufijo, ContentFile(comprimido))
+
+
+# Codificación -> sufijo del archivo precomprimido, en orden de preferencia
+CODIFICACIONES = (("br", ".br"), ("gzip", ".gz"))
+
+
+@require_safe
+def servir(request, path):
+    """
+    Sirve STATIC_ROOT con la copia precomprimida que acepte el cliente y
+    cache immutable para los archivos con hash. Detrás de nginx conviene
+    servir STATIC_ROOT directo (gzip_static / brotli_static) con los mismos
+    headers; esta vista cubre los despliegues sin servidor de estáticos.
+    """
+    raiz = Path(settings.STATIC_ROOT).resolve()
+    archivo = (raiz / path).resolve()
+    if raiz not in archivo.parents or not archivo.is_file():
+        if settings.DEBUG:
+            from django.contrib.staticfiles.views import serve
+            return serve(request, path)
+        raise Http404("Archivo no encontrado")
+
+    tipo, _ = mimetypes.guess_type(archivo.name)
+    aceptadas = request.headers.get("Accept-Encoding", "")
+    servido, codificacion = archivo, None
+    if posixpath.splitext(path)[1].lower() in COMPRIMIBLES:
+        for nombre, sufijo in CODIFICACIONES:
+            comprimido = archivo.with_name(archivo.name + sufijo)
+            if nombre in aceptadas and comprimido.is_file():
+                servido, codificacion = comprimido, nombre
+                break
+
+    response = FileResponse(servido.open("rb"), filename=archivo.name, content_type=tipo or "application/octet-stream")
+    if codificacion:
+        response["Content-Encoding"] = codificacion
+    if posixpath.splitext(path)[1].lower() in COMPRIMIBLES:
+        patch_vary_headers(response, ["Accept-Encoding"])
+    response["Last-Modified"] = http_date(archivo.stat().st_mtime)
+    inmutable = getattr(staticfiles_storage, "es_inmutable", None)
+    if inmutable and inmutable(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "public, max-age=0, must-revalidate"
+    return response
@@ -0,0 +1,174 @@
+import csv
+import os
+import re
+import zipfile
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import CITA_VETERINARIA
+
+# Exportación de citas (CSV / XLSX) con memoria acotada: las filas se leen
+# con .iterator() por bloques y se escriben conforme llegan. El XLSX se arma
+# a mano (zip sin seek) para poder mandarlo mientras se genera: openpyxl, aun
+# en modo write-only, junta la hoja en un temporal y la comprime hasta el final.
+
+CHUNK_SIZE = 2000
+ENCABEZADOS = ["ID", "Fecha", "Dueño", "Mascota", "Especie", "Motivo", "Estatus", "Servicio", "Precio"]
+
+
+def citas_para_exportar(desde=None, hasta=None, estatus=None, servicio_id=None):
+    tz = timezone.get_current_timezone()
+    qs = CITA_VETERINARIA.objects.all()
+    if desde:
+        qs = qs.filter(fecha_cita__gte=timezone.make_aware(datetime.combine(desde, time.min), tz))
+    if hasta:
+        qs = qs.filter(fecha_cita__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min), tz))
+    if estatus:
+        qs = qs.filter(estatus=estatus)
+    if servicio_id:
+        qs = qs.filter(servicio_id=servicio_id)
+    return qs.order_by("fecha_cita", "id").values_list(
+        "id", "fecha_cita", "nombre_dueño", "nombre_mascota", "especie",
+        "motivo", "estatus", "servicio__nombre", "servicio__precio",
+    )
+
+
+def _filas(qs, chunk_size=CHUNK_SIZE):
+    for pk, fecha, dueño, mascota, especie, motivo, estatus, servicio, precio in qs.iterator(chunk_size=chunk_size):
+        yield [
+            pk, timezone.localtime(fecha).replace(tzinfo=None), dueño, mascota, especie,
+            motivo, estatus, servicio or "", precio,
+        ]
+
+
+class _Eco:
+    # Pseudo-buffer: csv.writer escribe y regresamos la línea tal cual
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(qs, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Eco())
+    yield "\ufeff"  # BOM para que Excel reconozca UTF-8
+    yield writer.writerow(ENCABEZADOS)
+    for fila in _filas(qs, chunk_size):
+        fila[1] = fila[1].strftime("%Y-%m-%d %H:%M")
+        yield writer.writerow(fila)
+
+
+XLSX_TIPO = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+_PARTES_XLSX = {
+    "[Content_Types].xml": (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        f'<Relationships xmlns="{_NS_PKG}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        f'<workbook xmlns="{_NS}" xmlns:r="{_NS_REL}">'
+        '<sheets><sheet name="Citas" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        f'<Relationships xmlns="{_NS_PKG}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo 1 = fecha y hora, igual que en el CSV
+    "xl/styles.xml": (
+        f'<styleSheet xmlns="{_NS}">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+# Caracteres de control que XML no admite
+_ILEGALES = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _Tubo:
+    # Destino del zip sin tell()/seek(): zipfile escribe descriptores de datos
+    # y aquí se junta lo comprimido hasta que el generador lo entrega
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+def _celda(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        return f'<c s="1"><v>{(valor - _EPOCA_EXCEL).total_seconds() / 86400!r}</v></c>'
+    if isinstance(valor, (int, float)) or hasattr(valor, "is_finite"):  # int, float, Decimal
+        return f"<c><v>{valor}</v></c>"
+    texto = escape(_ILEGALES.sub("", str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(n, fila):
+    return f'<row r="{n}">{"".join(_celda(v) for v in fila)}</row>'.encode()
+
+
+def partes_xlsx(qs, chunk_size=CHUNK_SIZE):
+    """
+    Genera el XLSX (una hoja "Citas") en bloques de bytes conforme se leen
+    las filas, para mandarlo con StreamingHttpResponse.
+    """
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, xml in _PARTES_XLSX.items():
+            zf.writestr(nombre, xml)
+        with zf.open("xl/worksheets/sheet1.xml", "w") as hoja:
+            hoja.write(f'<worksheet xmlns="{_NS}"><sheetData>'.encode())
+            hoja.write(_fila_xml(1, ENCABEZADOS))
+            for n, fila in enumerate(_filas(qs, chunk_size), start=2):
+                hoja.write(_fila_xml(n, fila))
+                if tubo.partes:
+                    yield tubo.vaciar()
+            hoja.write(b"</sheetData></worksheet>")
+    yield tubo.vaciar()
+
+
+def escribir_xlsx(qs, destino, chunk_size=CHUNK_SIZE):
+    # `destino`: ruta o archivo binario abierto
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, "wb") as f:
+            return escribir_xlsx(qs, f, chunk_size)
+    for parte in partes_xlsx(qs, chunk_size):
+        destino.write(parte)
@@ -0,0 +1,56 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+# Cache de las filas (<tr>) de la tabla de citas.
+# Cada fila se guarda ya renderizada con la llave (cita, versión, rol):
+# la versión sube en cada cambio de la cita (ver models.py), así que una
+# fila en cache nunca queda vieja y no hace falta invalidar nada. La llave
+# también lleva un hash de la plantilla de la fila, para que un cambio de
+# la plantilla no sirva filas con el HTML anterior.
+
+PLANTILLA_FILA = "citas_fila.html"
+
+_huella = None
+
+
+def _segundos():
+    return getattr(settings, "FILAS_CACHE_SEGUNDOS", 3600)
+
+
+def huella_plantilla():
+    global _huella
+    if _huella is None or settings.DEBUG:
+        fuente = get_template(PLANTILLA_FILA).template.source
+        _huella = hashlib.sha1(fuente.encode()).hexdigest()[:8]
+    return _huella
+
+
+def _llave(huella, rol, cita):
+    return f"cita-fila:{huella}:{rol}:{cita.pk}:{cita.version}"
+
+
+def filas_citas(citas, es_admin):
+    """
+    HTML de cada cita (en el mismo orden), tomado del cache en una sola
+    lectura; solo se renderizan las filas nuevas o que cambiaron.
+    """
+    citas = list(citas)
+    huella = huella_plantilla()
+    rol = "admin" if es_admin else "empleado"
+    llaves = [_llave(huella, rol, c) for c in citas]
+    en_cache = cache.get_many(llaves)
+
+    nuevas = {}
+    plantilla = None
+    for cita, llave in zip(citas, llaves):
+        if llave not in en_cache:
+            plantilla = plantilla or get_template(PLANTILLA_FILA)
+            nuevas[llave] = plantilla.render({"cita": cita, "es_admin": es_admin})
+    if nuevas:
+        cache.set_many(nuevas, _segundos())
+        en_cache.update(nuevas)
+    return [mark_safe(en_cache[llave]) for llave in llaves]
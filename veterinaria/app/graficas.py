@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+
+# Gráficas de los reportes.
+# Se dibujan con matplotlib en un ProcessPoolExecutor (fuera del hilo del
+# request) y se guardan en disco con una llave = hash(tipo, formato,
+# parámetros, datos): si el resumen cambia, cambia la llave y la URL, así
+# que cada archivo se puede mandar con cache de larga duración.
+# matplotlib solo se importa dentro de los procesos que dibujan.
+# El request nunca espera al dibujo: si no está, la vista responde un
+# marcador (202) y el navegador vuelve a preguntar. De vez en cuando el pool
+# también borra de GRAFICAS_DIR los archivos viejos o los que sobran.
+
+logger = logging.getLogger(__name__)
+
+TIPOS = {
+    "citas_dia": "Citas por día",
+    "ingresos_servicio": "Ingresos por servicio",
+    "estatus": "Citas por estatus",
+}
+FORMATOS = {"png": "image/png", "svg": "image/svg+xml"}
+VERSION_DIBUJO = 1  # subirla si cambia el estilo de las gráficas
+# Lo que recibe el navegador mientras la gráfica se dibuja
+MARCADOR = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="800" height="400" viewBox="0 0 800 400">'
+    '<text x="400" y="200" text-anchor="middle" font-family="sans-serif" font-size="20" fill="#888">'
+    'Generando gráfica…</text></svg>'
+)
+
+_pool = None
+_en_curso = {}
+# Reentrante: si el future ya terminó, add_done_callback llama a _termino ahí mismo
+_lock = threading.RLock()
+_ultima_limpieza = float("-inf")
+
+
+def datos(tipo, desde, hasta, periodo="dia"):
+    """Serie {"x": [...], "y": [...]} de la gráfica, leída de RESUMEN_DIARIO."""
+    from . import reportes
+
+    if tipo == "citas_dia":
+        filas = reportes.citas_por_dia(desde, hasta)
+        return {"x": [f["fecha"].isoformat() for f in filas], "y": [f["citas"] for f in filas]}
+    if tipo == "ingresos_servicio":
+        totales = {}
+        for f in reportes.ingresos_por_servicio(desde, hasta, periodo):
+            nombre = f["servicio__nombre"] or "(sin servicio)"
+            totales[nombre] = totales.get(nombre, 0) + float(f["ingresos"] or 0)
+        return {"x": list(totales), "y": list(totales.values())}
+    filas = reportes.totales_por_estatus(desde, hasta)
+    return {"x": [f["estatus"] for f in filas], "y": [f["citas"] for f in filas]}
+
+
+def clave(tipo, formato, params, serie):
+    texto = json.dumps([VERSION_DIBUJO, tipo, formato, params, serie], sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode()).hexdigest()[:24]
+
+
+def ruta(llave, formato):
+    return Path(settings.GRAFICAS_DIR) / f"{llave}.{formato}"
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        # spawn: los procesos hijos no heredan conexiones ni hilos de Django
+        _pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, "GRAFICAS_PROCESOS", 2),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _termino(llave, futuro):
+    global _pool
+    _en_curso.pop(llave, None)
+    error = futuro.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        # Un proceso murió: se arma otro pool en el siguiente encargo
+        with _lock:
+            _pool = None
+    logger.error("No se pudo dibujar la gráfica %s", llave, exc_info=error)
+
+
+def _limpiar_si_toca():
+    # Llamar con _lock tomado
+    global _ultima_limpieza
+    ahora = time.monotonic()
+    if ahora - _ultima_limpieza < getattr(settings, "GRAFICAS_LIMPIEZA_SEGUNDOS", 600):
+        return
+    _ultima_limpieza = ahora
+    _executor().submit(
+        limpiar, str(settings.GRAFICAS_DIR),
+        getattr(settings, "GRAFICAS_MAX_DIAS", 7), getattr(settings, "GRAFICAS_MAX_MB", 200) * 1024 * 1024,
+    )
+
+
+def encargar(tipo, formato, params, serie):
+    """
+    Manda a dibujar la gráfica si no está en disco y no se está dibujando.
+    Regresa (llave, future o None si ya existe). No espera el resultado.
+    """
+    llave = clave(tipo, formato, params, serie)
+    destino = ruta(llave, formato)
+    if destino.exists():
+        return llave, None
+    with _lock:
+        futuro = _en_curso.get(llave)
+        if futuro is None:
+            _limpiar_si_toca()
+            futuro = _executor().submit(dibujar, tipo, formato, serie, str(destino))
+            _en_curso[llave] = futuro
+            futuro.add_done_callback(lambda f, llave=llave: _termino(llave, f))
+    return llave, futuro
+
+
+def limpiar(carpeta, max_dias, max_bytes):
+    """
+    Borra las gráficas con más de `max_dias` días y, si aun así la carpeta
+    pasa de `max_bytes`, las más viejas. Corre en el pool. Regresa cuántas borró.
+    """
+    archivos = []
+    for p in Path(carpeta).glob("*"):
+        if p.suffix[1:] not in FORMATOS:
+            continue
+        try:
+            archivos.append((p, p.stat()))
+        except FileNotFoundError:
+            continue
+    limite = time.time() - max_dias * 86400
+    borradas = 0
+    vivas = []
+    for p, st in sorted(archivos, key=lambda a: a[1].st_mtime):
+        if st.st_mtime < limite:
+            p.unlink(missing_ok=True)
+            borradas += 1
+        elif not p.name.startswith("tmp"):  # un temporal reciente se está escribiendo
+            vivas.append((p, st.st_size))
+    total = sum(tamaño for _, tamaño in vivas)
+    for p, tamaño in vivas:
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= tamaño
+        borradas += 1
+    return borradas
+
+
+def dibujar(tipo, formato, serie, destino):
+    # Corre en el proceso hijo
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 4), dpi=100)
+    ax = fig.add_subplot()
+    x, y = serie["x"], serie["y"]
+    if not x:
+        ax.text(0.5, 0.5, "Sin información disponible", ha="center", va="center")
+        ax.set_axis_off()
+    elif tipo == "citas_dia":
+        ax.plot([date.fromisoformat(d) for d in x], y, marker="o")
+        ax.set_ylabel("Citas")
+        fig.autofmt_xdate()
+    elif tipo == "ingresos_servicio":
+        ax.barh(x, y)
+        ax.set_xlabel("Ingresos ($)")
+    else:
+        ax.pie(y, labels=x, autopct="%1.0f%%")
+    ax.set_title(TIPOS[tipo])
+    fig.tight_layout()
+
+    # Se escribe en un temporal y se renombra para no servir archivos a medias
+    carpeta = os.path.dirname(destino)
+    os.makedirs(carpeta, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix=f".{formato}")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            fig.savefig(f, format=formato)
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    return destino
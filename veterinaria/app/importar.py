@@ -0,0 +1,198 @@
+import csv
+import io
+import os
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .busqueda import normalizar
+from .disponibilidad import ESTATUS_LIBERA, floor_to_half_hour
+from .models import MSG_CHOQUE, SERVICIO, CITA_VETERINARIA, choque_de_bloque
+
+# Importación masiva de citas desde CSV / XLSX.
+# Los servicios se resuelven con un solo diccionario precargado y los choques
+# de bloque se revisan por lote en memoria contra una sola consulta por rango;
+# las filas válidas se insertan con bulk_create dentro de una transacción.
+
+BATCH_SIZE = 5000
+ESTATUS_VALIDOS = {"Pendiente", "Completada", "Cancelada", "No asistió"}
+FORMATOS_FECHA = ("%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S")
+
+# Encabezado del archivo -> campo (acepta el formato de exportar.py)
+COLUMNAS = {
+    "fecha": "fecha_cita",
+    "dueno": "nombre_dueño",
+    "mascota": "nombre_mascota",
+    "especie": "especie",
+    "motivo": "motivo",
+    "estatus": "estatus",
+    "servicio": "servicio",
+}
+
+
+def leer_filas(archivo, nombre=""):
+    """
+    Genera (numero_de_linea, dict) desde un archivo CSV o XLSX.
+    `archivo` puede ser una ruta o un objeto tipo archivo (binario).
+    """
+    nombre = nombre or (archivo if isinstance(archivo, str) else getattr(archivo, "name", ""))
+    if os.path.splitext(nombre)[1].lower() == ".xlsx":
+        yield from _leer_xlsx(archivo)
+    else:
+        yield from _leer_csv(archivo)
+
+
+def _mapear(encabezados):
+    return [COLUMNAS.get(normalizar(str(h or ""))) for h in encabezados]
+
+
+def _leer_csv(archivo):
+    if isinstance(archivo, str):
+        texto = open(archivo, encoding="utf-8-sig", newline="")
+    else:
+        texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    with texto:
+        reader = csv.reader(texto)
+        campos = _mapear(next(reader, []))
+        for n, fila in enumerate(reader, start=2):
+            if any(fila):
+                yield n, {c: v for c, v in zip(campos, fila) if c}
+
+
+def _leer_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = wb.active.iter_rows(values_only=True)
+        campos = _mapear(next(filas, []))
+        for n, fila in enumerate(filas, start=2):
+            if any(v not in (None, "") for v in fila):
+                yield n, {c: v for c, v in zip(campos, fila) if c}
+    finally:
+        wb.close()
+
+
+def _parsear_fecha(valor, tz):
+    if isinstance(valor, datetime):
+        dt = valor
+    else:
+        texto = str(valor or "").strip()
+        try:
+            # Camino rápido: ISO ("2024-05-01 10:30" / "2024-05-01T10:30")
+            dt = datetime.fromisoformat(texto)
+        except ValueError:
+            for formato in FORMATOS_FECHA:
+                try:
+                    dt = datetime.strptime(texto, formato)
+                    break
+                except ValueError:
+                    continue
+            else:
+                return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, tz)
+    return dt
+
+
+def _texto(datos, campo):
+    return str(datos.get(campo) or "").strip()
+
+
+def _validar(datos, servicios, tz):
+    # Regresa (cita, None) o (None, motivo)
+    fecha = _parsear_fecha(datos.get("fecha_cita"), tz)
+    if fecha is None:
+        return None, "Fecha inválida."
+    servicio_id = servicios.get(normalizar(_texto(datos, "servicio")))
+    if servicio_id is None:
+        return None, f"Servicio desconocido: {_texto(datos, 'servicio') or '(vacío)'}."
+    dueño, mascota = _texto(datos, "nombre_dueño"), _texto(datos, "nombre_mascota")
+    if not dueño or not mascota:
+        return None, "Falta el nombre del dueño o de la mascota."
+    estatus = _texto(datos, "estatus") or "Pendiente"
+    if estatus not in ESTATUS_VALIDOS:
+        return None, f"Estatus no válido: {estatus}."
+    return CITA_VETERINARIA(
+        nombre_dueño=dueño.title()[:200],
+        nombre_mascota=mascota.title()[:100],
+        especie=(_texto(datos, "especie") or "Otro").capitalize()[:100],
+        fecha_cita=fecha,
+        motivo=_texto(datos, "motivo").capitalize()[:255],
+        estatus=estatus,
+        servicio_id=servicio_id,
+    ), None
+
+
+def _ocupados(lote):
+    # Bloques activos ya guardados en el rango del lote: una sola consulta
+    slots = [c.slot_inicio for c, _ in lote]
+    return set(
+        CITA_VETERINARIA.objects
+        .filter(
+            servicio_id__in={c.servicio_id for c, _ in lote},
+            slot_inicio__gte=min(slots),
+            slot_inicio__lte=max(slots),
+        )
+        .exclude(estatus__in=ESTATUS_LIBERA)
+        .values_list("servicio_id", "slot_inicio")
+    )
+
+
+def _insertar(lote, resultado, batch_size):
+    ocupados = _ocupados(lote)
+    aceptadas = []
+    for cita, linea in lote:
+        llave = (cita.servicio_id, cita.slot_inicio)
+        if cita.estatus not in ESTATUS_LIBERA:
+            if llave in ocupados:
+                resultado["rechazos"].append((linea, MSG_CHOQUE))
+                continue
+            ocupados.add(llave)
+        aceptadas.append((cita, linea))
+
+    try:
+        with transaction.atomic():
+            CITA_VETERINARIA.objects.bulk_create([c for c, _ in aceptadas], batch_size=batch_size)
+        resultado["importadas"] += len(aceptadas)
+    except IntegrityError as e:
+        if not choque_de_bloque(e):
+            raise
+        # Alguien reservó en paralelo: se reintenta fila por fila. Los dueños y
+        # mascotas del intento se deshicieron con él, así que se resuelven otra vez
+        for cita, linea in aceptadas:
+            cita.pk = cita.dueño_id = cita.mascota_id = None
+            try:
+                with transaction.atomic():
+                    CITA_VETERINARIA.objects.bulk_create([cita])
+                resultado["importadas"] += 1
+            except IntegrityError as e:
+                if not choque_de_bloque(e):
+                    raise
+                resultado["rechazos"].append((linea, MSG_CHOQUE))
+
+
+def importar_citas(filas, batch_size=BATCH_SIZE):
+    """
+    Importa las filas de `leer_filas`. Regresa
+    {"leidas": n, "importadas": n, "rechazos": [(linea, motivo), ...]}.
+    """
+    servicios = dict(SERVICIO.objects.values_list("nombre_norm", "pk"))
+    tz = timezone.get_current_timezone()
+    resultado = {"leidas": 0, "importadas": 0, "rechazos": []}
+    lote = []
+    for linea, datos in filas:
+        resultado["leidas"] += 1
+        cita, motivo = _validar(datos, servicios, tz)
+        if motivo:
+            resultado["rechazos"].append((linea, motivo))
+            continue
+        cita.slot_inicio = floor_to_half_hour(cita.fecha_cita)
+        lote.append((cita, linea))
+        if len(lote) >= batch_size:
+            _insertar(lote, resultado, batch_size)
+            lote = []
+    if lote:
+        _insertar(lote, resultado, batch_size)
+    return resultado
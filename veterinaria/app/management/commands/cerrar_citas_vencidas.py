@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app import cierre
+
+
+class Command(BaseCommand):
+    help = ('Marca como "No asistió" las citas Pendiente que ya pasaron (más un periodo de gracia), '
+            'por lotes cortos. Pensado para correr desde cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument("--gracia-horas", type=float, default=None,
+                            help="Horas después de la cita antes de cerrarla (default CIERRE_GRACIA_HORAS).")
+        parser.add_argument("--chunk-size", type=int, default=cierre.CHUNK_SIZE,
+                            help=f"Citas por UPDATE / transacción (default {cierre.CHUNK_SIZE}).")
+        parser.add_argument("--pausa", type=float, default=0.05,
+                            help="Segundos de espera entre lotes (default 0.05).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Solo cuenta las citas que se cerrarían, sin modificarlas.")
+
+    def handle(self, *args, **opts):
+        if opts["gracia_horas"] is not None and opts["gracia_horas"] < 0:
+            raise CommandError("--gracia-horas no puede ser negativo.")
+
+        stats = cierre.cerrar_vencidas(
+            gracia_horas=opts["gracia_horas"],
+            chunk_size=max(1, opts["chunk_size"]),
+            dry_run=opts["dry_run"],
+            pausa=max(0, opts["pausa"]),
+        )
+
+        fmt = lambda f: timezone.localtime(f).strftime("%Y-%m-%d %H:%M") if f else "-"
+        self.stdout.write(f"Límite: {fmt(stats['limite'])}")
+        self.stdout.write(f"Rango: {fmt(stats['primera'])} a {fmt(stats['ultima'])}")
+        self.stdout.write(f"Lotes: {stats['lotes']}  Tiempo: {stats['segundos']:.2f} s")
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"[dry-run] {stats['candidatas']} citas se cerrarían."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{stats['cerradas']} citas marcadas como \"{cierre.ESTATUS_CIERRE}\""
+                f" ({stats['omitidas']} cambiaron antes de cerrarse)."
+            ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import exportar
+from app.disponibilidad import parsear_dia
+
+
+class Command(BaseCommand):
+    help = "Exporta citas (con nombre y precio del servicio) a CSV o XLSX sin cargarlas todas en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=["csv", "xlsx"], default="csv")
+        parser.add_argument("--salida", help="Archivo destino (CSV sin --salida va a la salida estándar).")
+        parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD (incluida).")
+        parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (incluida).")
+        parser.add_argument("--estatus")
+        parser.add_argument("--servicio", type=int, help="ID del servicio.")
+        parser.add_argument("--chunk-size", type=int, default=exportar.CHUNK_SIZE)
+
+    def handle(self, *args, **opts):
+        desde, hasta = parsear_dia(opts["desde"]), parsear_dia(opts["hasta"])
+        if (opts["desde"] and not desde) or (opts["hasta"] and not hasta):
+            raise CommandError("Las fechas deben tener formato YYYY-MM-DD.")
+
+        qs = exportar.citas_para_exportar(desde, hasta, opts["estatus"], opts["servicio"])
+        chunk = max(1, opts["chunk_size"])
+
+        if opts["formato"] == "xlsx":
+            if not opts["salida"]:
+                raise CommandError("El formato xlsx necesita --salida.")
+            exportar.escribir_xlsx(qs, opts["salida"], chunk)
+        elif opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8", newline="") as f:
+                f.writelines(exportar.lineas_csv(qs, chunk))
+        else:
+            for linea in exportar.lineas_csv(qs, chunk):
+                self.stdout.write(linea, ending="")
+
+        if opts["salida"]:
+            self.stderr.write(self.style.SUCCESS(f"Exportación escrita en {opts['salida']}."))
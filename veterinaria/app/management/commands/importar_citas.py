@@ -0,0 +1,40 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import importar
+
+
+class Command(BaseCommand):
+    help = "Importa citas desde un archivo CSV o XLSX por lotes con bulk_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del CSV o XLSX (mismos encabezados que exportar_citas).")
+        parser.add_argument("--batch-size", type=int, default=importar.BATCH_SIZE,
+                            help="Filas por lote / transacción.")
+        parser.add_argument("--rechazos", help="Escribe aquí un CSV con las filas rechazadas y el motivo.")
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        try:
+            filas = importar.leer_filas(opts["archivo"])
+            resultado = importar.importar_citas(filas, batch_size=max(1, opts["batch_size"]))
+        except FileNotFoundError:
+            raise CommandError(f"No existe el archivo {opts['archivo']}.")
+        segundos = time.perf_counter() - inicio
+
+        if opts["rechazos"]:
+            with open(opts["rechazos"], "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Linea", "Motivo"])
+                writer.writerows(resultado["rechazos"])
+        else:
+            for linea, motivo in resultado["rechazos"][:50]:
+                self.stderr.write(f"Línea {linea}: {motivo}")
+
+        tasa = resultado["leidas"] / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['importadas']} de {resultado['leidas']} citas importadas, "
+            f"{len(resultado['rechazos'])} rechazadas ({segundos:.1f}s, {tasa:,.0f} filas/s)."
+        ))
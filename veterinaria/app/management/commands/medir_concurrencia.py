@@ -0,0 +1,165 @@
+import copy
+import itertools
+import sqlite3
+import tempfile
+import threading
+from contextlib import suppress
+import time
+from datetime import datetime, time as dtime, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.utils import timezone
+
+from app.busqueda import filtrar_citas
+from app.disponibilidad import SLOTS
+from app.models import SERVICIO, CITA_VETERINARIA
+from app.paginacion import paginar_citas
+from app.routers import LECTURA, LecturaRouter
+
+DUEÑO = "Medicion Concurrencia"
+
+# Conexiones propias sobre una copia de la base: la configurada no se toca
+MEDICION = "medicion"
+MEDICION_LECTURA = "medicion_lectura"
+
+
+class RouterMedicion(LecturaRouter):
+    lectura = MEDICION_LECTURA
+    escritura = MEDICION
+
+
+class Command(BaseCommand):
+    help = ("Mide lecturas por segundo del panel de citas sin escrituras, con reservas "
+            "concurrentes y con las lecturas por el router de solo lectura. Trabaja "
+            "sobre una copia temporal de la base configurada.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--segundos", type=float, default=5, help="Duración de cada fase.")
+        parser.add_argument("--lectores", type=int, default=4)
+        parser.add_argument("--escritores", type=int, default=2)
+        parser.add_argument("--journal", choices=["wal", "delete"], default="wal",
+                            help="delete = SQLite por defecto (rollback journal), para comparar.")
+
+    def handle(self, *args, **opts):
+        if connection.vendor != "sqlite":
+            raise CommandError("Esta medición es para SQLite.")
+        if not SERVICIO.objects.exists():
+            raise CommandError("No hay servicios; corre sembrar_datos primero.")
+
+        # Junto a la base, para medir sobre el mismo disco
+        with tempfile.TemporaryDirectory(dir=Path(connection.settings_dict["NAME"]).parent) as carpeta:
+            copia = Path(carpeta) / "medicion.sqlite3"
+            connection.ensure_connection()
+            destino = sqlite3.connect(copia)
+            try:
+                connection.connection.backup(destino)
+            finally:
+                destino.close()
+            self._registrar(copia, opts["journal"])
+            try:
+                with connections[MEDICION].cursor() as cur:
+                    cur.execute(f"PRAGMA journal_mode={opts['journal'].upper()}")
+                    modo = cur.fetchone()[0]
+                self.stdout.write(f"journal_mode={modo}  lectores={opts['lectores']}  escritores={opts['escritores']}")
+                servicio = SERVICIO.objects.using(MEDICION).order_by("pk").first()
+                # Cada reserva usa un bloque propio, lejos de las citas reales
+                self.siguiente = itertools.count()
+                fases = (
+                    ("solo lecturas", self._fase(opts, servicio, escritores=0)),
+                    ("con escrituras", self._fase(opts, servicio, escritores=opts["escritores"])),
+                    ("lectura ruteada", self._fase(opts, servicio, escritores=opts["escritores"],
+                                                   router=RouterMedicion())),
+                )
+            finally:
+                connections.close_all()
+                for alias in (MEDICION, MEDICION_LECTURA):
+                    del connections.settings[alias]
+                    with suppress(AttributeError):  # este hilo no la abrió
+                        del connections[alias]
+
+        solo = fases[0][1]["lecturas"]
+        for nombre, r in fases:
+            self.stdout.write(
+                f"{nombre:<16} lecturas/s={r['lecturas']:>8.1f}  escrituras/s={r['escrituras']:>7.1f}"
+                f"  errores={r['errores']}"
+            )
+        for nombre, r in fases[1:]:
+            caida = 100 * (1 - r["lecturas"] / solo) if solo else 0
+            self.stdout.write(self.style.SUCCESS(f"Caída de lecturas ({nombre}): {caida:.0f}%"))
+
+    def _registrar(self, copia, journal):
+        escritura = copy.deepcopy(connections.settings[DEFAULT_DB_ALIAS])
+        escritura.update(NAME=str(copia), CONN_MAX_AGE=0, TEST={})
+        if journal == "delete":
+            # Sin pragmas ni BEGIN IMMEDIATE: el comportamiento de fábrica
+            escritura["OPTIONS"].pop("init_command", None)
+            escritura["OPTIONS"].pop("transaction_mode", None)
+        # La de solo lectura como la de settings si DB_LECTURA=1
+        lectura = copy.deepcopy(connections.settings.get(LECTURA, escritura))
+        lectura.update(NAME=f"file:{copia}?mode=ro", CONN_MAX_AGE=0, TEST={})
+        lectura["OPTIONS"].pop("transaction_mode", None)
+        if LECTURA not in connections.settings:
+            lectura["OPTIONS"]["init_command"] = "PRAGMA query_only=1;"
+        connections.settings[MEDICION] = escritura
+        connections.settings[MEDICION_LECTURA] = lectura
+
+    def _fase(self, opts, servicio, escritores, router=None):
+        fin = time.monotonic() + opts["segundos"]
+        conteos = {"lecturas": 0, "escrituras": 0, "errores": 0}
+        candado = threading.Lock()
+        primer_dia = timezone.localdate() + timedelta(days=3650)
+        horas = [dtime.fromisoformat(h) for h in SLOTS]
+        tz = timezone.get_current_timezone()
+
+        def sumar(clave):
+            with candado:
+                conteos[clave] += 1
+
+        def lector():
+            alias = router.db_for_read(CITA_VETERINARIA) if router else MEDICION
+            qs = CITA_VETERINARIA.objects.using(alias).select_related("servicio")
+            n = 0
+            try:
+                while time.monotonic() < fin:
+                    try:
+                        # Lista y búsqueda, como el panel de citas
+                        list(paginar_citas(qs)["citas"] if n % 2 else filtrar_citas(qs, "firulais")[:25])
+                        sumar("lecturas")
+                    except OperationalError:
+                        sumar("errores")
+                    n += 1
+            finally:
+                connections.close_all()
+
+        def escritor():
+            try:
+                while time.monotonic() < fin:
+                    with candado:
+                        k = next(self.siguiente)
+                    dia = primer_dia + timedelta(days=k // len(horas))
+                    fecha = timezone.make_aware(datetime.combine(dia, horas[k % len(horas)]), tz)
+                    try:
+                        with transaction.atomic(using=MEDICION):
+                            CITA_VETERINARIA.objects.using(MEDICION).create(
+                                nombre_dueño=DUEÑO, nombre_mascota="Prueba", especie="Perro",
+                                fecha_cita=fecha, motivo="Medición", estatus="Pendiente", servicio=servicio,
+                            )
+                        sumar("escrituras")
+                    except OperationalError:
+                        sumar("errores")
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=lector) for _ in range(opts["lectores"])]
+        hilos += [threading.Thread(target=escritor) for _ in range(escritores)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return {
+            "lecturas": conteos["lecturas"] / opts["segundos"],
+            "escrituras": conteos["escrituras"] / opts["segundos"],
+            "errores": conteos["errores"],
+        }
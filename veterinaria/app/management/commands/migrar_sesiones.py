@@ -0,0 +1,36 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ("Copia las sesiones vigentes de la tabla django_session al cache de sesiones "
+            "(SESSION_CACHE_ALIAS), para que tras cambiar SESSION_ENGINE nadie pierda su "
+            "sesión ni se lea la base en el primer request.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limpiar", action="store_true",
+                            help="Además borra de la tabla las sesiones vencidas.")
+
+    def handle(self, *args, **opts):
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        prefijo = getattr(store, "cache_key_prefix", None)
+        if prefijo is None:
+            raise CommandError(f"{settings.SESSION_ENGINE} no guarda las sesiones en cache.")
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+
+        ahora = timezone.now()
+        copiadas = 0
+        for sesion in Session.objects.filter(expire_date__gt=ahora).iterator(chunk_size=500):
+            datos = store.decode(sesion.session_data)
+            cache.set(prefijo + sesion.session_key, datos, store.get_expiry_age(expiry=sesion.expire_date))
+            copiadas += 1
+        self.stdout.write(self.style.SUCCESS(f"{copiadas} sesiones copiadas al cache."))
+
+        if opts["limpiar"]:
+            borradas, _ = Session.objects.filter(expire_date__lte=ahora).delete()
+            self.stdout.write(f"{borradas} sesiones vencidas borradas.")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.disponibilidad import parsear_dia
+from app.reportes import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla RESUMEN_DIARIO desde las citas, por bloques de días."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Primer día (YYYY-MM-DD). Default: la cita más antigua.")
+        parser.add_argument("--hasta", help="Último día (YYYY-MM-DD). Default: la cita más reciente.")
+        parser.add_argument("--dias-por-bloque", type=int, default=31,
+                            help="Días por transacción (default 31).")
+
+    def handle(self, *args, **opts):
+        desde = parsear_dia(opts["desde"]) if opts["desde"] else None
+        hasta = parsear_dia(opts["hasta"]) if opts["hasta"] else None
+        if (opts["desde"] and desde is None) or (opts["hasta"] and hasta is None):
+            raise CommandError("Fechas inválidas; usa YYYY-MM-DD.")
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde debe ser anterior a --hasta.")
+
+        filas = reconstruir(desde, hasta, dias_por_bloque=max(1, opts["dias_por_bloque"]))
+        self.stdout.write(self.style.SUCCESS(f"{filas} filas de resumen escritas."))
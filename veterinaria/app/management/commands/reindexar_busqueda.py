@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.busqueda import FTS_TABLA, crear_fts, fts_disponible
+from app.models import CITA_VETERINARIA
+
+
+class Command(BaseCommand):
+    help = "Recalcula la columna de búsqueda normalizada de las citas (y el índice FTS) por bloques."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000,
+                            help="Citas por bloque / transacción (default 1000).")
+        parser.add_argument("--reconstruir", action="store_true",
+                            help="Vacía el índice FTS antes de llenarlo (quita filas huérfanas).")
+
+    def handle(self, *args, **opts):
+        chunk = max(1, opts["chunk_size"])
+
+        if opts["reconstruir"] and connection.vendor == "sqlite":
+            with connection.cursor() as cur:
+                crear_fts(cur)
+                cur.execute(f"DELETE FROM {FTS_TABLA}")
+
+        total = CITA_VETERINARIA.objects.all().refrescar_busqueda(chunk_size=chunk)
+        destino = "columna + FTS5" if fts_disponible() else "columna"
+        self.stdout.write(self.style.SUCCESS(f"{total} citas reindexadas ({destino})."))
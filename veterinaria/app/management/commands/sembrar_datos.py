@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import semilla
+
+
+class Command(BaseCommand):
+    help = "Genera servicios y citas sintéticos (bulk_create) para pruebas de carga y benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servicios", type=int, default=1000,
+                            help=f"Servicios a crear (máximo {semilla.MAX_SERVICIOS}; 0 = usar los existentes).")
+        parser.add_argument("--citas", type=int, default=1_000_000)
+        parser.add_argument("--anios", type=int, default=3, help="Años hacia atrás (default 3).")
+        parser.add_argument("--dias-futuros", type=int, default=60, help="Días hacia adelante (default 60).")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--semilla", type=int, help="Semilla del generador (datos reproducibles).")
+
+    def handle(self, *args, **opts):
+        if opts["citas"] < 0 or opts["servicios"] < 0 or opts["anios"] < 0 or opts["dias_futuros"] < 0:
+            raise CommandError("Los valores no pueden ser negativos.")
+
+        inicio = time.monotonic()
+
+        def progreso(n):
+            self.stdout.write(f"  {n} citas ({n / max(time.monotonic() - inicio, 1e-6):.0f}/s)")
+
+        try:
+            servicios, citas = semilla.sembrar(
+                servicios=opts["servicios"], citas=opts["citas"], anios=opts["anios"],
+                dias_futuros=opts["dias_futuros"], batch_size=max(1, opts["batch_size"]),
+                semilla=opts["semilla"], progreso=progreso,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{servicios} servicios y {citas} citas creados en {time.monotonic() - inicio:.1f} s."
+        ))
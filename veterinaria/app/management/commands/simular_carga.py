@@ -0,0 +1,104 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import carga
+
+ESCENARIO = Path(__file__).resolve().parents[2] / "escenario_carga.json"
+
+
+class Command(BaseCommand):
+    help = ("Simula un día de clínica (público en la página principal, recepción con login, "
+            "búsquedas, reservas, cambios de estatus y bajas) con clientes concurrentes contra "
+            "la aplicación WSGI y reporta req/s, p50/p95/p99 por URL y bloqueos de la base, en "
+            "JSON. Crea usuarios y citas de prueba: úsalo en una copia de la base.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escenario", default=str(ESCENARIO), help="JSON con la mezcla de clientes.")
+        parser.add_argument("--duracion", type=float, help="Segundos medidos (sustituye al escenario).")
+        parser.add_argument("--procesos", type=int, help="Procesos entre los que se reparten los clientes.")
+        parser.add_argument("--url", help="Ir por HTTP a un servidor ya levantado (p. ej. http://127.0.0.1:8000).")
+        parser.add_argument("--servidor", action="store_true",
+                            help="Levantar runserver en un puerto libre y probar contra él por HTTP.")
+        parser.add_argument("--salida", help="Archivo donde guardar el resultado (JSON); sin él se imprime.")
+        parser.add_argument("--comparar", help="Resultado JSON de otra corrida, para mostrar la diferencia.")
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--sin-limpiar", action="store_true", help="No borrar usuarios ni citas de prueba.")
+
+    def handle(self, *args, **opts):
+        try:
+            escenario = carga.cargar_escenario(opts["escenario"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Escenario inválido: {e}")
+        if opts["duracion"] is not None:
+            escenario["duracion_segundos"] = opts["duracion"]
+        if opts["procesos"] is not None:
+            escenario["procesos"] = opts["procesos"]
+        base = None
+        if opts["comparar"]:
+            with open(opts["comparar"], encoding="utf-8") as f:
+                base = json.load(f)
+
+        servidor = None
+        url = opts["url"]
+        if opts["servidor"]:
+            servidor, url = self._levantar_servidor()
+
+        usuarios = carga.preparar(escenario)
+        try:
+            clientes = sum(g["cantidad"] for g in escenario["clientes"])
+            self.stderr.write(
+                f"{clientes} clientes en {escenario['procesos']} proceso(s) contra {url or 'wsgi'} "
+                f"durante {escenario['calentamiento_segundos']}+{escenario['duracion_segundos']} s..."
+            )
+            resultado = carga.correr(escenario, usuarios, url=url, semilla=opts["semilla"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if servidor:
+                servidor.terminate()
+                servidor.wait(10)
+            if not opts["sin_limpiar"]:
+                carga.limpiar()
+
+        for linea in carga.tabla(resultado, base):
+            self.stderr.write(linea)
+        conteos = resultado["conteos"]
+        self.stderr.write(
+            f"reservas={conteos.get('reservas', 0)} rechazadas={conteos.get('reservas_rechazadas', 0)} "
+            f"logins fallidos={conteos.get('logins_fallidos', 0)} bloqueos={resultado['total'].get('bloqueos', 0)}"
+        )
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if opts["salida"]:
+            Path(opts["salida"]).write_text(texto + "\n", encoding="utf-8")
+            self.stderr.write(self.style.SUCCESS(f"Resultado en {opts['salida']}"))
+        else:
+            self.stdout.write(texto)
+
+    def _levantar_servidor(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            puerto = s.getsockname()[1]
+        manage = Path(settings.BASE_DIR) / "manage.py"
+        proceso = subprocess.Popen(
+            [sys.executable, str(manage), "runserver", f"127.0.0.1:{puerto}", "--noreload"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if proceso.poll() is not None:
+                raise CommandError("runserver terminó antes de aceptar conexiones.")
+            try:
+                socket.create_connection(("127.0.0.1", puerto), timeout=0.5).close()
+                return proceso, f"http://127.0.0.1:{puerto}"
+            except OSError:
+                time.sleep(0.2)
+        proceso.terminate()
+        raise CommandError("runserver no respondió en 30 s.")
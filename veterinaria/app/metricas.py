@@ -0,0 +1,202 @@
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+# Métricas por request: número y tiempo de consultas SQL, tiempo de render
+# de plantillas y tiempo total. Se mandan en el header Server-Timing y se
+# acumulan por nombre de URL en histogramas en memoria (uno por proceso),
+# que se exponen en formato de texto de Prometheus en /metricas/.
+# La medición del request vive en un ContextVar, así también se atribuyen
+# bien las consultas de vistas async (corren en otro hilo vía sync_to_async).
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_medicion = contextvars.ContextVar("medicion", default=None)
+
+
+class Medicion:
+    __slots__ = ("consultas", "sql", "plantillas", "anidadas")
+
+    def __init__(self):
+        self.consultas = 0
+        self.sql = 0.0
+        self.plantillas = 0.0
+        self.anidadas = 0  # plantillas en render ahora mismo (una dentro de otra)
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de la conexión
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def _instalar_medidor(sender, connection, **kwargs):
+    # Un solo wrapper por conexión (las persistentes se reconectan)
+    if _medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_sql)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[i] += 1
+                break
+        self.suma += valor
+        self.total += 1
+
+
+# nombre de la métrica -> (ayuda, buckets)
+METRICAS = {
+    "veterinaria_request_segundos": ("Tiempo total del request.", BUCKETS_SEGUNDOS),
+    "veterinaria_sql_segundos": ("Tiempo en consultas SQL por request.", BUCKETS_SEGUNDOS),
+    "veterinaria_plantillas_segundos": ("Tiempo de render de plantillas por request.", BUCKETS_SEGUNDOS),
+    "veterinaria_sql_consultas": ("Consultas SQL por request.", BUCKETS_CONSULTAS),
+}
+
+_histogramas = {}  # (métrica, vista) -> Histograma
+_lock = threading.Lock()
+
+
+def registrar(vista, total, medicion):
+    valores = {
+        "veterinaria_request_segundos": total,
+        "veterinaria_sql_segundos": medicion.sql,
+        "veterinaria_plantillas_segundos": medicion.plantillas,
+        "veterinaria_sql_consultas": medicion.consultas,
+    }
+    with _lock:
+        for nombre, valor in valores.items():
+            h = _histogramas.get((nombre, vista))
+            if h is None:
+                h = _histogramas[(nombre, vista)] = Histograma(METRICAS[nombre][1])
+            h.observar(valor)
+
+
+def reiniciar():
+    with _lock:
+        _histogramas.clear()
+
+
+def _num(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus():
+    with _lock:
+        copia = {k: (list(h.conteos), h.suma, h.total, h.buckets) for k, h in _histogramas.items()}
+    lineas = []
+    for nombre, (ayuda, _) in METRICAS.items():
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} histogram")
+        for (metrica, vista), (conteos, suma, total, buckets) in sorted(copia.items()):
+            if metrica != nombre:
+                continue
+            acumulado = 0
+            for limite, n in zip(buckets, conteos):
+                acumulado += n
+                lineas.append(f'{nombre}_bucket{{vista="{vista}",le="{_num(limite)}"}} {acumulado}')
+            lineas.append(f'{nombre}_bucket{{vista="{vista}",le="+Inf"}} {total}')
+            lineas.append(f'{nombre}_sum{{vista="{vista}"}} {_num(suma)}')
+            lineas.append(f'{nombre}_count{{vista="{vista}"}} {total}')
+    return "\n".join(lineas) + "\n"
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "METRICAS_SERVER_TIMING", True)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self._terminar(request, response, medicion, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self._terminar(request, response, medicion, time.perf_counter() - inicio)
+
+    def _terminar(self, request, response, medicion, total):
+        match = getattr(request, "resolver_match", None)
+        registrar((match and match.url_name) or "otro", total, medicion)
+
+        if self.server_timing:
+            app = max(0.0, total - medicion.sql - medicion.plantillas)
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={medicion.sql * 1000:.1f};desc="{medicion.consultas} consultas"',
+                f"tpl;dur={medicion.plantillas * 1000:.1f}",
+                f"app;dur={app * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ])
+        return response
+
+
+class PlantillaMedida(Template):
+    def render(self, context=None, request=None):
+        medicion = _medicion.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio, sql_antes = time.perf_counter(), medicion.sql
+        medicion.anidadas += 1
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.anidadas -= 1
+            # Solo la de afuera suma: una plantilla que se renderiza dentro de
+            # otra (p. ej. las filas de citas) ya está en el tiempo de la de afuera.
+            # Las consultas que dispara la plantilla (querysets perezosos) cuentan como SQL
+            if medicion.anidadas == 0:
+                medicion.plantillas += time.perf_counter() - inicio - (medicion.sql - sql_antes)
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    # Backend de plantillas que suma el tiempo de render a la medición del request
+    def from_string(self, template_code):
+        return PlantillaMedida(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        plantilla = super().get_template(template_name)
+        return PlantillaMedida(plantilla.template, self)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_cita_veterinaria_servicio_alter_servicio_descripcion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita_veterinaria',
+            index=models.Index(fields=['fecha_cita', 'id'], name='cita_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:21
+
+import logging
+import unicodedata
+
+from django.db import OperationalError, migrations, models
+
+logger = logging.getLogger(__name__)
+
+# El SQL y la normalización van aquí y no importados de app.busqueda, para
+# que la migración no cambie si ese módulo cambia.
+FTS_TABLA = 'app_cita_busqueda'
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFD', (texto or '').lower())
+    return ''.join(c for c in texto if unicodedata.category(c) != 'Mn').strip()
+
+
+def texto_busqueda(*partes):
+    return "\n".join(normalizar(p) for p in partes)
+
+
+def crear_indice_fts(apps, schema_editor):
+    # Solo SQLite; si el build no trae FTS5/trigram se usa LIKE sobre `busqueda`
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cur:
+            cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLA} USING fts5(busqueda, tokenize='trigram')")
+    except OperationalError as e:
+        logger.warning("No se creó el índice FTS5 de citas (%s); la búsqueda usará LIKE.", e)
+
+
+def borrar_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {FTS_TABLA}")
+
+
+def llenar_busqueda(apps, schema_editor):
+    # Llenado inicial por bloques; después se puede repetir con `reindexar_busqueda`
+    Cita = apps.get_model('app', 'CITA_VETERINARIA')
+    db = schema_editor.connection.alias
+    filas = Cita.objects.using(db).order_by('pk').values_list(
+        'pk', 'nombre_dueño', 'nombre_mascota', 'especie', 'estatus', 'servicio__nombre'
+    )
+    bloque = []
+    for pk, *campos in filas.iterator(chunk_size=1000):
+        bloque.append(Cita(pk=pk, busqueda=texto_busqueda(*campos)))
+        if len(bloque) >= 1000:
+            Cita.objects.using(db).bulk_update(bloque, ['busqueda'])
+            bloque = []
+    if bloque:
+        Cita.objects.using(db).bulk_update(bloque, ['busqueda'])
+
+    existe = False
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cur:
+            cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=%s", [FTS_TABLA])
+            existe = cur.fetchone() is not None
+    if existe:
+        with schema_editor.connection.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO {FTS_TABLA}(rowid, busqueda) "
+                f"SELECT id, busqueda FROM {Cita._meta.db_table}"
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_cita_veterinaria_cita_fecha_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='busqueda',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(crear_indice_fts, borrar_indice_fts),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:22
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar(texto):
+    # Copia de app.busqueda.normalizar al momento de la migración
+    texto = unicodedata.normalize('NFD', (texto or '').lower())
+    return ''.join(c for c in texto if unicodedata.category(c) != 'Mn').strip()
+
+
+def llenar_nombre_norm(apps, schema_editor):
+    Servicio = apps.get_model('app', 'SERVICIO')
+    db = schema_editor.connection.alias
+    servicios = list(Servicio.objects.using(db).only('pk', 'nombre'))
+    for s in servicios:
+        s.nombre_norm = normalizar(s.nombre)
+    Servicio.objects.using(db).bulk_update(servicios, ['nombre_norm'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_cita_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicio',
+            name='nombre_norm',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='servicio',
+            name='precio',
+            field=models.DecimalField(db_index=True, decimal_places=2, max_digits=10),
+        ),
+        migrations.RunPython(llenar_nombre_norm, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Copias de app.disponibilidad al momento de la migración
+ESTATUS_LIBERA = ('Cancelada',)
+
+
+def floor_to_half_hour(dt):
+    return dt.replace(minute=0 if dt.minute < 30 else 30, second=0, microsecond=0)
+
+
+def llenar_slot_inicio(apps, schema_editor):
+    Cita = apps.get_model('app', 'CITA_VETERINARIA')
+    db = schema_editor.connection.alias
+    bloque = []
+    for cita in Cita.objects.using(db).only('pk', 'fecha_cita').order_by('pk').iterator(chunk_size=1000):
+        cita.slot_inicio = floor_to_half_hour(cita.fecha_cita)
+        bloque.append(cita)
+        if len(bloque) >= 1000:
+            Cita.objects.using(db).bulk_update(bloque, ['slot_inicio'])
+            bloque = []
+    if bloque:
+        Cita.objects.using(db).bulk_update(bloque, ['slot_inicio'])
+
+    # Antes de crear la restricción se revisa que no haya choques previos
+    choques = (
+        Cita.objects.using(db)
+        .exclude(estatus__in=ESTATUS_LIBERA)
+        .values('servicio_id', 'slot_inicio')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1, servicio_id__isnull=False)
+    )
+    if choques.exists():
+        detalle = "; ".join(
+            f"servicio {c['servicio_id']} @ {c['slot_inicio']:%Y-%m-%d %H:%M} ({c['n']} citas)"
+            for c in choques[:20]
+        )
+        raise RuntimeError(
+            "Hay citas activas que comparten servicio y bloque de 30 min. "
+            "Cancélalas o muévelas antes de migrar: " + detalle
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_servicio_nombre_norm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='slot_inicio',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_slot_inicio, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cita_veterinaria',
+            constraint=models.UniqueConstraint(condition=models.Q(('estatus__in', ('Cancelada',)), _negated=True), fields=('servicio', 'slot_inicio'), name='cita_bloque_unico'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def llenar_resumen(apps, schema_editor):
+    Cita = apps.get_model('app', 'CITA_VETERINARIA')
+    Resumen = apps.get_model('app', 'RESUMEN_DIARIO')
+    db = schema_editor.connection.alias
+    grupos = (
+        Cita.objects.using(db)
+        .annotate(dia=TruncDate('fecha_cita', tzinfo=timezone.get_current_timezone()))
+        .values('dia', 'servicio_id', 'estatus', 'especie')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    Resumen.objects.using(db).bulk_create(
+        (Resumen(fecha=g['dia'], servicio_id=g['servicio_id'], estatus=g['estatus'],
+                 especie=g['especie'], total=g['n']) for g in grupos.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_cita_slot_inicio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RESUMEN_DIARIO',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estatus', models.CharField(max_length=50)),
+                ('especie', models.CharField(max_length=100)),
+                ('total', models.IntegerField(default=0)),
+                ('servicio', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='app.servicio')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'servicio'], name='resumen_fecha_servicio_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'servicio', 'estatus', 'especie'), name='resumen_llave_unica')],
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
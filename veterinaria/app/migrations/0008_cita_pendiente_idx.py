@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita_veterinaria',
+            index=models.Index(condition=models.Q(('estatus', 'Pendiente')), fields=['fecha_cita', 'id'], name='cita_pendiente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_cita_pendiente_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
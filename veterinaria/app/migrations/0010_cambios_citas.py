@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:54
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def numerar_citas(apps, schema_editor):
+    # Las citas existentes entran a la secuencia en el orden en que se crearon
+    Cita = apps.get_model('app', 'CITA_VETERINARIA')
+    Cita.objects.using(schema_editor.connection.alias).update(secuencia=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_cita_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CITA_BORRADA',
+            fields=[
+                ('cita_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('secuencia', models.PositiveBigIntegerField(db_index=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='secuencia',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(numerar_citas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_cambios_citas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AUDITORIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('modelo', models.CharField(max_length=30)),
+                ('objeto_id', models.BigIntegerField()),
+                ('accion', models.CharField(max_length=10)),
+                ('cambios', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('usuario', models.CharField(blank=True, max_length=150)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='auditoria_objeto_idx'), models.Index(fields=['fecha'], name='auditoria_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_auditoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DUEÑO',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200)),
+                ('nombre_norm', models.CharField(editable=False, max_length=200, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='dueño',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='citas', to='app.dueño'),
+        ),
+        migrations.CreateModel(
+            name='MASCOTA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('especie', models.CharField(max_length=100)),
+                ('nombre_norm', models.CharField(editable=False, max_length=100)),
+                ('especie_norm', models.CharField(editable=False, max_length=100)),
+                ('dueño', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='mascotas', to='app.dueño')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='mascota',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='citas', to='app.mascota'),
+        ),
+        migrations.AddIndex(
+            model_name='cita_veterinaria',
+            index=models.Index(fields=['dueño', 'fecha_cita'], name='cita_dueno_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita_veterinaria',
+            index=models.Index(fields=['mascota', 'fecha_cita'], name='cita_mascota_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['nombre_norm'], name='mascota_nombre_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mascota',
+            constraint=models.UniqueConstraint(fields=('dueño', 'nombre_norm', 'especie_norm'), name='mascota_llave_unica'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+import unicodedata
+
+from django.db import migrations, transaction
+
+BLOQUE = 2000
+LOTE = 500
+
+
+# Copia de app.pacientes al momento de la migración, con los modelos históricos
+def llave(texto):
+    texto = unicodedata.normalize('NFD', (texto or '').lower())
+    return " ".join(''.join(c for c in texto if unicodedata.category(c) != 'Mn').split())
+
+
+def _upsert(modelo, objs, unique_fields, using):
+    # INSERT ... ON CONFLICT DO UPDATE (sin cambiar nada) ... RETURNING id
+    modelo.objects.using(using).bulk_create(
+        objs, batch_size=LOTE, update_conflicts=True, unique_fields=unique_fields, update_fields=['nombre_norm'],
+    )
+    return objs
+
+
+def resolver(ternas, using, Dueño, Mascota):
+    # {(nombre_dueño, nombre_mascota, especie): (dueño_id, mascota_id)}
+    nombres = {}
+    for dueño, _, _ in ternas:
+        nombres.setdefault(llave(dueño), dueño.strip())
+    objs = _upsert(Dueño, [Dueño(nombre=n, nombre_norm=k) for k, n in nombres.items()], ['nombre_norm'], using)
+    dueños = {o.nombre_norm: o.pk for o in objs}
+
+    llaves = {}
+    datos = {}
+    for terna in ternas:
+        dueño, mascota, especie = terna
+        k = (dueños[llave(dueño)], llave(mascota), llave(especie))
+        llaves[terna] = k
+        datos.setdefault(k, (mascota.strip(), especie.strip()))
+    objs = _upsert(Mascota, [
+        Mascota(dueño_id=d, nombre=nombre, especie=especie, nombre_norm=n, especie_norm=e)
+        for (d, n, e), (nombre, especie) in datos.items()
+    ], ['dueño', 'nombre_norm', 'especie_norm'], using)
+    mascotas = {(o.dueño_id, o.nombre_norm, o.especie_norm): o.pk for o in objs}
+    return {terna: (k[0], mascotas[k]) for terna, k in llaves.items()}
+
+
+def enlazar_citas(apps, schema_editor):
+    # Crea los dueños / mascotas (deduplicados por llave normalizada) y enlaza
+    # las citas por bloques de id, cada bloque en su propia transacción: no se
+    # carga la tabla completa y, si se interrumpe, al volver a correr sigue
+    # con las citas que aún no tienen mascota.
+    Cita = apps.get_model('app', 'CITA_VETERINARIA')
+    Dueño, Mascota = apps.get_model('app', 'DUEÑO'), apps.get_model('app', 'MASCOTA')
+    using = schema_editor.connection.alias
+    # Recorre por rango de pk; las que ya tienen mascota se saltan en Python
+    # (filtrar mascota IS NULL en SQL haría leer y ordenar lo pendiente en cada bloque)
+    citas = Cita.objects.using(using).order_by('pk').values_list(
+        'pk', 'mascota_id', 'nombre_dueño', 'nombre_mascota', 'especie'
+    )
+
+    conexion = schema_editor.connection
+    q = conexion.ops.quote_name
+    opts = Cita._meta
+    sql = (
+        f"UPDATE {q(opts.db_table)} SET {q(opts.get_field('dueño').column)} = %s, "
+        f"{q(opts.get_field('mascota').column)} = %s WHERE {q(opts.pk.column)} = %s"
+    )
+
+    conocidas = {}  # terna -> (dueño_id, mascota_id), para no resolverla en cada bloque
+    ultimo = 0
+    while True:
+        bloque = list(citas.filter(pk__gt=ultimo)[:BLOQUE])
+        if not bloque:
+            break
+        ultimo = bloque[-1][0]
+        filas = [(pk, *campos) for pk, mascota_id, *campos in bloque if mascota_id is None]
+        if not filas:
+            continue
+        with transaction.atomic(using=using), conexion.cursor() as cur:
+            faltan = {tuple(f[1:]) for f in filas} - conocidas.keys()
+            if faltan:
+                conocidas.update(resolver(faltan, using, Dueño, Mascota))
+            # Una sentencia preparada para todo el bloque (un UPDATE ... CASE
+            # de miles de ramas o un UPDATE por mascota es mucho más lento)
+            cur.executemany(sql, [(*conocidas[tuple(campos)], pk) for pk, *campos in filas])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('app', '0012_dueno_mascota'),
+    ]
+
+    operations = [
+        migrations.RunPython(enlazar_citas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:12
+
+import hashlib
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+# Copias de app.busqueda al momento de la migración
+def normalizar(texto):
+    texto = unicodedata.normalize('NFD', (texto or '').lower())
+    return ''.join(c for c in texto if unicodedata.category(c) != 'Mn').strip()
+
+
+def hash_descripcion(descripcion):
+    texto = " ".join(normalizar(descripcion).split())
+    return hashlib.sha1(texto.encode()).hexdigest() if texto else None
+
+
+def llenar_llaves(apps, schema_editor):
+    # Calcula las llaves y, antes de crear los índices únicos, reporta los
+    # servicios que chocan. Si hay choques la migración se detiene (y se
+    # revierte) con la lista, para decidir a mano cuál renombrar o fusionar.
+    Servicio = apps.get_model('app', 'SERVICIO')
+    db = schema_editor.connection.alias
+    servicios = list(Servicio.objects.using(db).only('pk', 'nombre', 'descripcion').order_by('pk'))
+    por_nombre = defaultdict(list)
+    por_descripcion = defaultdict(list)
+    for s in servicios:
+        s.nombre_norm = normalizar(s.nombre)
+        s.descripcion_hash = hash_descripcion(s.descripcion)
+        por_nombre[s.nombre_norm].append(s)
+        if s.descripcion_hash:
+            por_descripcion[s.descripcion_hash].append(s)
+    Servicio.objects.using(db).bulk_update(servicios, ['nombre_norm', 'descripcion_hash'], batch_size=500)
+
+    choques = [
+        f"  {campo} {getattr(grupo[0], campo)!r}: " + ", ".join(f"id {s.pk} ({getattr(s, campo)!r})" for s in grupo)
+        for campo, grupos in (('nombre', por_nombre), ('descripcion', por_descripcion))
+        for grupo in grupos.values() if len(grupo) > 1
+    ]
+    if choques:
+        raise RuntimeError(
+            "Hay servicios con el mismo nombre o descripción (sin contar acentos ni mayúsculas). "
+            "Renombra o fusiona estos y vuelve a correr migrate:\n" + "\n".join(choques)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_enlazar_pacientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicio',
+            name='descripcion_hash',
+            field=models.CharField(editable=False, max_length=40, null=True),
+        ),
+        migrations.RunPython(llenar_llaves, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='servicio',
+            name='nombre_norm',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='servicio',
+            constraint=models.UniqueConstraint(fields=('nombre_norm',), name='servicio_nombre_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='servicio',
+            constraint=models.UniqueConstraint(fields=('descripcion_hash',), name='servicio_descripcion_unica'),
+        ),
+    ]
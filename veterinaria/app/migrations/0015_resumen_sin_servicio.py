@@ -0,0 +1,38 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def juntar_sin_servicio(apps, schema_editor):
+    # Antes de la restricción, los deltas de citas sin servicio insertaban una
+    # fila nueva cada vez: se suman en una sola fila por (fecha, estatus, especie)
+    Resumen = apps.get_model('app', 'RESUMEN_DIARIO')
+    db = schema_editor.connection.alias
+    sin_servicio = Resumen.objects.using(db).filter(servicio__isnull=True)
+    grupos = (
+        sin_servicio.values('fecha', 'estatus', 'especie')
+        .annotate(filas=Count('id'), primera=Min('id'), suma=Sum('total'))
+        .filter(filas__gt=1)
+        .order_by()
+    )
+    for g in grupos.iterator():
+        mismas = sin_servicio.filter(fecha=g['fecha'], estatus=g['estatus'], especie=g['especie'])
+        mismas.exclude(pk=g['primera']).delete()
+        mismas.filter(pk=g['primera']).update(total=g['suma'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_servicio_llaves_unicas'),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_sin_servicio, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resumen_diario',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('servicio__isnull', True)), fields=('fecha', 'estatus', 'especie'),
+                name='resumen_sin_servicio_unica',
+            ),
+        ),
+    ]
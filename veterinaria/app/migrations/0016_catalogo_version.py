@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:25
+
+import time
+
+from django.db import migrations, models
+
+
+def crear_version(apps, schema_editor):
+    Version = apps.get_model('app', 'CATALOGO_VERSION')
+    Version.objects.using(schema_editor.connection.alias).get_or_create(
+        pk=1, defaults={'version': int(time.time() * 1000)}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_resumen_sin_servicio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CATALOGO_VERSION',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(crear_version, migrations.RunPython.noop),
+    ]
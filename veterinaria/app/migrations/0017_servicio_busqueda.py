@@ -0,0 +1,42 @@
+import logging
+
+from django.db import OperationalError, migrations
+
+logger = logging.getLogger(__name__)
+
+# Índice FTS5 (trigram) de los nombres de servicio, como el de citas. El SQL
+# va aquí y no importado de app.busqueda, para que la migración no cambie si
+# ese módulo cambia.
+TABLA = 'app_servicio_busqueda'
+
+
+def crear_indice(apps, schema_editor):
+    # Solo SQLite; sin FTS5/trigram el buscador usa el rango sobre nombre_norm
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Servicio = apps.get_model('app', 'SERVICIO')
+    try:
+        with schema_editor.connection.cursor() as cur:
+            cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5(busqueda, tokenize='trigram')")
+            cur.execute(f"DELETE FROM {TABLA}")
+            cur.execute(f"INSERT INTO {TABLA}(rowid, busqueda) SELECT id, nombre_norm FROM {Servicio._meta.db_table}")
+    except OperationalError as e:
+        logger.warning("No se creó el índice FTS5 de servicios (%s); la búsqueda será solo por prefijo.", e)
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_catalogo_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:53
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def llenar_precios(apps, schema_editor):
+    # Lo único que se sabe de las citas que ya existen es el precio actual del
+    # servicio: con él quedan los ingresos igual que antes de esta migración
+    Servicio = apps.get_model('app', 'SERVICIO')
+    Cita = apps.get_model('app', 'CITA_VETERINARIA')
+    Resumen = apps.get_model('app', 'RESUMEN_DIARIO')
+    db = schema_editor.connection.alias
+    precio = Subquery(Servicio.objects.using(db).filter(pk=OuterRef('servicio_id')).values('precio')[:1])
+    Cita.objects.using(db).filter(servicio__isnull=False).update(precio=precio)
+    Resumen.objects.using(db).filter(servicio__isnull=False).update(ingresos=Coalesce(
+        ExpressionWrapper(F('total') * precio, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        Value(0), output_field=DecimalField(max_digits=14, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_servicio_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita_veterinaria',
+            name='precio',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='resumen_diario',
+            name='ingresos',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(llenar_precios, migrations.RunPython.noop),
+    ]
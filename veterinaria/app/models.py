@@ -1,14 +1,370 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, router, transaction
+from django.db.models import F, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from . import auditoria, catalogo, disponibilidad, pacientes, reportes
+from .busqueda import FTS_SERVICIOS, hash_descripcion, normalizar, texto_busqueda, sincronizar_fts, borrar_fts
+
+# Campos de la cita que alimentan la columna de búsqueda
+CAMPOS_BUSQUEDA = {'nombre_dueño', 'nombre_mascota', 'especie', 'estatus', 'servicio', 'servicio_id'}
+# Campos de los que salen el dueño y la mascota (ver pacientes.py)
+CAMPOS_PACIENTE = ('nombre_dueño', 'nombre_mascota', 'especie')
+# Campos que cambian la llave del resumen diario
+CAMPOS_RESUMEN = {'fecha_cita', 'estatus', 'especie', 'servicio', 'servicio_id', 'precio'}
+MSG_SERVICIO_DUPLICADO = "Ya existe un servicio con ese nombre o descripción."
+MSG_CHOQUE = "Ya existe una cita para ese servicio en ese bloque de 30 minutos."
+
+class ServicioQuerySet(models.QuerySet):
+    # bulk_create y update no pasan por save() ni mandan señales: calculan aquí
+    # las llaves normalizadas, el índice FTS del nombre y la versión del catálogo
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for o in objs:
+            o.calcular_llaves()
+        with transaction.atomic(using=self.db, savepoint=False):
+            creados = super().bulk_create(objs, *args, **kwargs)
+            if creados:
+                sincronizar_fts([(o.pk, o.nombre_norm) for o in creados if o.pk], self.db, FTS_SERVICIOS)
+                catalogo.invalidar(self.db)
+        return creados
+
+    def update(self, **kwargs):
+        renombrar = isinstance(kwargs.get('nombre'), str)
+        if renombrar:
+            kwargs['nombre_norm'] = normalizar(kwargs['nombre'])
+        if 'descripcion' in kwargs and isinstance(kwargs['descripcion'], (str, type(None))):
+            kwargs['descripcion_hash'] = hash_descripcion(kwargs['descripcion'])
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True)) if renombrar else []
+            filas = super().update(**kwargs)
+            if pks:
+                sincronizar_fts([(pk, kwargs['nombre_norm']) for pk in pks], self.db, FTS_SERVICIOS)
+                # Como en save(): la búsqueda de sus citas (y su fila en el panel)
+                citas = CITA_VETERINARIA.objects.using(self.db).filter(servicio_id__in=pks)
+                citas.refrescar_busqueda()
+                citas.update(version=F('version') + 1)
+            if filas:
+                catalogo.invalidar(self.db)
+        return filas
+
 
 # Create your models here.
 class SERVICIO(models.Model):
     nombre = models.CharField(max_length=100)
-    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    precio = models.DecimalField(max_digits=10, decimal_places=2, db_index=True)
     descripcion = models.TextField(max_length=250, null= True)
+    # Nombre sin acentos y en minúsculas para el buscador (y llave única)
+    nombre_norm = models.CharField(max_length=100, default='', editable=False)
+    # sha1 de la descripción normalizada (llave única, ver hash_descripcion)
+    descripcion_hash = models.CharField(max_length=40, null=True, editable=False)
+
+    objects = ServicioQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # "Vacunación" y "vacunacion" son el mismo servicio
+            models.UniqueConstraint(fields=['nombre_norm'], name='servicio_nombre_unico'),
+            models.UniqueConstraint(fields=['descripcion_hash'], name='servicio_descripcion_unica'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        servicio = super().from_db(db, field_names, values)
+        servicio._auditoria = auditoria.instantanea(servicio)
+        return servicio
+
+    def calcular_llaves(self):
+        self.nombre_norm = normalizar(self.nombre)
+        self.descripcion_hash = hash_descripcion(self.descripcion)
+
+    def clean(self):
+        # Las llaves no son editables y validate_constraints se las salta (admin,
+        # ModelForm): se revisan aquí para mostrar el error en vez de un 500
+        self.calcular_llaves()
+        otros = SERVICIO.objects.all() if self._state.adding else SERVICIO.objects.exclude(pk=self.pk)
+        errores = {}
+        if otros.filter(nombre_norm=self.nombre_norm).exists():
+            errores['nombre'] = MSG_SERVICIO_DUPLICADO
+        if self.descripcion_hash and otros.filter(descripcion_hash=self.descripcion_hash).exists():
+            errores['descripcion'] = MSG_SERVICIO_DUPLICADO
+        if errores:
+            raise ValidationError(errores)
+
+    def save(self, *args, **kwargs):
+        self.calcular_llaves()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'nombre_norm'} if 'nombre' in update_fields else set()
+            if 'descripcion' in update_fields:
+                extra.add('descripcion_hash')
+            kwargs['update_fields'] = set(update_fields) | extra
+        nombre_anterior = None
+        if self.pk and not self._state.adding:
+            # El nombre con el que se leyó (from_db); sin él, se consulta
+            nombre_anterior = getattr(self, '_auditoria', {}).get('nombre')
+            if nombre_anterior is None:
+                nombre_anterior = SERVICIO.objects.filter(pk=self.pk).values_list('nombre', flat=True).first()
+        kwargs['using'] = using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            if nombre_anterior != self.nombre:  # alta o cambio de nombre
+                sincronizar_fts([(self.pk, self.nombre_norm)], using, FTS_SERVICIOS)
+            # Si cambió el nombre hay que rehacer la búsqueda de sus citas (y su fila en el panel)
+            if nombre_anterior is not None and nombre_anterior != self.nombre:
+                citas = CITA_VETERINARIA.objects.using(using).filter(servicio=self)
+                citas.refrescar_busqueda()
+                citas.update(version=F('version') + 1)
+        # Para el siguiente save(): el nombre que ya quedó guardado
+        self._auditoria = {**getattr(self, '_auditoria', {}), 'nombre': self.nombre}
+
+    def __str__(self):
+        return self.nombre
+
+
+def campo_duplicado(error):
+    """
+    Campo ('nombre' / 'descripcion') cuya llave única de SERVICIO rechazó la
+    escritura, o None si el IntegrityError es por otra cosa.
+    """
+    texto = str(error)
+    for campo, restriccion, columna in (
+        ('nombre', 'servicio_nombre_unico', 'nombre_norm'),
+        ('descripcion', 'servicio_descripcion_unica', 'descripcion_hash'),
+    ):
+        # PostgreSQL nombra la restricción; SQLite, la tabla.columna
+        if restriccion in texto or f"{SERVICIO._meta.db_table}.{columna}" in texto:
+            return campo
+    return None
+
+
+class DUEÑO(models.Model):
+    nombre = models.CharField(max_length=200)
+    # Llave de deduplicación y de autocompletar (ver pacientes.py)
+    nombre_norm = models.CharField(max_length=200, unique=True, editable=False)
+
+    def clean(self):
+        # nombre_norm no es editable: la llave única se revisa aquí (admin)
+        self.nombre_norm = pacientes.llave(self.nombre)
+        otros = DUEÑO.objects.all() if self._state.adding else DUEÑO.objects.exclude(pk=self.pk)
+        if otros.filter(nombre_norm=self.nombre_norm).exists():
+            raise ValidationError({'nombre': "Ya existe un dueño con ese nombre."})
+
+    def save(self, *args, **kwargs):
+        self.nombre_norm = pacientes.llave(self.nombre)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.nombre
 
+
+class MASCOTA(models.Model):
+    # El índice de (dueño, ...) es el de la llave única
+    dueño = models.ForeignKey(DUEÑO, on_delete=models.PROTECT, related_name='mascotas', db_index=False)
+    nombre = models.CharField(max_length=100)
+    especie = models.CharField(max_length=100)
+    nombre_norm = models.CharField(max_length=100, editable=False)
+    especie_norm = models.CharField(max_length=100, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dueño', 'nombre_norm', 'especie_norm'], name='mascota_llave_unica'
+            ),
+        ]
+        indexes = [
+            # Autocompletar sin dueño elegido
+            models.Index(fields=['nombre_norm'], name='mascota_nombre_idx'),
+        ]
+
+    def clean(self):
+        # Igual que DUEÑO.clean(), para mascota_llave_unica
+        self.nombre_norm = pacientes.llave(self.nombre)
+        self.especie_norm = pacientes.llave(self.especie)
+        if self.dueño_id is None:
+            return
+        otras = MASCOTA.objects.all() if self._state.adding else MASCOTA.objects.exclude(pk=self.pk)
+        if otras.filter(dueño_id=self.dueño_id, nombre_norm=self.nombre_norm, especie_norm=self.especie_norm).exists():
+            raise ValidationError({'nombre': "Ese dueño ya tiene una mascota con ese nombre y especie."})
+
+    def save(self, *args, **kwargs):
+        self.nombre_norm = pacientes.llave(self.nombre)
+        self.especie_norm = pacientes.llave(self.especie)
+        super().save(*args, **kwargs)
+
+    def historial(self):
+        """Citas de la mascota, de la más reciente a la más antigua (índice mascota, fecha)."""
+        return self.citas.order_by('-fecha_cita', '-id')
+
+    def __str__(self):
+        return f"{self.nombre} ({self.especie})"
+
+
+def _siguiente_secuencia():
+    # Secuencia de cambios (ver cambios.py): uno más que la mayor entre citas y
+    # bajas, calculada dentro del mismo INSERT/UPDATE. Con SQLite las escrituras
+    # van una a la vez (BEGIN IMMEDIATE), así que el orden de la secuencia es
+    # el orden de los commits y un lector nunca se salta un cambio.
+    def ultima(modelo):
+        return Coalesce(Subquery(modelo.objects.order_by('-secuencia').values('secuencia')[:1]), Value(0))
+    return Greatest(ultima(CITA_VETERINARIA), ultima(CITA_BORRADA)) + 1
+
+
+def ultima_secuencia(using):
+    """Mayor secuencia entre citas y bajas (una consulta por índice)."""
+    citas = CITA_VETERINARIA._meta.db_table
+    bajas = CITA_BORRADA._meta.db_table
+    with connections[using].cursor() as cur:
+        cur.execute(
+            f'SELECT COALESCE(MAX("secuencia"), 0) FROM "{citas}" '
+            f'UNION ALL SELECT COALESCE(MAX("secuencia"), 0) FROM "{bajas}"'
+        )
+        return max(fila[0] for fila in cur.fetchall())
+
+
+def _registrar_bajas(pks, using):
+    # Antes de borrar: si la cita borrada era la de mayor secuencia, la baja
+    # todavía queda por encima de ella
+    if not pks:
+        return
+    # Una sola baja: la secuencia se calcula en el mismo INSERT; un lote la lee una vez
+    secuencia = _siguiente_secuencia() if len(pks) == 1 else ultima_secuencia(using) + 1
+    CITA_BORRADA.objects.using(using).bulk_create(
+        [CITA_BORRADA(cita_id=pk, secuencia=secuencia) for pk in pks],
+        ignore_conflicts=True,
+    )
+
+
+class CitaQuerySet(models.QuerySet):
+    # Mantiene `busqueda` (y el índice FTS), la disponibilidad y el resumen
+    # diario al día en bulk_create, update y delete, que no pasan por save().
+    # Marcan _for_write para que, con el router de lectura (routers.py), las
+    # lecturas auxiliares también vayan a la base de escritura.
+
+    def _llaves_resumen(self):
+        return list(self.values_list(*reportes.CAMPOS_RESUMEN))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self._for_write = True
+        servicios = {pk: (nombre, precio) for pk, nombre, precio in SERVICIO.objects.filter(
+            pk__in={o.servicio_id for o in objs if o.servicio_id}
+        ).values_list('pk', 'nombre', 'precio')}
+        for o in objs:
+            nombre, precio = servicios.get(o.servicio_id, ('', None))
+            o.busqueda = o.calcular_busqueda(nombre)
+            o.slot_inicio = o.calcular_slot()
+            if o.precio is None:
+                o.precio = precio
+        with transaction.atomic(using=self.db, savepoint=False):
+            pacientes.asignar([o for o in objs if o.mascota_id is None], self.db)
+            # Todo el lote con la misma secuencia, leída dentro de la transacción
+            secuencia = ultima_secuencia(self.db) + 1
+            for o in objs:
+                o.secuencia = secuencia
+            creados = super().bulk_create(objs, *args, **kwargs)
+            sincronizar_fts([(o.pk, o.busqueda) for o in creados if o.pk], self.db)
+            reportes.aplicar(sumar=[o.valores_resumen() for o in creados], using=self.db)
+        disponibilidad.invalidar_todo()
+        return creados
+
+    def update(self, **kwargs):
+        self._for_write = True
+        if set(kwargs) - {'busqueda', 'version'}:
+            disponibilidad.invalidar_todo()
+            # Cambia lo que se ve de la cita: nueva versión (ver fragmentos.py)
+            kwargs.setdefault('version', F('version') + 1)
+        if set(kwargs) - {'busqueda', 'secuencia'}:
+            kwargs.setdefault('secuencia', _siguiente_secuencia())
+        if ('servicio' in kwargs or 'servicio_id' in kwargs) and 'precio' not in kwargs:
+            kwargs['precio'] = self._precio_de(kwargs.get('servicio', kwargs.get('servicio_id')))
+        if 'fecha_cita' in kwargs and 'slot_inicio' not in kwargs:
+            # El bloque se deriva de la fecha; solo se admiten valores concretos
+            if not hasattr(kwargs['fecha_cita'], 'replace'):
+                raise ValueError("update(fecha_cita=...) requiere un datetime para calcular slot_inicio.")
+            kwargs['slot_inicio'] = disponibilidad.floor_to_half_hour(kwargs['fecha_cita'])
+        # Campos auditados que cambian (la bitácora guarda antes / después)
+        auditados = [c for c in auditoria.CAMPOS['cita_veterinaria'] if c in kwargs or c.removesuffix('_id') in kwargs]
+        if not (CAMPOS_BUSQUEDA | CAMPOS_RESUMEN).intersection(kwargs) and not auditados:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            mismos = self.model.objects.using(self.db).filter(pk__in=pks)
+            antes = mismos._llaves_resumen() if CAMPOS_RESUMEN.intersection(kwargs) else []
+            previos = mismos._valores_auditados(auditados) if auditados else {}
+            filas = super().update(**kwargs)
+            if CAMPOS_BUSQUEDA.intersection(kwargs):
+                mismos.refrescar_busqueda()
+            if set(CAMPOS_PACIENTE).intersection(kwargs) and not {'mascota', 'mascota_id'}.intersection(kwargs):
+                mismos.enlazar_pacientes()
+            if antes:
+                reportes.aplicar(restar=antes, sumar=mismos._llaves_resumen(), using=self.db)
+            if auditados:
+                auditoria.registrar_cambios(self.model, previos, mismos._valores_auditados(auditados), self.db)
+        return filas
+
+    def _precio_de(self, servicio):
+        # Precio que toman las citas al pasar a `servicio` (instancia, id o None)
+        if servicio is None:
+            return None
+        if isinstance(servicio, SERVICIO):
+            return servicio.precio
+        if hasattr(servicio, 'resolve_expression'):
+            raise ValueError("update(servicio=...) requiere un servicio o su id para fijar el precio.")
+        return SERVICIO.objects.using(self.db).filter(pk=servicio).values_list('precio', flat=True).first()
+
+    def enlazar_pacientes(self):
+        # Vuelve a calcular dueño / mascota desde el texto; regresa cuántas filas enlazó
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            filas = list(self.values_list('pk', *CAMPOS_PACIENTE))
+            for (dueño_id, mascota_id), pks in pacientes.enlazar(filas, self.db).items():
+                # Directo al UPDATE base: no es un cambio visible de la cita
+                models.QuerySet.update(
+                    self.model.objects.using(self.db).filter(pk__in=pks), dueño_id=dueño_id, mascota_id=mascota_id
+                )
+        return len(filas)
+
+    def _valores_auditados(self, campos):
+        return {pk: dict(zip(campos, valores)) for pk, *valores in self.values_list('pk', *campos)}
+
+    def delete(self):
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            antes = self.model.objects.using(self.db).filter(pk__in=pks)._llaves_resumen()
+            _registrar_bajas(pks, self.db)
+            resultado = super().delete()
+            borrar_fts(pks, self.db)
+            reportes.aplicar(restar=antes, using=self.db)
+        disponibilidad.invalidar_todo()
+        return resultado
+
+    def refrescar_busqueda(self, chunk_size=1000):
+        self._for_write = True
+        # Recalcula `busqueda` por bloques; regresa cuántas filas procesó
+        total = 0
+        filas = self.order_by('pk').values_list(
+            'pk', 'nombre_dueño', 'nombre_mascota', 'especie', 'estatus', 'servicio__nombre'
+        )
+        bloque = []
+        for pk, *campos in filas.iterator(chunk_size=chunk_size):
+            bloque.append(CITA_VETERINARIA(pk=pk, busqueda=texto_busqueda(*campos)))
+            if len(bloque) >= chunk_size:
+                total += self._guardar_busqueda(bloque)
+                bloque = []
+        if bloque:
+            total += self._guardar_busqueda(bloque)
+        return total
+
+    def _guardar_busqueda(self, bloque):
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.model.objects.using(self.db).bulk_update(bloque, ['busqueda'])
+            sincronizar_fts([(c.pk, c.busqueda) for c in bloque], self.db)
+        return len(bloque)
+
 class CITA_VETERINARIA(models.Model):
     nombre_dueño = models.CharField(max_length=200)
     nombre_mascota = models.CharField(max_length=100)
@@ -17,8 +373,261 @@ class CITA_VETERINARIA(models.Model):
     motivo = models.CharField(max_length=255)
     estatus = models.CharField(max_length=50)
     servicio = models.ForeignKey(SERVICIO, on_delete= models.PROTECT, null=True)
+    # Texto normalizado (sin acentos, minúsculas) para el buscador
+    busqueda = models.TextField(default='', editable=False)
+    # Inicio del bloque de 30 min; con el servicio forma la llave única de la agenda
+    slot_inicio = models.DateTimeField(null=True, editable=False)
+    # Sube en cada cambio; es parte de la llave del cache de filas del panel
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Precio del servicio al agendar (o al cambiarle el servicio): los ingresos
+    # del resumen diario salen de aquí, no del precio actual del catálogo
+    precio = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    # Orden global de los cambios, para el feed de cambios (ver cambios.py)
+    secuencia = models.PositiveBigIntegerField(default=0, editable=False, db_index=True)
+    # Dueño y mascota deduplicados, a partir del texto de arriba (ver pacientes.py).
+    # Los índices compuestos con fecha_cita sirven para el historial.
+    dueño = models.ForeignKey(
+        DUEÑO, on_delete=models.PROTECT, null=True, editable=False, db_index=False, related_name='citas'
+    )
+    mascota = models.ForeignKey(
+        MASCOTA, on_delete=models.PROTECT, null=True, editable=False, db_index=False, related_name='citas'
+    )
+
+    objects = CitaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Para la paginación por cursor del panel de citas
+            models.Index(fields=['fecha_cita', 'id'], name='cita_fecha_id_idx'),
+            # Solo las pendientes: para el cierre automático (ver cierre.py)
+            models.Index(
+                fields=['fecha_cita', 'id'], name='cita_pendiente_fecha_idx',
+                condition=Q(estatus='Pendiente'),
+            ),
+            # Historial por dueño / por mascota
+            models.Index(fields=['dueño', 'fecha_cita'], name='cita_dueno_fecha_idx'),
+            models.Index(fields=['mascota', 'fecha_cita'], name='cita_mascota_fecha_idx'),
+        ]
+        constraints = [
+            # Un servicio no puede tener dos citas activas en el mismo bloque
+            models.UniqueConstraint(
+                fields=['servicio', 'slot_inicio'],
+                condition=~Q(estatus__in=disponibilidad.ESTATUS_LIBERA),
+                name='cita_bloque_unico',
+            ),
+        ]
+
+    def calcular_busqueda(self, servicio_nombre=None):
+        if servicio_nombre is None:
+            servicio_nombre = self.servicio.nombre if self.servicio_id else ''
+        return texto_busqueda(
+            self.nombre_dueño, self.nombre_mascota, self.especie, self.estatus, servicio_nombre
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        cita = super().from_db(db, field_names, values)
+        # Valores originales: para mover la disponibilidad y el resumen diario
+        if all(c in cita.__dict__ for c in reportes.CAMPOS_RESUMEN):
+            cita._original = cita.valores_resumen()
+        cita._auditoria = auditoria.instantanea(cita)
+        return cita
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        # Si se releyó algo del resumen, los originales de antes ya no sirven:
+        # save() los vuelve a leer (cargar un campo diferido no cuenta)
+        if fields is None or set(reportes.CAMPOS_RESUMEN).intersection(fields):
+            self.__dict__.pop('_original', None)
+
+    def valores_resumen(self):
+        return tuple(getattr(self, c) for c in reportes.CAMPOS_RESUMEN)
+
+    def _valores_originales(self, using):
+        if hasattr(self, '_original'):
+            return self._original
+        if self._state.adding or self.pk is None:
+            return None
+        # Instancia cargada con only()/defer(): se leen de la base
+        return CITA_VETERINARIA.objects.using(using).filter(pk=self.pk).values_list(
+            *reportes.CAMPOS_RESUMEN
+        ).first()
+
+    def _despues_de_guardar(self, original, nuevo, using):
+        if original != nuevo:
+            reportes.aplicar(
+                restar=[original] if original else [],
+                sumar=[nuevo] if nuevo else [],
+                using=using,
+            )
+        if original:
+            disponibilidad.invalidar(original[1], original[0])
+        if nuevo:
+            disponibilidad.invalidar(nuevo[1], nuevo[0])
+        self._original = nuevo
+
+    def _pacientes_cambiaron(self, update_fields):
+        if update_fields is not None and not set(CAMPOS_PACIENTE).intersection(update_fields):
+            return False
+        if self.mascota_id is None:
+            return True
+        antes = getattr(self, '_auditoria', {})
+        return any(antes.get(c) != getattr(self, c) for c in CAMPOS_PACIENTE)
+
+    def calcular_slot(self):
+        return disponibilidad.floor_to_half_hour(self.fecha_cita) if self.fecha_cita else None
+
+    def clean(self):
+        # slot_inicio no es editable y validate_constraints se salta
+        # cita_bloque_unico (admin, ModelForm): se revisa aquí
+        if self.servicio_id is None or self.fecha_cita is None or self.estatus in disponibilidad.ESTATUS_LIBERA:
+            return
+        ocupado = CITA_VETERINARIA.objects.filter(
+            servicio_id=self.servicio_id, slot_inicio=self.calcular_slot(),
+        ).exclude(estatus__in=disponibilidad.ESTATUS_LIBERA)
+        if not self._state.adding:
+            ocupado = ocupado.exclude(pk=self.pk)
+        if ocupado.exists():
+            raise ValidationError({'fecha_cita': MSG_CHOQUE})
+
+    def save(self, *args, **kwargs):
+        self.slot_inicio = self.calcular_slot()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'fecha_cita' in update_fields:
+            kwargs['update_fields'] = update_fields = set(update_fields) | {'slot_inicio'}
+        # La misma base que usará Model.save (la de escritura si hay router)
+        kwargs['using'] = using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        original = self._valores_originales(using)
+        incrementar = not self._state.adding
+        self.secuencia = _siguiente_secuencia()
+        if incrementar:
+            # En la base, para no perder incrementos si dos requests guardan la misma cita
+            self.version = F('version') + 1
+        pacientes_cambiaron = self._pacientes_cambiaron(update_fields)
+        # El precio se fija al crear la cita o al cambiarle el servicio
+        fijar_precio = (original is None or original[1] != self.servicio_id) and (
+            update_fields is None or {'servicio', 'servicio_id'}.intersection(update_fields)
+        )
+        if fijar_precio:
+            self.precio = self.servicio.precio if self.servicio_id else None
+        if update_fields is not None:
+            extra = {'secuencia', 'version'} if incrementar else {'secuencia'}
+            if fijar_precio:
+                extra.add('precio')
+            if pacientes_cambiaron:
+                extra |= {'dueño', 'mascota'}
+            kwargs['update_fields'] = update_fields = set(update_fields) | extra
+        # savepoint=False (como Model.save_base): todo o nada, pero sin un
+        # SAVEPOINT más dentro de la transacción de quien llama
+        with transaction.atomic(using=using, savepoint=False):
+            if pacientes_cambiaron:
+                pacientes.asignar([self], using)
+            if update_fields is not None and not CAMPOS_BUSQUEDA.intersection(update_fields):
+                super().save(*args, **kwargs)
+            else:
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(update_fields) | {'busqueda'}
+                self.busqueda = self.calcular_busqueda()
+                super().save(*args, **kwargs)
+                sincronizar_fts([(self.pk, self.busqueda)], using)
+            self._despues_de_guardar(original, self.valores_resumen(), using)
+        # Quedan diferidos: se leen de la base la próxima vez que se usen
+        del self.secuencia
+        if incrementar:
+            del self.version
+
+    def delete(self, using=None, keep_parents=False):
+        pk = self.pk
+        using = using or router.db_for_write(self.__class__, instance=self)
+        original = self._valores_originales(using)
+        with transaction.atomic(using=using, savepoint=False):
+            _registrar_bajas([pk], using)
+            resultado = super().delete(using=using, keep_parents=keep_parents)
+            borrar_fts([pk], using)
+            self._despues_de_guardar(original, None, using)
+        return resultado
 
     def __str__(self):
         return self.nombre_dueño
-    
 
+
+def choque_de_bloque(error):
+    """True si el IntegrityError es de cita_bloque_unico (bloque ya ocupado)."""
+    texto = str(error)
+    tabla = CITA_VETERINARIA._meta.db_table
+    # PostgreSQL nombra la restricción; SQLite, las columnas
+    return 'cita_bloque_unico' in texto or f"{tabla}.servicio_id, {tabla}.slot_inicio" in texto
+
+
+class CATALOGO_VERSION(models.Model):
+    # Una sola fila (pk=1): versión del catálogo de servicios (ver catalogo.py)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"Catálogo {self.version}"
+
+
+class CITA_BORRADA(models.Model):
+    # Baja de una cita, para que el feed de cambios la reporte (ver cambios.py)
+    cita_id = models.BigIntegerField(primary_key=True)
+    secuencia = models.PositiveBigIntegerField(db_index=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cita {self.cita_id} borrada"
+
+
+class AUDITORIA(models.Model):
+    # Bitácora de cambios de citas y servicios; solo se agregan filas (ver auditoria.py)
+    fecha = models.DateTimeField()
+    modelo = models.CharField(max_length=30)
+    objeto_id = models.BigIntegerField()
+    accion = models.CharField(max_length=10)  # alta / cambio / baja
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder)  # {campo: [antes, después]}
+    usuario = models.CharField(max_length=150, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='auditoria_objeto_idx'),
+            models.Index(fields=['fecha'], name='auditoria_fecha_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("La bitácora de auditoría no se modifica.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("La bitácora de auditoría no se borra.")
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id}: {self.accion}"
+
+
+class RESUMEN_DIARIO(models.Model):
+    # Citas por día / servicio / estatus / especie (ver reportes.py)
+    fecha = models.DateField()
+    servicio = models.ForeignKey(SERVICIO, on_delete=models.CASCADE, null=True)
+    estatus = models.CharField(max_length=50)
+    especie = models.CharField(max_length=100)
+    total = models.IntegerField(default=0)
+    # Suma del precio de esas citas (el de cada cita, ver CITA_VETERINARIA.precio)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'servicio', 'estatus', 'especie'], name='resumen_llave_unica'
+            ),
+            # NULL no choca con NULL: las citas sin servicio necesitan su propia llave
+            models.UniqueConstraint(
+                fields=['fecha', 'estatus', 'especie'], condition=models.Q(servicio__isnull=True),
+                name='resumen_sin_servicio_unica',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'servicio'], name='resumen_fecha_servicio_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.servicio_id} {self.estatus} {self.especie}: {self.total}"
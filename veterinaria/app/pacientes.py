@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+from .busqueda import FIN, normalizar
+
+# Dueños y mascotas como entidades (DUEÑO / MASCOTA).
+# La cita conserva el texto que se capturó y además apunta al dueño y a la
+# mascota, que se identifican por una llave normalizada: sin acentos, en
+# minúsculas y con espacios simples. "Ana  López" y "ana lopez" son el mismo
+# dueño; la mascota es (dueño, nombre, especie). Se resuelven con un upsert
+# por lote sobre esas llaves únicas, así dos requests que capturan al mismo
+# dueño a la vez terminan con el mismo id.
+
+LOTE = 500
+LIMITE_SUGERENCIAS = 10
+
+
+def llave(texto):
+    return " ".join(normalizar(texto).split())
+
+
+def _modelos():
+    from .models import DUEÑO, MASCOTA
+    return DUEÑO, MASCOTA
+
+
+def _upsert(modelo, objs, unique_fields, using):
+    # INSERT ... ON CONFLICT DO UPDATE (sin cambiar nada) ... RETURNING id: una
+    # consulta por lote, exista o no la fila, y cada objeto queda con su pk
+    modelo.objects.using(using).bulk_create(
+        objs, batch_size=LOTE, update_conflicts=True, unique_fields=unique_fields, update_fields=["nombre_norm"],
+    )
+    return objs
+
+
+def _dueños(Dueño, nombres, using):
+    # nombres: {llave: nombre a mostrar} -> {llave: id}
+    objs = _upsert(Dueño, [Dueño(nombre=n, nombre_norm=k) for k, n in nombres.items()], ["nombre_norm"], using)
+    return {o.nombre_norm: o.pk for o in objs}
+
+
+def _mascotas(Mascota, datos, using):
+    # datos: {(dueño_id, nombre_norm, especie_norm): (nombre, especie)} -> {llave: id}
+    objs = [
+        Mascota(dueño_id=d, nombre=nombre, especie=especie, nombre_norm=n, especie_norm=e)
+        for (d, n, e), (nombre, especie) in datos.items()
+    ]
+    _upsert(Mascota, objs, ["dueño", "nombre_norm", "especie_norm"], using)
+    return {(o.dueño_id, o.nombre_norm, o.especie_norm): o.pk for o in objs}
+
+
+def resolver(ternas, using):
+    """
+    {(nombre_dueño, nombre_mascota, especie): (dueño_id, mascota_id)} para cada
+    terna; crea los dueños y mascotas que falten.
+    """
+    Dueño, Mascota = _modelos()
+    ternas = set(ternas)
+    nombres = {}
+    for dueño, _, _ in ternas:
+        nombres.setdefault(llave(dueño), dueño.strip())
+    dueños = _dueños(Dueño, nombres, using)
+
+    llaves = {}
+    datos = {}
+    for terna in ternas:
+        dueño, mascota, especie = terna
+        k = (dueños[llave(dueño)], llave(mascota), llave(especie))
+        llaves[terna] = k
+        datos.setdefault(k, (mascota.strip(), especie.strip()))
+    mascotas = _mascotas(Mascota, datos, using)
+    return {terna: (k[0], mascotas[k]) for terna, k in llaves.items()}
+
+
+def terna(cita):
+    return (cita.nombre_dueño or "", cita.nombre_mascota or "", cita.especie or "")
+
+
+def asignar(citas, using):
+    """Pone dueño_id / mascota_id en cada cita (instancias sin guardar o por guardar)."""
+    ids = resolver([terna(c) for c in citas], using)
+    for c in citas:
+        c.dueño_id, c.mascota_id = ids[terna(c)]
+
+
+def enlazar(filas, using):
+    """
+    Para citas ya guardadas: `filas` = [(pk, nombre_dueño, nombre_mascota, especie)].
+    Regresa {(dueño_id, mascota_id): [pks]}, para un UPDATE por grupo.
+    """
+    conocidas = resolver({tuple(f[1:]) for f in filas}, using)
+    grupos = defaultdict(list)
+    for pk, *campos in filas:
+        grupos[conocidas[tuple(campos)]].append(pk)
+    return grupos
+
+
+# --- Autocompletar (consultas por rango sobre los índices de nombre_norm) ---
+
+def _empieza_con(texto):
+    k = llave(texto)
+    return {"nombre_norm__gte": k, "nombre_norm__lt": k + FIN}
+
+
+def sugerir_dueños(q, limite=LIMITE_SUGERENCIAS):
+    Dueño, _ = _modelos()
+    if not llave(q):
+        return Dueño.objects.none()
+    return Dueño.objects.filter(**_empieza_con(q)).order_by("nombre_norm").values("id", "nombre")[:limite]
+
+
+def sugerir_mascotas(q, dueño="", limite=LIMITE_SUGERENCIAS):
+    _, Mascota = _modelos()
+    if not llave(q):
+        return Mascota.objects.none()
+    qs = Mascota.objects.filter(**_empieza_con(q))
+    if llave(dueño):
+        # Mascotas de ese dueño: índice único (dueño, nombre_norm, especie_norm)
+        qs = qs.filter(dueño__nombre_norm=llave(dueño))
+    return qs.order_by("nombre_norm").values("id", "nombre", "especie", "dueño__nombre")[:limite]
@@ -0,0 +1,130 @@
+import base64
+from datetime import UTC, datetime, time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# Paginación por cursor (keyset) sobre (fecha_cita, id).
+# En lugar de OFFSET se pide "lo que sigue después de esta fila", así cada
+# página cuesta lo mismo sin importar cuántas citas haya en la tabla.
+
+POR_PAGINA_DEFAULT = getattr(settings, "CITAS_POR_PAGINA", 25)
+POR_PAGINA_MAX = getattr(settings, "CITAS_POR_PAGINA_MAX", 200)
+
+
+def codificar_cursor(cita):
+    raw = f"{cita.fecha_cita.isoformat()}|{cita.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(token):
+    # Regresa (fecha, id) o None si el token no es válido (el cursor viene
+    # en la URL: cualquier cosa que no se pueda consultar se ignora)
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        fecha_txt, pk_txt = raw.split("|", 1)
+        fecha = datetime.fromisoformat(fecha_txt)
+        pk = int(pk_txt)
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha, timezone.get_current_timezone())
+        # La base guarda UTC: una fecha en los extremos (año 1 / 9999) se sale aquí
+        fecha = fecha.astimezone(UTC)
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        return None
+    return fecha, pk
+
+
+def leer_por_pagina(valor):
+    try:
+        n = int(valor)
+    except (TypeError, ValueError):
+        return POR_PAGINA_DEFAULT
+    return max(1, min(n, POR_PAGINA_MAX))
+
+
+def _despues_de(qs, fecha, pk, limite):
+    cond = Q(fecha_cita__gt=fecha) | Q(fecha_cita=fecha, id__gt=pk)
+    return qs.filter(cond).order_by("fecha_cita", "id")[:limite]
+
+
+def _antes_de(qs, fecha, pk, limite):
+    # Orden descendente; _armar las voltea
+    cond = Q(fecha_cita__lt=fecha) | Q(fecha_cita=fecha, id__lt=pk)
+    return qs.filter(cond).order_by("-fecha_cita", "-id")[:limite]
+
+
+def _consultas(qs, despues, antes, n):
+    # Querysets que necesita la página (son independientes entre sí, así la
+    # versión síncrona y la asíncrona solo cambian en cómo los evalúan)
+    cursor_despues = decodificar_cursor(despues)
+    if cursor_despues:
+        return "despues", [_despues_de(qs, *cursor_despues, n + 1)]
+    cursor_antes = decodificar_cursor(antes)
+    if cursor_antes:
+        return "antes", [_antes_de(qs, *cursor_antes, n + 1)]
+    # Ventana por defecto: mitad antes de hoy y el resto a partir de hoy.
+    # id > 0 siempre se cumple, así las citas de las 00:00 quedan en la segunda mitad
+    inicio_hoy = timezone.make_aware(
+        datetime.combine(timezone.localdate(), time.min),
+        timezone.get_current_timezone(),
+    )
+    mitad = n // 2
+    return "ventana", [_antes_de(qs, inicio_hoy, 0, mitad + 1), _despues_de(qs, inicio_hoy, 0, n + 1)]
+
+
+def _armar(modo, resultados, n, despues=None, antes=None):
+    if modo == "despues":
+        filas = resultados[0]
+        hay_siguiente = len(filas) > n
+        filas = filas[:n]
+        hay_anterior = True
+    elif modo == "antes":
+        filas = resultados[0][::-1]
+        hay_anterior = len(filas) > n
+        filas = filas[-n:]
+        hay_siguiente = True
+    else:
+        mitad = n // 2
+        previas = resultados[0][::-1]
+        hay_anterior = len(previas) > mitad
+        previas = previas[-mitad:] if mitad else []
+        resto = n - len(previas)
+        siguientes = resultados[1]
+        hay_siguiente = len(siguientes) > resto
+        filas = previas + siguientes[:resto]
+
+    if not filas and modo != "ventana":
+        # Página vacía (p. ej. se borraron las citas de la última): el cursor
+        # que llegó sirve para regresar
+        return {
+            "citas": filas,
+            "cursor_siguiente": antes if modo == "antes" else None,
+            "cursor_anterior": despues if modo == "despues" else None,
+            "por_pagina": n,
+        }
+    return {
+        "citas": filas,
+        "cursor_siguiente": codificar_cursor(filas[-1]) if filas and hay_siguiente else None,
+        "cursor_anterior": codificar_cursor(filas[0]) if filas and hay_anterior else None,
+        "por_pagina": n,
+    }
+
+
+def paginar_citas(qs, despues=None, antes=None, por_pagina=None):
+    """
+    Regresa un dict con la página de citas y los cursores para moverse.
+    Sin cursor se arma una ventana centrada en el día de hoy.
+    """
+    n = por_pagina or POR_PAGINA_DEFAULT
+    modo, consultas = _consultas(qs, despues, antes, n)
+    return _armar(modo, [list(c) for c in consultas], n, despues, antes)
+
+
+async def apaginar_citas(qs, despues=None, antes=None, por_pagina=None):
+    # Igual que paginar_citas, con el ORM asíncrono
+    n = por_pagina or POR_PAGINA_DEFAULT
+    modo, consultas = _consultas(qs, despues, antes, n)
+    return _armar(modo, [[c async for c in consulta] for consulta in consultas], n, despues, antes)
@@ -0,0 +1,185 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+# Reportes de ingresos y volumen.
+# RESUMEN_DIARIO guarda cuántas citas hay por (día, servicio, estatus,
+# especie) y la suma de sus precios. Se actualiza con deltas cada vez que una
+# cita se crea, cambia o se borra, así los reportes nunca leen la tabla de
+# citas. Cada cita guarda el precio con el que se agendó: cambiar el precio
+# del servicio no mueve los ingresos de días pasados.
+
+# Los cuatro primeros forman la llave; el último es el monto
+CAMPOS_RESUMEN = ("fecha_cita", "servicio_id", "estatus", "especie", "precio")
+ESTATUS_INGRESO = "Completada"
+ESTATUS_INASISTENCIA = "No asistió"
+PERIODOS = {"dia": "day", "semana": "week", "mes": "month"}
+
+
+def llave(fecha_cita, servicio_id, estatus, especie):
+    return (timezone.localtime(fecha_cita).date(), servicio_id, estatus, especie)
+
+
+def aplicar(restar=(), sumar=(), using="default"):
+    """
+    Aplica los cambios al resumen. `restar` y `sumar` son tuplas con los
+    valores de CAMPOS_RESUMEN de cada cita (antes / después del cambio).
+    """
+    deltas = {}
+    for signo, filas in ((-1, restar), (1, sumar)):
+        for *campos, precio in filas:
+            delta = deltas.setdefault(llave(*campos), [0, 0])
+            delta[0] += signo
+            delta[1] += signo * (precio or 0)
+    deltas = {k: tuple(d) for k, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+
+    conn = connections[using]
+    with transaction.atomic(using=using, savepoint=False):
+        if conn.vendor in ("sqlite", "postgresql"):
+            _upsert(conn, deltas)
+        else:
+            _aplicar_uno_por_uno(deltas, using)
+
+
+def _upsert(conn, deltas):
+    from .models import RESUMEN_DIARIO
+
+    tabla = conn.ops.quote_name(RESUMEN_DIARIO._meta.db_table)
+    insertar = (f"INSERT INTO {tabla} (fecha, servicio_id, estatus, especie, total, ingresos) "
+                "VALUES (%s, %s, %s, %s, %s, %s) ")
+    sumar = f"DO UPDATE SET total = {tabla}.total + excluded.total, ingresos = {tabla}.ingresos + excluded.ingresos"
+    # Las filas sin servicio chocan con el índice parcial resumen_sin_servicio_unica,
+    # no con resumen_llave_unica (ahí NULL nunca es igual a NULL)
+    con_servicio = insertar + f"ON CONFLICT (fecha, servicio_id, estatus, especie) {sumar}"
+    sin_servicio = insertar + f"ON CONFLICT (fecha, estatus, especie) WHERE servicio_id IS NULL {sumar}"
+    filas = {con_servicio: [], sin_servicio: []}
+    for (fecha, servicio_id, estatus, especie), (n, monto) in deltas.items():
+        sql = sin_servicio if servicio_id is None else con_servicio
+        filas[sql].append((
+            conn.ops.adapt_datefield_value(fecha), servicio_id, estatus, especie, n,
+            conn.ops.adapt_decimalfield_value(monto, 14, 2),
+        ))
+    with conn.cursor() as cur:
+        for sql, valores in filas.items():
+            if valores:
+                cur.executemany(sql, valores)
+
+
+def _aplicar_uno_por_uno(deltas, using):
+    from .models import RESUMEN_DIARIO
+
+    for (fecha, servicio_id, estatus, especie), (n, monto) in deltas.items():
+        qs = RESUMEN_DIARIO.objects.using(using).filter(
+            fecha=fecha, servicio_id=servicio_id, estatus=estatus, especie=especie
+        )
+        if qs.update(total=F("total") + n, ingresos=F("ingresos") + monto):
+            continue
+        try:
+            with transaction.atomic(using=using):
+                qs.create(fecha=fecha, servicio_id=servicio_id, estatus=estatus, especie=especie,
+                          total=n, ingresos=monto)
+        except IntegrityError:
+            qs.update(total=F("total") + n, ingresos=F("ingresos") + monto)
+
+
+def reconstruir(desde=None, hasta=None, dias_por_bloque=31, using="default"):
+    """
+    Recalcula el resumen desde las citas, un bloque de días por transacción.
+    Regresa el número de filas de resumen escritas.
+    """
+    from .models import CITA_VETERINARIA, RESUMEN_DIARIO
+
+    citas = CITA_VETERINARIA.objects.using(using)
+    if desde is None or hasta is None:
+        primera = citas.order_by("fecha_cita").values_list("fecha_cita", flat=True).first()
+        ultima = citas.order_by("-fecha_cita").values_list("fecha_cita", flat=True).first()
+        if primera is None:
+            RESUMEN_DIARIO.objects.using(using).all().delete()
+            return 0
+        desde = desde or timezone.localtime(primera).date()
+        hasta = hasta or timezone.localtime(ultima).date()
+
+    tz = timezone.get_current_timezone()
+    escritas = 0
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(hasta, inicio + timedelta(days=dias_por_bloque - 1))
+        grupos = (
+            citas.filter(
+                fecha_cita__gte=timezone.make_aware(datetime.combine(inicio, time.min), tz),
+                fecha_cita__lt=timezone.make_aware(datetime.combine(fin + timedelta(days=1), time.min), tz),
+            )
+            .annotate(dia=TruncDate("fecha_cita", tzinfo=tz))
+            .values("dia", "servicio_id", "estatus", "especie")
+            .annotate(n=Count("id"), ingresos=Sum("precio"))
+            .order_by()
+        )
+        filas = [
+            RESUMEN_DIARIO(fecha=g["dia"], servicio_id=g["servicio_id"], estatus=g["estatus"],
+                           especie=g["especie"], total=g["n"], ingresos=g["ingresos"] or 0)
+            for g in grupos
+        ]
+        with transaction.atomic(using=using):
+            RESUMEN_DIARIO.objects.using(using).filter(fecha__gte=inicio, fecha__lte=fin).delete()
+            RESUMEN_DIARIO.objects.using(using).bulk_create(filas, batch_size=1000)
+        escritas += len(filas)
+        inicio = fin + timedelta(days=1)
+    return escritas
+
+
+# Consultas del tablero (solo leen RESUMEN_DIARIO, y SERVICIO para el nombre)
+
+def _resumen(desde, hasta):
+    from .models import RESUMEN_DIARIO
+
+    return RESUMEN_DIARIO.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+
+
+def ingresos_por_servicio(desde, hasta, periodo="dia"):
+    return list(
+        _resumen(desde, hasta)
+        .annotate(periodo=Trunc("fecha", PERIODOS.get(periodo, "day")))
+        .values("periodo", "servicio__nombre")
+        .annotate(
+            citas=Sum("total"),
+            completadas=Sum("total", filter=Q(estatus=ESTATUS_INGRESO)),
+            ingresos=Sum("ingresos", filter=Q(estatus=ESTATUS_INGRESO)),
+        )
+        .order_by("periodo", "servicio__nombre")
+    )
+
+
+def inasistencia_por_especie(desde, hasta):
+    filas = (
+        _resumen(desde, hasta)
+        .filter(estatus__in=[ESTATUS_INGRESO, ESTATUS_INASISTENCIA])
+        .values("especie")
+        .annotate(
+            cerradas=Sum("total"),
+            no_asistio=Sum("total", filter=Q(estatus=ESTATUS_INASISTENCIA)),
+        )
+        .order_by("especie")
+    )
+    resultado = []
+    for f in filas:
+        no_asistio = f["no_asistio"] or 0
+        tasa = (no_asistio / f["cerradas"] * 100) if f["cerradas"] else 0
+        resultado.append({**f, "no_asistio": no_asistio, "tasa": tasa})
+    return resultado
+
+
+def totales_por_estatus(desde, hasta):
+    return list(
+        _resumen(desde, hasta).values("estatus").annotate(citas=Sum("total")).order_by("estatus")
+    )
+
+
+def citas_por_dia(desde, hasta):
+    return list(
+        _resumen(desde, hasta).values("fecha").annotate(citas=Sum("total")).order_by("fecha")
+    )
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+# Resolución de roles: los grupos del usuario se consultan una sola vez por
+# request y se guardan en el propio objeto user (request.user es el mismo
+# objeto durante todo el request). Opcionalmente también se guardan en el
+# cache entre requests; se invalidan cuando cambian los grupos del usuario.
+
+ROLE_ADMIN = "Administrador"
+ROLE_EMP = "Empleado"
+
+_ATRIBUTO = "_grupos_cache"
+_VERSION_KEY = "roles:version"
+
+
+def _segundos_cache():
+    return getattr(settings, "ROLES_CACHE_SEGUNDOS", 0)
+
+
+def _cache_key(user_id):
+    version = cache.get(_VERSION_KEY, 0)
+    return f"roles:{version}:{user_id}"
+
+
+def grupos_de(user):
+    if not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, _ATRIBUTO, None)
+    if grupos is not None:
+        return grupos
+
+    segundos = _segundos_cache()
+    key = _cache_key(user.pk) if segundos else None
+    if key:
+        grupos = cache.get(key)
+    if grupos is None:
+        grupos = frozenset(user.groups.values_list("name", flat=True))
+        if key:
+            cache.set(key, grupos, segundos)
+
+    setattr(user, _ATRIBUTO, grupos)
+    return grupos
+
+
+def tiene_rol(user, *roles):
+    return bool(grupos_de(user).intersection(roles))
+
+
+async def agrupos_de(user):
+    # Versión para vistas async (ORM y cache asíncronos)
+    if not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, _ATRIBUTO, None)
+    if grupos is not None:
+        return grupos
+
+    segundos = _segundos_cache()
+    key = f"roles:{await cache.aget(_VERSION_KEY, 0)}:{user.pk}" if segundos else None
+    if key:
+        grupos = await cache.aget(key)
+    if grupos is None:
+        grupos = frozenset([n async for n in user.groups.values_list("name", flat=True)])
+        if key:
+            await cache.aset(key, grupos, segundos)
+
+    setattr(user, _ATRIBUTO, grupos)
+    return grupos
+
+
+async def atiene_rol(user, *roles):
+    return bool((await agrupos_de(user)).intersection(roles))
+
+
+def invalidar(user_ids=None):
+    # Sin ids se invalida a todos subiendo la versión de las llaves
+    if not _segundos_cache():
+        return
+    if user_ids is None:
+        try:
+            cache.incr(_VERSION_KEY)
+        except ValueError:
+            cache.set(_VERSION_KEY, 1, None)
+        return
+    cache.delete_many([_cache_key(pk) for pk in user_ids])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _grupos_cambiaron(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, User):
+        invalidar([instance.pk])
+        instance.__dict__.pop(_ATRIBUTO, None)
+    elif pk_set:
+        # group.user_set.add(...): pk_set son usuarios
+        invalidar(pk_set)
+    else:
+        invalidar()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def _grupo_cambio(sender, **kwargs):
+    invalidar()
@@ -0,0 +1,36 @@
+from django.db import connections
+
+# Router opcional (DB_LECTURA=1 en settings): las lecturas de los paneles,
+# listados y reportes van a la conexión de solo lectura "lectura" y las
+# escrituras a "default". Dentro de un atomic() de "default" las lecturas se
+# quedan ahí, para leer lo que la misma transacción acaba de escribir.
+
+LECTURA = "lectura"
+ESCRITURA = "default"
+
+# Sesiones, usuarios, roles, auditoría y versiones del catálogo se leen
+# siempre de "default": ahí importa ver la última escritura
+MODELOS_LECTURA = {
+    "app.servicio", "app.dueño", "app.mascota", "app.cita_veterinaria", "app.resumen_diario",
+}
+
+
+class LecturaRouter:
+    # medir_concurrencia los cambia por sus propias conexiones
+    lectura = LECTURA
+    escritura = ESCRITURA
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in MODELOS_LECTURA or connections[self.escritura].in_atomic_block:
+            return self.escritura
+        return self.lectura
+
+    def db_for_write(self, model, **hints):
+        return self.escritura
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las dos conexiones apuntan al mismo archivo
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == self.escritura
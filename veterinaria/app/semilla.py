@@ -0,0 +1,137 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .busqueda import normalizar
+from .disponibilidad import SLOTS
+from .models import SERVICIO, CITA_VETERINARIA
+
+# Datos sintéticos para pruebas de carga y benchmarks.
+# Genera servicios con nombres únicos y citas repartidas en varios años con
+# mezclas de estatus / especie parecidas a las reales. Cada día se arma con
+# random.sample sobre (servicio, bloque), así no se repite un bloque sin
+# tener que recordar las llaves ya generadas.
+
+BASES = [
+    "Consulta", "Vacunación", "Baño", "Corte de pelo", "Desparasitación", "Cirugía",
+    "Radiografía", "Ultrasonido", "Limpieza dental", "Hospitalización", "Análisis de sangre",
+    "Esterilización", "Curación", "Revisión dental", "Corte de uñas", "Terapia física",
+    "Nutrición", "Dermatología", "Oftalmología", "Cardiología",
+]
+MODALIDADES = [
+    "general", "express", "premium", "a domicilio", "de urgencia",
+    "preventiva", "de seguimiento", "integral", "básica", "especializada",
+]
+TALLAS = ["cachorro", "chico", "mediano", "grande", "gigante"]
+
+ESPECIES = [("Perro", 55), ("Gato", 30), ("Ave", 5), ("Conejo", 4), ("Hámster", 3), ("Reptil", 2), ("Pez", 1)]
+ESTATUS_PASADAS = [("Completada", 72), ("No asistió", 12), ("Cancelada", 10), ("Pendiente", 6)]
+ESTATUS_FUTURAS = [("Pendiente", 85), ("Cancelada", 15)]
+
+NOMBRES = [
+    "Ana", "Luis", "María", "José", "Carmen", "Juan", "Sofía", "Pedro", "Lucía", "Miguel",
+    "Fernanda", "Jorge", "Valeria", "Ricardo", "Daniela", "Andrés", "Paola", "Héctor",
+]
+APELLIDOS = [
+    "García", "Martínez", "López", "Hernández", "González", "Pérez", "Rodríguez", "Sánchez",
+    "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Cruz", "Morales",
+]
+MASCOTAS = [
+    "Firulais", "Luna", "Max", "Michi", "Rocky", "Nala", "Toby", "Kira", "Simba", "Coco",
+    "Lola", "Bruno", "Canela", "Manchas", "Pelusa", "Rex", "Chispa", "Oreo",
+]
+MOTIVOS = ["Revisión anual", "Vacuna", "Vómito", "Cojera", "Comezón", "Control", "Limpieza", "Herida"]
+
+MAX_SERVICIOS = len(BASES) * len(MODALIDADES) * len(TALLAS)
+
+
+def _elegir(rng, pesos):
+    valores, w = zip(*pesos)
+    return rng.choices(valores, weights=w)[0]
+
+
+def crear_servicios(n, rng):
+    """Crea `n` servicios con nombre y descripción únicos. Regresa cuántos creó."""
+    if n > MAX_SERVICIOS:
+        raise ValueError(f"Se pueden generar como máximo {MAX_SERVICIOS} servicios.")
+    existentes = set(SERVICIO.objects.values_list("nombre_norm", flat=True))
+    nuevos = []
+    for base in BASES:
+        for modalidad in MODALIDADES:
+            for talla in TALLAS:
+                if len(nuevos) >= n:
+                    continue
+                nombre = f"{base} {modalidad} {talla}"
+                if normalizar(nombre) in existentes:
+                    continue
+                nuevos.append(SERVICIO(
+                    nombre=nombre,
+                    nombre_norm=normalizar(nombre),
+                    precio=Decimal(rng.randrange(150, 5000, 50)),
+                    descripcion=f"{base} {modalidad} para mascotas talla {talla}.",
+                ))
+    SERVICIO.objects.bulk_create(nuevos, batch_size=500)
+    return len(nuevos)
+
+
+def sembrar(servicios=1000, citas=1_000_000, anios=3, dias_futuros=60, batch_size=5000,
+            semilla=None, progreso=None):
+    """
+    Genera `servicios` servicios y `citas` citas entre hace `anios` años y
+    `dias_futuros` días adelante. `progreso(n)` se llama tras cada lote.
+    Regresa (servicios_creados, citas_creadas).
+    """
+    rng = random.Random(semilla)
+    servicios_creados = crear_servicios(servicios, rng) if servicios else 0
+    pks = list(SERVICIO.objects.values_list("pk", flat=True))
+    if not pks:
+        raise ValueError("No hay servicios para asignar a las citas.")
+
+    tz = timezone.get_current_timezone()
+    hoy = timezone.localdate()
+    primer_dia = hoy - timedelta(days=365 * anios)
+    dias = (hoy - primer_dia).days + dias_futuros
+    ahora = timezone.now()
+    # Bloques que ya están ocupados no se vuelven a usar
+    ocupados = set(
+        CITA_VETERINARIA.objects.filter(fecha_cita__gte=timezone.make_aware(datetime.combine(primer_dia, time.min), tz))
+        .values_list("servicio_id", "slot_inicio")
+    )
+    horas = [time.fromisoformat(h) for h in SLOTS]
+    capacidad = len(pks) * len(horas)
+    por_dia, sobrante = divmod(citas, dias)
+
+    creadas = 0
+    lote = []
+    for i in range(dias):
+        dia = primer_dia + timedelta(days=i)
+        n = min(capacidad, por_dia + (1 if i < sobrante else 0))
+        for k in rng.sample(range(capacidad), n):
+            servicio_id = pks[k // len(horas)]
+            fecha = timezone.make_aware(datetime.combine(dia, horas[k % len(horas)]), tz)
+            if (servicio_id, fecha) in ocupados:
+                continue
+            dueño = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}"
+            lote.append(CITA_VETERINARIA(
+                nombre_dueño=dueño,
+                nombre_mascota=rng.choice(MASCOTAS),
+                especie=_elegir(rng, ESPECIES),
+                fecha_cita=fecha,
+                motivo=rng.choice(MOTIVOS),
+                estatus=_elegir(rng, ESTATUS_PASADAS if fecha < ahora else ESTATUS_FUTURAS),
+                servicio_id=servicio_id,
+            ))
+            if len(lote) >= batch_size:
+                CITA_VETERINARIA.objects.bulk_create(lote, batch_size=batch_size)
+                creadas += len(lote)
+                lote = []
+                if progreso:
+                    progreso(creadas)
+    if lote:
+        CITA_VETERINARIA.objects.bulk_create(lote, batch_size=batch_size)
+        creadas += len(lote)
+        if progreso:
+            progreso(creadas)
+    return servicios_creados, creadas
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import auditoria, catalogo
+from .busqueda import FTS_SERVICIOS, borrar_fts
+from .models import CITA_VETERINARIA, SERVICIO
+
+
+@receiver(post_save, sender=SERVICIO)
+@receiver(post_delete, sender=SERVICIO)
+def servicio_cambio(sender, using, **kwargs):
+    catalogo.invalidar(using)
+
+
+@receiver(post_delete, sender=SERVICIO)
+def servicio_borrado(sender, instance, using, **kwargs):
+    borrar_fts([instance.pk], using, FTS_SERVICIOS)
+
+
+@receiver(post_save, sender=CITA_VETERINARIA)
+@receiver(post_save, sender=SERVICIO)
+def auditar_guardado(sender, instance, created, using, **kwargs):
+    auditoria.registrar(instance, "alta" if created else "cambio", using)
+
+
+@receiver(post_delete, sender=CITA_VETERINARIA)
+@receiver(post_delete, sender=SERVICIO)
+def auditar_borrado(sender, instance, using, **kwargs):
+    auditoria.registrar(instance, "baja", using)
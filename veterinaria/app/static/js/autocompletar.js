@@ -0,0 +1,85 @@
+// Sugerencias de dueño y mascota en el formulario de citas
+// (citas/autocompletar.json). Al elegir una mascota se llena la especie.
+document.addEventListener("DOMContentLoaded", function () {
+    const form = document.querySelector("form[data-autocompletar-url]");
+    if (!form) return;
+
+    const URL_BASE = form.dataset.autocompletarUrl;
+    const ESPERA_MS = 150;
+    const ESPECIES = ["Perro", "Gato", "Ave"];
+    const dueno = form.querySelector('[data-autocompletar="dueno"]');
+    const mascota = form.querySelector('[data-autocompletar="mascota"]');
+
+    function lista(input) {
+        let datalist = document.getElementById(input.getAttribute("list"));
+        if (!datalist) {
+            datalist = document.createElement("datalist");
+            datalist.id = input.getAttribute("list");
+            input.after(datalist);
+        }
+        return datalist;
+    }
+
+    function ponerEspecie(especie) {
+        const select = document.getElementById("especie_select");
+        const otro = document.getElementById("especie_otro");
+        if (!select || select.disabled || !especie) return;
+        if (ESPECIES.includes(especie)) {
+            select.value = especie;
+        } else {
+            select.value = "Otro";
+        }
+        // Muestra u oculta el campo "Otro" (ver el script de la página)
+        select.dispatchEvent(new Event("change"));
+        if (otro && select.value === "Otro") otro.value = especie;
+    }
+
+    function conectar(input, campo) {
+        if (!input || input.disabled) return;
+        const datalist = lista(input);
+        let temporizador = null;
+        let pendiente = null;
+        let especies = {};
+
+        async function buscar() {
+            const q = input.value.trim();
+            if (!q) { datalist.replaceChildren(); return; }
+            const params = new URLSearchParams({ campo: campo, q: q });
+            if (campo === "mascota" && dueno && dueno.value.trim()) params.set("dueno", dueno.value.trim());
+            if (pendiente) pendiente.abort();
+            pendiente = new AbortController();
+            try {
+                const respuesta = await fetch(URL_BASE + "?" + params, {
+                    headers: { Accept: "application/json" }, signal: pendiente.signal,
+                });
+                if (!respuesta.ok) return;
+                const datos = await respuesta.json();
+                especies = {};
+                datalist.replaceChildren(...datos.resultados.map(function (r) {
+                    const opcion = document.createElement("option");
+                    opcion.value = r.nombre;
+                    if (campo === "mascota") {
+                        opcion.label = r.especie + " · " + r["dueño__nombre"];
+                        especies[r.nombre] = r.especie;
+                    }
+                    return opcion;
+                }));
+            } catch (e) {
+                // Cancelada por una búsqueda más nueva o sin red
+            }
+        }
+
+        input.addEventListener("input", function () {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(buscar, ESPERA_MS);
+        });
+        if (campo === "mascota") {
+            input.addEventListener("change", function () {
+                ponerEspecie(especies[input.value]);
+            });
+        }
+    }
+
+    conectar(dueno, "dueno");
+    conectar(mascota, "mascota");
+});
@@ -0,0 +1,57 @@
+// Actualiza la tabla de citas con el feed de cambios (citas/cambios.json):
+// reemplaza las filas que cambiaron, quita las borradas y avisa de las nuevas.
+document.addEventListener("DOMContentLoaded", function () {
+    const tabla = document.getElementById("tabla-citas");
+    const aviso = document.getElementById("citas-nuevas");
+    if (!tabla || !tabla.dataset.token) return;
+
+    const INTERVALO_MS = 5000;
+    let token = tabla.dataset.token;
+    let nuevas = 0;
+
+    function aplicar(datos) {
+        datos.citas.forEach(function (cita) {
+            const fila = tabla.querySelector('tr[data-cita="' + cita.id + '"]');
+            if (fila) {
+                fila.outerHTML = cita.html;
+            } else if (cita.version === 1) {
+                // Recién creada (las modificadas que no están en esta página se ignoran)
+                nuevas += 1;
+            }
+        });
+        datos.borradas.forEach(function (id) {
+            const fila = tabla.querySelector('tr[data-cita="' + id + '"]');
+            if (fila) fila.remove();
+        });
+        if (nuevas && aviso) {
+            aviso.querySelector("span").textContent = nuevas;
+            aviso.classList.remove("d-none");
+        }
+    }
+
+    async function revisar() {
+        if (document.hidden) return;
+        try {
+            let datos;
+            do {
+                const respuesta = await fetch(
+                    tabla.dataset.cambiosUrl + "?html=1&since=" + encodeURIComponent(token),
+                    { headers: { Accept: "application/json" } }
+                );
+                if (!respuesta.ok) return;
+                datos = await respuesta.json();
+                aplicar(datos);
+                token = datos.token;
+            } while (datos.hay_mas);
+        } catch (e) {
+            // Sin red: se intenta en la siguiente vuelta
+        }
+    }
+
+    // Una revisión a la vez: la siguiente se programa al terminar la anterior
+    (function ciclo() {
+        setTimeout(function () {
+            revisar().finally(ciclo);
+        }, INTERVALO_MS);
+    })();
+});
@@ -8,10 +8,40 @@
     const totalEl    = document.getElementById('total');
     const numInput   = document.getElementById('num-servicios');
     const plantilla  = document.getElementById('plantilla-servicio');
-    const OPTIONS    = plantilla.innerHTML; // las <option> renderizadas por Django
+    if (!plantilla || !tbody) return; // la página no tiene cotizador
+    let OPTIONS      = plantilla.innerHTML; // se llena con el catálogo JSON
         const chkDesc    = document.getElementById('chk-desc');
         const pctDesc    = document.getElementById('pct-desc');
 
+    // === Catálogo: se descarga solo cuando se abre la sección de cotización ===
+    let catalogoPromesa = null;
+    const cargarCatalogo = () => {
+      if (catalogoPromesa) return catalogoPromesa;
+      catalogoPromesa = fetch(plantilla.dataset.url)
+        .then(resp => resp.json())
+        .then(data => {
+          const idx = Object.fromEntries(data.campos.map((c, i) => [c, i]));
+          data.servicios.forEach(s => {
+            const opt = new Option(s[idx.nombre], s[idx.id]);
+            opt.dataset.precio = s[idx.precio];
+            opt.dataset.desc = s[idx.descripcion];
+            plantilla.add(opt);
+          });
+          OPTIONS = plantilla.innerHTML;
+        })
+        .catch(() => { catalogoPromesa = null; });
+      return catalogoPromesa;
+    };
+
+    const seccion = plantilla.closest('section');
+    if (seccion && 'IntersectionObserver' in window) {
+      const obs = new IntersectionObserver((entries) => {
+        if (entries.some(e => e.isIntersecting)) { cargarCatalogo(); obs.disconnect(); }
+      }, { rootMargin: '200px' });
+      obs.observe(seccion);
+    }
+    numInput.addEventListener('focus', cargarCatalogo);
+
     const money = n => (n || 0).toLocaleString('es-MX', {style: 'currency', currency: 'MXN' });
 
     const filaHTML = () => `
@@ -87,13 +117,15 @@
     };
 
     // --- Botones ---
-    document.getElementById('btn-generar').addEventListener('click', () => {
+    document.getElementById('btn-generar').addEventListener('click', async () => {
       const n = Math.max(1, parseInt(numInput.value) || 0);
         if (!n) return;
+        await cargarCatalogo();
         crearFilas(n);
     });
 
-    document.getElementById('btn-agregar').addEventListener('click', () => {
+    document.getElementById('btn-agregar').addEventListener('click', async () => {
+            await cargarCatalogo();
             tbody.insertAdjacentHTML('beforeend', filaHTML());
         numInput.value = tbody.querySelectorAll('tr').length; // refleja cantidad
         const tr = tbody.lastElementChild;
@@ -105,9 +137,10 @@
         document.getElementById('btn-limpiar').addEventListener('click', limpiarTodo);
 
     // Si cambias el número, regenera limpio o esconde si vacío
-    numInput.addEventListener('change', () => {
+    numInput.addEventListener('change', async () => {
       const n = parseInt(numInput.value);
         if (!n || n < 1) {limpiarTodo(); return; }
+        await cargarCatalogo();
         crearFilas(n);
     });
 
@@ -0,0 +1,26 @@
+// Las gráficas se dibujan en segundo plano: mientras tanto el servidor
+// responde un marcador (202 + Retry-After). Se pregunta con HEAD hasta que
+// la gráfica está lista y entonces se vuelve a cargar la imagen.
+document.addEventListener("DOMContentLoaded", function () {
+    const MAX_INTENTOS = 60;
+
+    document.querySelectorAll("img[data-grafica]").forEach(function (img) {
+        const url = img.dataset.grafica;
+        let intentos = 0;
+        let esperando = false;
+
+        function revisar() {
+            fetch(url, { method: "HEAD", credentials: "same-origin" }).then(function (r) {
+                if (r.status === 202 && intentos++ < MAX_INTENTOS) {
+                    esperando = true;
+                    const segundos = parseFloat(r.headers.get("Retry-After")) || 2;
+                    setTimeout(revisar, segundos * 1000);
+                } else if (r.ok && esperando) {
+                    // Otra URL para no reusar el marcador que ya tiene la página
+                    img.src = r.url + (r.url.includes("?") ? "&" : "?") + "listo=1";
+                }
+            }).catch(function () {});
+        }
+        revisar();
+    });
+});
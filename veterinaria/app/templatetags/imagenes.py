@@ -0,0 +1,29 @@
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+# Tipos MIME de las variantes, en orden de preferencia para el navegador
+TIPOS = (("avif", "image/avif"), ("webp", "image/webp"))
+
+
+@register.simple_tag
+def imagen_responsiva(path, alt="", sizes="100vw", **atributos):
+    """
+    <picture> con las variantes AVIF/WebP de una imagen estática (srcset por
+    ancho) y la imagen original como respaldo. Sin variantes (no se ha
+    corrido collectstatic) queda solo el <img>.
+    Uso: {% imagen_responsiva 'img/carrusel1.jpg' alt="..." sizes="100vw" class="..." %}
+    """
+    extra = format_html_join("", ' {}="{}"', ((k.replace("_", "-"), v) for k, v in atributos.items()))
+    img = format_html('<img src="{}" alt="{}"{}>', static(path), alt, extra)
+    variantes = getattr(staticfiles_storage, "srcset", lambda _path: {})(path)
+    if not variantes:
+        return img
+    fuentes = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((tipo, variantes[formato], sizes) for formato, tipo in TIPOS if formato in variantes),
+    )
+    return format_html('<picture class="imagen-responsiva">{}{}</picture>', fuentes, img)
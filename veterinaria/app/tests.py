@@ -1,3 +1,1467 @@
-from django.test import TestCase
+import base64
+import csv
+import itertools
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import types
+import time as time_mod
+from concurrent.futures import Future
+from datetime import datetime, time, timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Sum
+from django.contrib.auth.models import Group, User
+from django.contrib.messages import get_messages
+from django.template import Context, Template, engines
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from . import (
+    auditoria, cambios, carga, catalogo, cierre, disponibilidad, exportar, fragmentos, graficas, importar, metricas,
+    reportes, semilla,
+)
+from .models import (
+    AUDITORIA, DUEÑO, MASCOTA, MSG_CHOQUE, MSG_SERVICIO_DUPLICADO, SERVICIO, CITA_VETERINARIA, RESUMEN_DIARIO,
+    campo_duplicado, choque_de_bloque,
+)
+from .busqueda import filtrar_citas, filtrar_servicios
+from .disponibilidad import SLOTS
+from .paginacion import codificar_cursor, decodificar_cursor, paginar_citas
+from .roles import ROLE_ADMIN, ROLE_EMP
+from .routers import LECTURA, ESCRITURA, LecturaRouter
 
 # Create your tests here.
+
+
+def _fecha(dias, hora, minuto=0):
+    dia = timezone.localdate() + timedelta(days=dias)
+    return timezone.make_aware(datetime.combine(dia, time(hora, minuto)), timezone.get_current_timezone())
+
+
+def _cita(servicio, fecha, **extra):
+    datos = dict(
+        nombre_dueño="Ana", nombre_mascota="Fido", especie="Perro",
+        fecha_cita=fecha, motivo="Revisión", estatus="Pendiente", servicio=servicio,
+    )
+    datos.update(extra)
+    return CITA_VETERINARIA(**datos)
+
+
+class BloqueUnicoTests(TestCase):
+    def setUp(self):
+        self.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+
+    def test_mismo_bloque_choca(self):
+        _cita(self.servicio, _fecha(1, 10)).save()
+        with self.assertRaises(IntegrityError) as cm, transaction.atomic():
+            _cita(self.servicio, _fecha(1, 10, 20)).save()
+        self.assertTrue(choque_de_bloque(cm.exception))
+        self.assertFalse(choque_de_bloque(IntegrityError("NOT NULL constraint failed: app_cita_veterinaria.motivo")))
+
+    def test_panel_solo_traduce_el_choque_de_bloque(self):
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+        self.client.force_login(admin)
+        _cita(self.servicio, _fecha(1, 10)).save()
+        datos = {
+            "nombre_dueño": "Luis", "nombre_mascota": "Michi", "especie_select": "Gato",
+            "fecha_cita": _fecha(1, 10).date().isoformat(), "hora_cita": "10:00", "motivo": "Vacuna",
+            "servicio": self.servicio.pk,
+        }
+        respuesta = self.client.post(reverse("citas"), datos)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "Ya existe una cita para ese servicio")
+
+        # Otra falla de integridad no se disfraza de choque de horario
+        datos["hora_cita"] = "12:00"
+        otra = IntegrityError("FOREIGN KEY constraint failed")
+        with mock.patch.object(CITA_VETERINARIA.objects, "create", side_effect=otra):
+            with self.assertRaises(IntegrityError):
+                self.client.post(reverse("citas"), datos)
+
+    def test_cancelada_libera_el_bloque(self):
+        _cita(self.servicio, _fecha(1, 10), estatus="Cancelada").save()
+        _cita(self.servicio, _fecha(1, 10, 15)).save()
+        self.assertEqual(CITA_VETERINARIA.objects.count(), 2)
+
+
+@override_settings(AUDITORIA_HILO=False)  # que el hilo de auditoría no escriba en la base de pruebas
+class ReservaConcurrenteTests(TransactionTestCase):
+    databases = "__all__"  # incluye "lectura" si DB_LECTURA=1
+    HILOS = 12
+
+    def tearDown(self):
+        auditoria.reiniciar()
+
+    def test_reservas_simultaneas_mismo_bloque(self):
+        servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        fecha = _fecha(2, 11)
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        candado = threading.Lock()
+
+        def reservar(n):
+            barrera.wait()
+            resultado = "error"
+            try:
+                for _ in range(500):
+                    try:
+                        with transaction.atomic():
+                            _cita(servicio, fecha + timedelta(minutes=n % 30), nombre_dueño=f"Dueño {n}").save()
+                        resultado = "ok"
+                        break
+                    except IntegrityError:
+                        resultado = "choque"
+                        break
+                    except OperationalError:
+                        # SQLite en memoria reporta la tabla bloqueada sin esperar
+                        # el busy timeout; se reintenta tras una pausa
+                        time_mod.sleep(0.01)
+                        continue
+            finally:
+                connection.close()
+                with candado:
+                    resultados.append(resultado)
+
+        hilos = [threading.Thread(target=reservar, args=(n,)) for n in range(self.HILOS)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        self.assertEqual(resultados.count("ok"), 1)
+        self.assertEqual(resultados.count("choque"), self.HILOS - 1)
+        self.assertEqual(CITA_VETERINARIA.objects.filter(servicio=servicio).count(), 1)
+
+
+@override_settings(
+    AUDITORIA_HILO=False, ALLOWED_HOSTS=[carga.HOST],
+    # El login con PBKDF2 se llevaría casi toda la corrida de un segundo
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class SimulacionCargaTests(TransactionTestCase):
+    databases = "__all__"
+
+    def tearDown(self):
+        auditoria.reiniciar()
+
+    def test_escenario_corto_reporta_y_limpia(self):
+        SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        escenario = carga.validar_escenario({
+            "duracion_segundos": 1, "calentamiento_segundos": 0,
+            "clientes": [
+                {"nombre": "publico", "cantidad": 2, "rol": None, "acciones": {"index": 1}},
+                {"nombre": "recepcion", "cantidad": 1, "rol": ROLE_ADMIN, "pausa_ms": [0, 50],
+                 "acciones": {"panel": 1, "buscar": 1, "reservar": 2, "estatus": 1}},
+            ],
+        })
+        usuarios = carga.preparar(escenario)
+        resultado = carga.correr(escenario, usuarios, semilla=1)
+
+        self.assertIn("index", resultado["vistas"])
+        self.assertIn("citas", resultado["vistas"])
+        for datos in resultado["vistas"].values():
+            self.assertEqual(datos["errores"], 0)
+            self.assertEqual(datos["bloqueos"], 0)
+            self.assertLessEqual(datos["p50_ms"], datos["p99_ms"])
+        self.assertEqual(resultado["conteos"]["logins_fallidos"], 0)
+        self.assertGreater(resultado["conteos"]["reservas"], 0)
+        json.dumps(resultado)  # se puede guardar para comparar corridas
+
+        carga.limpiar()
+        self.assertFalse(CITA_VETERINARIA.objects.filter(nombre_dueño__startswith=carga.PREFIJO).exists())
+        self.assertFalse(DUEÑO.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith="carga_").exists())
+
+    def test_escenario_invalido(self):
+        with self.assertRaises(ValueError):
+            carga.validar_escenario({"clientes": [{"nombre": "x", "rol": None, "acciones": {"reservar": 1}}]})
+        with self.assertRaises(ValueError):
+            carga.validar_escenario({"clientes": [{"nombre": "x", "rol": "Gerente", "acciones": {"index": 1}}]})
+
+
+class ResumenDiarioTests(TestCase):
+    def setUp(self):
+        self.consulta = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        self.baño = SERVICIO.objects.create(nombre="Baño", precio=150, descripcion="Estética")
+
+    def _resumen(self):
+        return sorted(
+            RESUMEN_DIARIO.objects.filter(total__gt=0).values_list(
+                "fecha", "servicio_id", "estatus", "especie", "total", "ingresos"
+            )
+        )
+
+    def test_deltas_igual_a_reconstruir(self):
+        a = _cita(self.consulta, _fecha(1, 9))
+        a.save()
+        CITA_VETERINARIA.objects.bulk_create([
+            _cita(self.consulta, _fecha(1, 10), especie="Gato"),
+            _cita(self.baño, _fecha(2, 10), estatus="Completada"),
+            _cita(self.baño, _fecha(3, 11)),
+        ])
+        a.estatus = "Completada"
+        a.fecha_cita = _fecha(4, 12)
+        a.save()
+        CITA_VETERINARIA.objects.filter(especie="Gato").update(estatus="No asistió")
+        CITA_VETERINARIA.objects.filter(fecha_cita__gte=_fecha(3, 0), servicio=self.baño).delete()
+        CITA_VETERINARIA.objects.only("pk", "estatus").get(pk=a.pk).delete()
+
+        incremental = self._resumen()
+        reportes.reconstruir()
+        self.assertEqual(incremental, self._resumen())
+
+        ingresos = reportes.ingresos_por_servicio(_fecha(0, 0).date(), _fecha(5, 0).date())
+        self.assertEqual(sum(f["ingresos"] or 0 for f in ingresos), 150)
+
+    def test_cambiar_el_precio_no_mueve_ingresos_pasados(self):
+        def ingresos(dias):
+            filas = reportes.ingresos_por_servicio(_fecha(dias, 0).date(), _fecha(dias, 0).date())
+            return sum(f["ingresos"] or 0 for f in filas)
+
+        _cita(self.consulta, _fecha(-2, 9), estatus="Completada").save()
+        CITA_VETERINARIA.objects.bulk_create([_cita(self.consulta, _fecha(-2, 10), estatus="Completada")])
+        pendiente = _cita(self.consulta, _fecha(1, 9))
+        pendiente.save()
+        self.assertEqual(ingresos(-2), 600)
+
+        self.consulta.precio = 500
+        self.consulta.save()
+        self.assertEqual(ingresos(-2), 600)
+        # La pendiente conserva el precio con el que se agendó
+        CITA_VETERINARIA.objects.filter(pk=pendiente.pk).update(estatus="Completada")
+        self.assertEqual(ingresos(1), 300)
+        # Una cita nueva o un cambio de servicio toman el precio vigente
+        _cita(self.consulta, _fecha(1, 10), estatus="Completada").save()
+        self.assertEqual(ingresos(1), 800)
+        pendiente.refresh_from_db()
+        pendiente.servicio = self.baño
+        pendiente.save()
+        CITA_VETERINARIA.objects.filter(fecha_cita=_fecha(1, 10)).update(servicio=self.baño.pk)
+        self.assertEqual(ingresos(1), 300)
+
+        # Descompletar una cita vieja resta lo que sumó, no el precio nuevo
+        CITA_VETERINARIA.objects.filter(fecha_cita=_fecha(-2, 9)).update(estatus="Pendiente")
+        self.assertEqual(ingresos(-2), 300)
+        incremental = self._resumen()
+        reportes.reconstruir()
+        self.assertEqual(incremental, self._resumen())
+        self.assertEqual(ingresos(-2), 300)
+
+    def test_citas_sin_servicio_ajustan_la_misma_fila(self):
+        a = _cita(None, _fecha(1, 9))
+        a.save()
+        b = _cita(None, _fecha(1, 10))
+        b.save()
+        b.estatus = "Cancelada"
+        b.save()
+        a.motivo = "Vacuna"  # no cambia la llave del resumen
+        a.save()
+        b.delete()
+
+        filas = list(
+            RESUMEN_DIARIO.objects.filter(servicio__isnull=True).values_list("estatus", "total").order_by("estatus")
+        )
+        self.assertEqual(filas, [("Cancelada", 0), ("Pendiente", 1)])
+        incremental = self._resumen()
+        reportes.reconstruir()
+        self.assertEqual(incremental, self._resumen())
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class ExportarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.consulta = SERVICIO.objects.create(nombre="Consulta", precio="300.00", descripcion="General")
+        cls.baño = SERVICIO.objects.create(nombre="Baño", precio="150.50", descripcion="Estética")
+        CITA_VETERINARIA.objects.bulk_create([
+            _cita(cls.consulta, _fecha(1, 9), nombre_dueño="Ana", nombre_mascota="Fido"),
+            _cita(cls.baño, _fecha(2, 10), nombre_dueño="Luis", nombre_mascota="Michi", especie="Gato",
+                  estatus="Completada"),
+            _cita(cls.consulta, _fecha(3, 11), nombre_dueño="Eva", nombre_mascota="Toby", estatus="Cancelada"),
+            _cita(None, _fecha(4, 12), nombre_dueño="Sin", nombre_mascota="Servicio"),
+        ])
+        cls.admin = User.objects.create_user("admin", password="x")
+        cls.admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+
+    def _csv(self, **filtros):
+        texto = "".join(exportar.lineas_csv(exportar.citas_para_exportar(**filtros)))
+        self.assertTrue(texto.startswith("\ufeff"))
+        return list(csv.reader(StringIO(texto[1:])))
+
+    def _xlsx(self, archivo):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(archivo, read_only=True)
+        try:
+            return [list(fila) for fila in wb["Citas"].iter_rows(values_only=True)]
+        finally:
+            wb.close()
+
+    def test_csv(self):
+        filas = self._csv()
+        self.assertEqual(filas[0], exportar.ENCABEZADOS)
+        self.assertEqual([f[2] for f in filas[1:]], ["Ana", "Luis", "Eva", "Sin"])
+        luis = filas[2]
+        self.assertEqual(luis[1], _fecha(2, 10).strftime("%Y-%m-%d %H:%M"))  # hora local
+        self.assertEqual(luis[3:], ["Michi", "Gato", "Revisión", "Completada", "Baño", "150.50"])
+        self.assertEqual(filas[4][7:], ["", ""])
+
+    def test_xlsx(self):
+        archivo = BytesIO()
+        exportar.escribir_xlsx(exportar.citas_para_exportar(estatus="Pendiente"), archivo, chunk_size=1)
+        filas = self._xlsx(archivo)
+        self.assertEqual(filas[0], exportar.ENCABEZADOS)
+        self.assertEqual([f[2] for f in filas[1:]], ["Ana", "Sin"])
+        ana = filas[1]
+        self.assertEqual(ana[1], _fecha(1, 9).replace(tzinfo=None))
+        self.assertEqual(ana[7:], ["Consulta", 300])
+
+    def test_xlsx_sale_mientras_se_arma(self):
+        leidas = []
+
+        def iterator(chunk_size):
+            for n in range(5000):
+                leidas.append(n)
+                yield (n, _fecha(1, 9), os.urandom(16).hex(), "Fido", "Perro", "<&>", "Pendiente", None, None)
+
+        archivo, momentos = BytesIO(), []
+        for parte in exportar.partes_xlsx(types.SimpleNamespace(iterator=iterator)):
+            archivo.write(parte)
+            momentos.append(len(leidas))
+        # Hubo bytes para el cliente antes de terminar de leer
+        self.assertGreater(len([m for m in momentos if 1 < m < 5000]), 1)
+        filas = self._xlsx(archivo)
+        self.assertEqual(len(filas), 5001)
+        self.assertEqual(filas[-1][4:], ["Perro", "<&>", "Pendiente", ""])
+
+    def test_filtros(self):
+        casos = [
+            ({"desde": _fecha(2, 0).date()}, ["Luis", "Eva", "Sin"]),
+            ({"hasta": _fecha(2, 0).date()}, ["Ana", "Luis"]),  # el día de `hasta` se incluye
+            ({"desde": _fecha(2, 0).date(), "hasta": _fecha(3, 0).date()}, ["Luis", "Eva"]),
+            ({"estatus": "Cancelada"}, ["Eva"]),
+            ({"servicio_id": self.consulta.pk}, ["Ana", "Eva"]),
+            ({"servicio_id": self.consulta.pk, "estatus": "Pendiente"}, ["Ana"]),
+        ]
+        for filtros, dueños in casos:
+            with self.subTest(**filtros):
+                self.assertEqual([f[2] for f in self._csv(**filtros)[1:]], dueños)
+
+    def test_vista_y_comando_coinciden(self):
+        self.client.force_login(self.admin)
+        filtros = {"desde": _fecha(1, 0).date().isoformat(), "hasta": _fecha(3, 0).date().isoformat(),
+                   "servicio": str(self.consulta.pk)}
+        opciones = {"desde": filtros["desde"], "hasta": filtros["hasta"], "servicio": self.consulta.pk}
+
+        respuesta = self.client.get(reverse("citas_exportar"), filtros)
+        self.assertEqual(respuesta["Content-Type"], "text/csv; charset=utf-8")
+        vista = b"".join(respuesta.streaming_content).decode("utf-8")
+        salida = StringIO()
+        call_command("exportar_citas", stdout=salida, chunk_size=1, **opciones)
+        self.assertEqual(vista, salida.getvalue())
+        self.assertEqual([f[2] for f in csv.reader(StringIO(vista[1:]))][1:], ["Ana", "Eva"])
+
+        respuesta = self.client.get(reverse("citas_exportar"), {**filtros, "formato": "xlsx", "estatus": "Pendiente"})
+        self.assertIn(".xlsx", respuesta["Content-Disposition"])
+        vista = self._xlsx(BytesIO(b"".join(respuesta.streaming_content)))
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = Path(carpeta) / "citas.xlsx"
+            call_command("exportar_citas", formato="xlsx", salida=str(ruta), estatus="Pendiente",
+                         stderr=StringIO(), **opciones)
+            self.assertEqual(vista, self._xlsx(ruta))
+        self.assertEqual([f[2] for f in vista[1:]], ["Ana"])
+
+
+class ImportarTests(TestCase):
+    def setUp(self):
+        self.servicio = SERVICIO.objects.create(nombre="Consulta General", precio=300, descripcion="General")
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        self.dia = _fecha(10, 8).strftime("%d/%m/%Y")
+
+    def _csv(self, filas):
+        ruta = self.carpeta / "citas.csv"
+        with open(ruta, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Fecha", "Dueño", "Mascota", "Especie", "Motivo", "Estatus", "Servicio"])
+            writer.writerows(filas)
+        return str(ruta)
+
+    def _fila(self, hora, dueño="Ana", servicio="consulta general", estatus="Pendiente", fecha=None):
+        return [fecha or f"{self.dia} {hora}", dueño, "Fido", "perro", "revisión", estatus, servicio]
+
+    def test_rechazos_con_linea_y_motivo(self):
+        ruta = self._csv([
+            self._fila("09:00"),                          # 2
+            self._fila("09:00", fecha="31/02/2026 09:00"),  # 3
+            self._fila("10:00", servicio="Cirugía"),      # 4
+            self._fila("11:00", dueño=""),                # 5
+            self._fila("12:00", estatus="Perdida"),       # 6
+            [],                                           # 7 (vacía, no cuenta)
+            self._fila("09:15"),                          # 8: mismo bloque que la 2
+            self._fila("09:20", estatus="Cancelada"),     # 9: cancelada no ocupa
+        ])
+        resultado = importar.importar_citas(importar.leer_filas(ruta))
+        self.assertEqual(resultado["leidas"], 7)
+        self.assertEqual(resultado["importadas"], 2)
+        self.assertEqual(resultado["rechazos"], [
+            (3, "Fecha inválida."),
+            (4, "Servicio desconocido: Cirugía."),
+            (5, "Falta el nombre del dueño o de la mascota."),
+            (6, "Estatus no válido: Perdida."),
+            (8, importar.MSG_CHOQUE),
+        ])
+        cita = CITA_VETERINARIA.objects.exclude(estatus="Cancelada").get()
+        self.assertEqual((cita.nombre_dueño, cita.especie, cita.servicio_id), ("Ana", "Perro", self.servicio.pk))
+        self.assertEqual(timezone.localtime(cita.slot_inicio).strftime("%H:%M"), "09:00")
+
+    def test_choque_en_paralelo_no_tira_el_lote(self):
+        # Otra reserva entra entre la revisión en memoria y el bulk_create:
+        # se reintenta fila por fila y solo se rechaza la que choca
+        _cita(self.servicio, _fecha(10, 10)).save()
+        ruta = self._csv([self._fila("09:00", dueño="Nuevo Uno"), self._fila("10:00"),
+                          self._fila("11:00", dueño="Nuevo Dos")])
+        with mock.patch.object(importar, "_ocupados", return_value=set()):
+            resultado = importar.importar_citas(importar.leer_filas(ruta))
+        self.assertEqual(resultado["importadas"], 2)
+        self.assertEqual(resultado["rechazos"], [(3, importar.MSG_CHOQUE)])
+        nuevas = CITA_VETERINARIA.objects.filter(nombre_dueño__startswith="Nuevo").select_related("dueño", "mascota")
+        # Los dueños creados en el intento fallido se deshicieron: se vuelven a resolver
+        self.assertEqual(sorted((c.dueño.nombre, c.mascota.nombre) for c in nuevas),
+                         [("Nuevo Dos", "Fido"), ("Nuevo Uno", "Fido")])
+        connection.check_constraints()
+
+    def test_otro_error_de_integridad_no_se_disfraza_de_choque(self):
+        ruta = self._csv([self._fila("09:00")])
+        error = IntegrityError("NOT NULL constraint failed: app_cita_veterinaria.motivo")
+        with mock.patch.object(CITA_VETERINARIA.objects, "bulk_create", side_effect=error), \
+                self.assertRaises(IntegrityError):
+            importar.importar_citas(importar.leer_filas(ruta))
+
+    def test_comando_escribe_rechazos(self):
+        ruta = self._csv([self._fila("09:00"), self._fila("09:10"), self._fila("10:00", servicio="")])
+        salida_rechazos = self.carpeta / "rechazos.csv"
+        out = StringIO()
+        call_command("importar_citas", ruta, rechazos=str(salida_rechazos), batch_size=1, stdout=out)
+        self.assertIn("1 de 3 citas importadas, 2 rechazadas", out.getvalue())
+        with open(salida_rechazos, encoding="utf-8", newline="") as f:
+            self.assertEqual(list(csv.reader(f)), [
+                ["Linea", "Motivo"],
+                ["3", importar.MSG_CHOQUE],
+                ["4", "Servicio desconocido: (vacío)."],
+            ])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class AdminTests(TestCase):
+    # Las llaves únicas se calculan en save(): el admin debe mostrar el choque como error del formulario
+    @classmethod
+    def setUpTestData(cls):
+        cls.superusuario = User.objects.create_superuser("root", password="x")
+        cls.servicio = SERVICIO.objects.create(nombre="Vacunación", precio=450, descripcion="Vacuna anual")
+
+    def setUp(self):
+        self.client.force_login(self.superusuario)
+
+    def test_servicio_duplicado(self):
+        url = reverse("admin:app_servicio_add")
+        respuesta = self.client.post(url, {"nombre": "vacunacion", "precio": "100", "descripcion": "Otra"})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFormError(respuesta.context["adminform"], "nombre", MSG_SERVICIO_DUPLICADO)
+        respuesta = self.client.post(url, {"nombre": "Refuerzo", "precio": "100", "descripcion": "VACUNA  anual"})
+        self.assertFormError(respuesta.context["adminform"], "descripcion", MSG_SERVICIO_DUPLICADO)
+        # Editarse a sí mismo no choca
+        respuesta = self.client.post(reverse("admin:app_servicio_change", args=[self.servicio.pk]),
+                                     {"nombre": "VACUNACIÓN", "precio": "500", "descripcion": "Vacuna anual"})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(SERVICIO.objects.get().nombre, "VACUNACIÓN")
+
+    def _datos_cita(self, hora, **extra):
+        fecha = timezone.localtime(_fecha(1, 0))
+        return {"nombre_dueño": "Ana", "nombre_mascota": "Fido", "especie": "Perro",
+                "fecha_cita_0": fecha.date().isoformat(), "fecha_cita_1": hora, "motivo": "Revisión",
+                "estatus": "Pendiente", "servicio": self.servicio.pk, **extra}
+
+    def test_cita_en_bloque_ocupado(self):
+        _cita(self.servicio, _fecha(1, 10)).save()
+        url = reverse("admin:app_cita_veterinaria_add")
+        respuesta = self.client.post(url, self._datos_cita("10:20"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFormError(respuesta.context["adminform"], "fecha_cita", MSG_CHOQUE)
+        # Cancelada no ocupa el bloque; otro bloque tampoco choca
+        self.assertEqual(self.client.post(url, self._datos_cita("10:20", estatus="Cancelada")).status_code, 302)
+        self.assertEqual(self.client.post(url, self._datos_cita("10:30")).status_code, 302)
+        # Guardar la misma cita sin moverla no choca consigo misma
+        cita = CITA_VETERINARIA.objects.get(estatus="Pendiente", fecha_cita=_fecha(1, 10, 30))
+        respuesta = self.client.post(reverse("admin:app_cita_veterinaria_change", args=[cita.pk]),
+                                     self._datos_cita("10:30", motivo="Vacuna"))
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_dueño_y_mascota_duplicados(self):
+        ana = DUEÑO.objects.create(nombre="Ana López")
+        MASCOTA.objects.create(dueño=ana, nombre="Fido", especie="Perro")
+
+        respuesta = self.client.post(reverse("admin:app_dueño_add"), {"nombre": "ana  lopez"})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFormError(respuesta.context["adminform"], "nombre", "Ya existe un dueño con ese nombre.")
+        url = reverse("admin:app_mascota_add")
+        respuesta = self.client.post(url, {"dueño": ana.pk, "nombre": "FIDO", "especie": "perro"})
+        self.assertFormError(respuesta.context["adminform"], "nombre",
+                             "Ese dueño ya tiene una mascota con ese nombre y especie.")
+        self.assertEqual(self.client.post(url, {"dueño": ana.pk, "nombre": "Fido", "especie": "Gato"}).status_code, 302)
+
+    def test_busqueda_con_acentos(self):
+        ana = DUEÑO.objects.create(nombre="Ana López")
+        MASCOTA.objects.create(dueño=ana, nombre="Ñoño", especie="Perro")
+        for url, q, esperado in (
+            (reverse("admin:app_dueño_changelist"), "López", "Ana López"),
+            (reverse("admin:app_dueño_changelist"), "ANA lopez", "Ana López"),
+            (reverse("admin:app_mascota_changelist"), "ñoño", "Ñoño (Perro)"),
+            (reverse("admin:app_mascota_changelist"), "lópez", "Ñoño (Perro)"),  # por el dueño
+        ):
+            with self.subTest(q=q):
+                respuesta = self.client.get(url, {"q": q})
+                self.assertEqual([str(o) for o in respuesta.context["cl"].result_list], [esperado])
+
+    def test_cita_ocupada_entre_validar_y_guardar(self):
+        # Otro request ocupa el bloque después de clean(): mensaje, no un 500
+        url = reverse("admin:app_cita_veterinaria_add")
+        with mock.patch.object(CITA_VETERINARIA, "clean"):
+            _cita(self.servicio, _fecha(1, 10)).save()
+            respuesta = self.client.post(url, self._datos_cita("10:00"))
+        self.assertRedirects(respuesta, url, fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(respuesta.wsgi_request)], [MSG_CHOQUE])
+        self.assertEqual(CITA_VETERINARIA.objects.count(), 1)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class RolesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        CITA_VETERINARIA.objects.bulk_create([_cita(servicio, _fecha(dia, 10)) for dia in range(-3, 4)])
+        cls.admin = User.objects.create_user("admin", password="x")
+        cls.admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+        cls.empleado = User.objects.create_user("emp", password="x")
+        cls.empleado.groups.add(Group.objects.get_or_create(name=ROLE_EMP)[0])
+
+    def setUp(self):
+        cache.clear()
+
+    def _panel(self, user, consultas):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx, self.assertNumQueries(consultas):
+            respuesta = self.client.get(reverse("citas"))
+        self.assertEqual(respuesta.status_code, 200)
+        # Los grupos se leen una vez por request, por más que se revise el rol
+        self.assertEqual(sum("auth_user_groups" in q["sql"] for q in ctx.captured_queries), 1)
+        return respuesta
+
+    def test_consultas_del_panel_de_citas(self):
+        self.assertTrue(self._panel(self.admin, 6).context["es_admin"])
+        self.assertFalse(self._panel(self.empleado, 6).context["es_admin"])
+
+    @override_settings(ROLES_CACHE_SEGUNDOS=60)
+    def test_grupos_en_cache_entre_requests(self):
+        self._panel(self.empleado, 6)
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(reverse("citas")).status_code, 200)
+        # Cambiar los grupos invalida el cache: ahora es admin
+        self.empleado.groups.add(Group.objects.get(name=ROLE_ADMIN))
+        self.assertTrue(self._panel(self.empleado, 6).context["es_admin"])
+
+
+class DisponibilidadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        self.otro = SERVICIO.objects.create(nombre="Baño", precio=200, descripcion="Estética")
+        self.dia = _fecha(3, 8).date()
+
+    def _libres(self, **kwargs):
+        return disponibilidad.slots_libres(self.servicio.pk, self.dia, self.dia, **kwargs)[self.dia.isoformat()]
+
+    def test_ocupadas_y_canceladas(self):
+        diez = _cita(self.servicio, _fecha(3, 10))
+        diez.save()
+        _cita(self.servicio, _fecha(3, 11), estatus="Cancelada").save()
+        _cita(self.servicio, _fecha(3, 12, 15)).save()   # ocupa el bloque de las 12:00
+        _cita(self.servicio, _fecha(3, 19)).save()       # fuera del horario
+        _cita(self.otro, _fecha(3, 13)).save()           # otro servicio
+
+        mapa = disponibilidad.bitmaps(self.servicio.pk, self.dia, self.dia)[self.dia]
+        self.assertEqual(mapa, (1 << SLOTS.index("10:00")) | (1 << SLOTS.index("12:00")))
+        libres = self._libres()
+        self.assertEqual([h for h in SLOTS if h not in libres], ["10:00", "12:00"])
+        # La cita que se edita no se cuenta contra sí misma
+        self.assertIn("10:00", self._libres(excluir=diez))
+        self.assertNotIn("12:00", self._libres(excluir=diez))
+
+    def test_cache_se_invalida_al_crear_mover_y_borrar(self):
+        self.assertIn("10:00", self._libres())
+        with self.assertNumQueries(0):
+            self._libres()  # ya en cache
+
+        cita = _cita(self.servicio, _fecha(3, 10))
+        cita.save()
+        self.assertNotIn("10:00", self._libres())
+
+        cita.fecha_cita = _fecha(3, 15)
+        cita.save()
+        libres = self._libres()
+        self.assertIn("10:00", libres)
+        self.assertNotIn("15:00", libres)
+
+        # Moverla de día también libera el día de origen
+        cita.fecha_cita = _fecha(4, 9)
+        cita.save()
+        self.assertIn("15:00", self._libres())
+        self.assertNotIn("09:00", disponibilidad.slots_libres(self.servicio.pk, _fecha(4, 8).date(),
+                                                              _fecha(4, 8).date())[_fecha(4, 8).date().isoformat()])
+
+        cita.fecha_cita = _fecha(3, 16)
+        cita.save()
+        self.assertNotIn("16:00", self._libres())
+        cita.estatus = "Cancelada"
+        cita.save()
+        self.assertIn("16:00", self._libres())
+
+        otra = _cita(self.servicio, _fecha(3, 17))
+        otra.save()
+        self.assertNotIn("17:00", self._libres())
+        otra.delete()
+        self.assertIn("17:00", self._libres())
+
+    def test_cache_se_invalida_por_lotes(self):
+        self._libres()
+        CITA_VETERINARIA.objects.bulk_create([_cita(self.servicio, _fecha(3, 10))])
+        self.assertNotIn("10:00", self._libres())
+        CITA_VETERINARIA.objects.filter(servicio=self.servicio).update(fecha_cita=_fecha(3, 14))
+        libres = self._libres()
+        self.assertIn("10:00", libres)
+        self.assertNotIn("14:00", libres)
+        CITA_VETERINARIA.objects.filter(servicio=self.servicio).delete()
+        self.assertIn("14:00", self._libres())
+
+
+class PaginacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 7 citas a la misma hora (el desempate es el id) entre otras 4
+        fechas = [_fecha(5, 9)] * 2 + [_fecha(5, 10)] * 7 + [_fecha(6, 9)] * 2
+        CITA_VETERINARIA.objects.bulk_create([_cita(None, f) for f in fechas])
+        cls.qs = CITA_VETERINARIA.objects.all()
+        cls.orden = list(cls.qs.order_by("fecha_cita", "id").values_list("pk", flat=True))
+
+    def _pks(self, pagina):
+        return [c.pk for c in pagina["citas"]]
+
+    def test_ida_y_vuelta_con_fechas_repetidas(self):
+        pagina = paginar_citas(self.qs, por_pagina=3)
+        self.assertIsNone(pagina["cursor_anterior"])
+        paginas = [self._pks(pagina)]
+        while pagina["cursor_siguiente"]:
+            pagina = paginar_citas(self.qs, despues=pagina["cursor_siguiente"], por_pagina=3)
+            paginas.append(self._pks(pagina))
+        # Ninguna se repite ni se salta aunque el corte caiga dentro de las 10:00
+        self.assertEqual(sum(paginas, []), self.orden)
+        self.assertEqual([len(p) for p in paginas], [3, 3, 3, 2])
+        self.assertIsNone(pagina["cursor_siguiente"])
+
+        regreso = [self._pks(pagina)]
+        while pagina["cursor_anterior"]:
+            pagina = paginar_citas(self.qs, antes=pagina["cursor_anterior"], por_pagina=3)
+            regreso.append(self._pks(pagina))
+        self.assertEqual(sum(reversed(regreso), []), self.orden)
+        self.assertEqual(regreso[-1], self.orden[:3])
+        self.assertIsNone(pagina["cursor_anterior"])
+
+    def test_ultima_pagina_exacta(self):
+        ultima = CITA_VETERINARIA.objects.get(pk=self.orden[-4])
+        pagina = paginar_citas(self.qs, despues=codificar_cursor(ultima), por_pagina=3)
+        self.assertEqual(self._pks(pagina), self.orden[-3:])
+        self.assertIsNone(pagina["cursor_siguiente"])
+        self.assertTrue(pagina["cursor_anterior"])
+
+    def test_ultima_pagina_vacia(self):
+        # Se borró lo que venía después del cursor: se puede regresar
+        ultima = CITA_VETERINARIA.objects.get(pk=self.orden[-1])
+        cursor = codificar_cursor(ultima)
+        pagina = paginar_citas(self.qs, despues=cursor, por_pagina=3)
+        self.assertEqual(pagina["citas"], [])
+        self.assertIsNone(pagina["cursor_siguiente"])
+        self.assertEqual(pagina["cursor_anterior"], cursor)
+        regreso = paginar_citas(self.qs, antes=pagina["cursor_anterior"], por_pagina=3)
+        self.assertEqual(self._pks(regreso), self.orden[-4:-1])
+
+        primera = CITA_VETERINARIA.objects.get(pk=self.orden[0])
+        pagina = paginar_citas(self.qs, antes=codificar_cursor(primera), por_pagina=3)
+        self.assertEqual((pagina["citas"], pagina["cursor_anterior"]), ([], None))
+        self.assertEqual(pagina["cursor_siguiente"], codificar_cursor(primera))
+
+    def test_cursor_alterado(self):
+        sin_cursor = self._pks(paginar_citas(self.qs, por_pagina=3))
+        basura = [
+            "no es base64!!", "ñ", "Zm9v",  # "foo"
+            base64.urlsafe_b64encode(b"ayer|3").decode(),
+            base64.urlsafe_b64encode(b"2026-01-01T00:00:00|uno").decode(),
+            base64.urlsafe_b64encode(b"9999-12-31T23:59:59|1").decode(),
+            base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+        ]
+        for token in basura:
+            for param in ("despues", "antes"):
+                with self.subTest(token=token, param=param):
+                    self.assertIsNone(decodificar_cursor(token))
+                    pagina = paginar_citas(self.qs, por_pagina=3, **{param: token})
+                    self.assertEqual(self._pks(pagina), sin_cursor)
+
+
+class _PoolFalso:
+    # Guarda lo encargado y nunca lo termina (el dibujo "sigue en curso")
+    def __init__(self):
+        self.encargos = []
+
+    def submit(self, fn, *args):
+        self.encargos.append((fn.__name__, args))
+        return Future()
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class GraficasTests(TestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.carpeta = Path(carpeta.name)
+        ajustes = override_settings(GRAFICAS_DIR=self.carpeta)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.pool = _PoolFalso()
+        parche = mock.patch.object(graficas, "_executor", return_value=self.pool)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.addCleanup(graficas._en_curso.clear)
+        parche = mock.patch.object(graficas, "_ultima_limpieza", float("-inf"))
+        parche.start()
+        self.addCleanup(parche.stop)
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+        self.client.force_login(admin)
+
+    def test_sin_esperar_al_pool(self):
+        respuesta = self.client.get(reverse("reportes"))
+        self.assertEqual(respuesta.status_code, 200)
+        dibujos = [args for nombre, args in self.pool.encargos if nombre == "dibujar"]
+        # PNG y SVG de cada gráfica quedan encargados desde el panel
+        self.assertEqual(sorted((a[0], a[1]) for a in dibujos),
+                         sorted((t, f) for t in graficas.TIPOS for f in ("png", "svg")))
+
+        url = respuesta.context["graficas"][0]["svg"]
+        pendiente = self.client.get(url)
+        self.assertEqual(pendiente.status_code, 202)
+        self.assertEqual(pendiente["Content-Type"], "image/svg+xml")
+        self.assertIn("Retry-After", pendiente)
+        self.assertIn("no-store", pendiente["Cache-Control"])
+        self.assertEqual(len(self.pool.encargos), len(dibujos) + 1)  # + la limpieza; nada se encarga dos veces
+
+        # Ya dibujada: se sirve el archivo con cache largo
+        llave = url.split("/")[-1].split(".")[0]
+        graficas.ruta(llave, "svg").write_text("<svg/>")
+        lista = self.client.get(url)
+        self.assertEqual(lista.status_code, 200)
+        self.assertIn("immutable", lista["Cache-Control"])
+        lista.close()
+
+    def test_borrada_entre_revisar_y_abrir(self):
+        url = self.client.get(reverse("reportes")).context["graficas"][0]["png"]
+        llave = url.split("/")[-1].split(".")[0]
+        graficas.ruta(llave, "png").write_bytes(b"png")
+        encargos = len(self.pool.encargos)
+        # La limpieza la borra justo antes de abrirla: marcador, no un 500
+        with mock.patch("app.views.open", side_effect=FileNotFoundError, create=True):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertIn("Retry-After", respuesta)
+        self.assertEqual(self.pool.encargos[encargos:], [])  # ya estaba encargada desde el panel
+
+    def test_limpiar_por_edad_y_tamaño(self):
+        viejo = time_mod.time() - 10 * 86400
+        for n, (edad, tamaño) in enumerate([(viejo, 10), (time_mod.time() - 60, 600), (time_mod.time(), 600)]):
+            archivo = self.carpeta / f"g{n}.png"
+            archivo.write_bytes(b"x" * tamaño)
+            os.utime(archivo, (edad, edad))
+        (self.carpeta / "otro.txt").write_text("no es gráfica")
+
+        self.assertEqual(graficas.limpiar(self.carpeta, max_dias=7, max_bytes=1000), 2)
+        self.assertEqual(sorted(p.name for p in self.carpeta.iterdir()), ["g2.png", "otro.txt"])
+
+
+class CierreVencidasTests(TestCase):
+    def test_cierra_solo_pendientes_vencidas(self):
+        servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        CITA_VETERINARIA.objects.bulk_create(
+            [_cita(servicio, _fecha(-3 - i, 10)) for i in range(5)]
+            + [_cita(servicio, _fecha(-2, 11), estatus="Completada"), _cita(servicio, _fecha(1, 10))]
+        )
+
+        stats = cierre.cerrar_vencidas(gracia_horas=24, chunk_size=2, dry_run=True)
+        self.assertEqual((stats["candidatas"], stats["lotes"], stats["cerradas"]), (5, 3, 0))
+
+        stats = cierre.cerrar_vencidas(gracia_horas=24, chunk_size=2)
+        self.assertEqual(stats["cerradas"], 5)
+        self.assertEqual(CITA_VETERINARIA.objects.filter(estatus="No asistió").count(), 5)
+        self.assertEqual(CITA_VETERINARIA.objects.filter(estatus="Pendiente").count(), 1)
+        self.assertEqual(RESUMEN_DIARIO.objects.filter(estatus="No asistió").aggregate(n=Sum("total"))["n"], 5)
+
+
+# Benchmarks de vistas: cada vista tiene un presupuesto de consultas SQL y de
+# latencia p95 (ms) en presupuestos.json; la prueba falla si lo rebasa.
+# Las consultas se revisan siempre; la latencia depende de la máquina, así
+# que solo con BENCH_REPORTE=1, que además imprime la tabla de percentiles.
+# BENCH_REPETICIONES / BENCH_CITAS cambian el tamaño de la corrida.
+PRESUPUESTOS = Path(__file__).with_name("presupuestos.json")
+BENCH_REPORTE = bool(os.environ.get("BENCH_REPORTE"))
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class BenchmarkVistasTests(TestCase):
+    REPETICIONES = int(os.environ.get("BENCH_REPETICIONES", 15 if BENCH_REPORTE else 3))
+    CITAS = int(os.environ.get("BENCH_CITAS", 3000))
+
+    @classmethod
+    def setUpTestData(cls):
+        semilla.sembrar(servicios=40, citas=cls.CITAS, anios=1, dias_futuros=30, semilla=7)
+        cls.admin = User.objects.create_user("bench", password="x")
+        cls.admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+        cls.servicio = SERVICIO.objects.order_by("pk").first()
+        cls.cita = CITA_VETERINARIA.objects.filter(estatus="Pendiente", fecha_cita__gt=timezone.now()).first()
+        # Citas a borrar, lejos del rango sembrado
+        cls.borrables = [
+            c.pk for c in CITA_VETERINARIA.objects.bulk_create(
+                [_cita(cls.servicio, _fecha(200 + n, 9)) for n in range(cls.REPETICIONES)]
+            )
+        ]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.presupuestos = json.loads(PRESUPUESTOS.read_text(encoding="utf-8"))
+        cls.resultados = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if BENCH_REPORTE:
+            print(f"\n{'vista':<22}{'consultas':>10}{'sesión':>8}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)",
+                  file=sys.stderr)
+            for nombre, r in sorted(cls.resultados.items()):
+                print(f"{nombre:<22}{r['consultas']:>10}{r['sesion']:>8}{r['p50']:>9.1f}{r['p95']:>9.1f}"
+                      f"{r['p99']:>9.1f}", file=sys.stderr)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _medir(self, nombre, peticion, status=200):
+        tiempos, consultas, sesion = [], 0, 0
+        for i in range(self.REPETICIONES):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time_mod.perf_counter()
+                respuesta = peticion(i)
+                tiempos.append((time_mod.perf_counter() - inicio) * 1000)
+            self.assertEqual(respuesta.status_code, status, nombre)
+            consultas = max(consultas, len(ctx.captured_queries))
+            sesion = max(sesion, sum("django_session" in q["sql"] for q in ctx.captured_queries))
+
+        r = {"consultas": consultas, "sesion": sesion, "p50": _percentil(tiempos, 50),
+             "p95": _percentil(tiempos, 95), "p99": _percentil(tiempos, 99)}
+        self.resultados[nombre] = r
+        presupuesto = self.presupuestos[nombre]
+        self.assertLessEqual(consultas, presupuesto["consultas"], f"{nombre}: demasiadas consultas SQL")
+        if BENCH_REPORTE:
+            self.assertLessEqual(r["p95"], presupuesto["p95_ms"], f"{nombre}: p95 de {r['p95']:.1f} ms")
+        # Sesiones en cache y mensajes en cookie: ninguna vista toca django_session
+        self.assertEqual(sesion, 0, f"{nombre}: consultas a django_session")
+
+    def test_index(self):
+        self.client.logout()
+        self._medir("index", lambda i: self.client.get(reverse("index")))
+
+    def test_servicios(self):
+        self._medir("servicios", lambda i: self.client.get(reverse("servicios")))
+
+    def test_servicios_busqueda(self):
+        self._medir("servicios_busqueda", lambda i: self.client.get(reverse("servicios"), {"q": "consulta"}))
+
+    def test_citas_lista(self):
+        self._medir("citas_lista", lambda i: self.client.get(reverse("citas")))
+
+    def test_citas_busqueda(self):
+        self._medir("citas_busqueda", lambda i: self.client.get(reverse("citas"), {"q": "firulais"}))
+
+    def test_citas_editar(self):
+        self._medir("citas_editar", lambda i: self.client.get(reverse("citas_edit", args=[self.cita.pk])))
+
+    def test_citas_reservar(self):
+        def reservar(i):
+            dia = timezone.localdate() + timedelta(days=100 + i)
+            return self.client.post(reverse("citas"), {
+                "nombre_dueño": "Prueba Reserva", "nombre_mascota": "Fido", "especie_select": "Perro",
+                "fecha_cita": dia.isoformat(), "hora_cita": "10:00", "motivo": "Revisión",
+                "servicio": self.servicio.pk,
+            })
+        self._medir("citas_reservar", reservar, status=302)
+        self.assertEqual(CITA_VETERINARIA.objects.filter(nombre_dueño="Prueba Reserva").count(), self.REPETICIONES)
+
+    def test_citas_eliminar(self):
+        self._medir("citas_eliminar",
+                    lambda i: self.client.get(reverse("citas_eliminar", args=[self.borrables[i]])), status=302)
+        self.assertFalse(CITA_VETERINARIA.objects.filter(pk__in=self.borrables).exists())
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class MetricasTests(TestCase):
+    def test_server_timing_y_endpoint(self):
+        metricas.reiniciar()
+        respuesta = self.client.get(reverse("index"))
+        self.assertRegex(respuesta["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ consultas", tpl;dur=')
+
+        staff = User.objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        texto = self.client.get(reverse("metricas")).content.decode()
+        self.assertIn('veterinaria_request_segundos_count{vista="index"} 1', texto)
+        self.assertIn('veterinaria_sql_consultas_bucket{vista="index",le="+Inf"} 1', texto)
+
+        self.client.force_login(User.objects.create_user("normal", password="x"))
+        self.assertEqual(self.client.get(reverse("metricas")).status_code, 302)
+
+    def test_plantillas_anidadas_cuentan_una_vez(self):
+        motor = engines.all()[0]  # DjangoTemplatesMedidos
+        interna = motor.from_string("<td>{{ n }}</td>")
+        externa = motor.from_string("<tr>{{ filas }}</tr>")
+        medicion = metricas.Medicion()
+        token = metricas._medicion.set(medicion)
+        # Reloj falso: cada lectura avanza un segundo
+        try:
+            with mock.patch("app.metricas.time") as reloj:
+                reloj.perf_counter.side_effect = itertools.count().__next__
+                html = externa.render({"filas": SimpleLazyObject(lambda: interna.render({"n": 1}))})
+        finally:
+            metricas._medicion.reset(token)
+        self.assertEqual(html, "<tr><td>1</td></tr>")
+        # Solo la externa suma (de 0 a 2); antes la interna se sumaba otra vez y daba 4
+        self.assertEqual(medicion.plantillas, 2)
+        self.assertEqual(medicion.anidadas, 0)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class VistasAsyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        _cita(cls.servicio, _fecha(1, 10), nombre_mascota="Firulais").save()
+        _cita(cls.servicio, _fecha(2, 11), nombre_mascota="Luna").save()
+        cls.empleado = User.objects.create_user("emp", password="x")
+        cls.empleado.groups.add(Group.objects.get_or_create(name=ROLE_EMP)[0])
+
+    async def test_index_y_304(self):
+        respuesta = await self.async_client.get(reverse("index"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("Server-Timing", respuesta)
+        otra = await self.async_client.get(reverse("index"), headers={"if-none-match": respuesta["ETag"]})
+        self.assertEqual(otra.status_code, 304)
+
+    async def test_lista_y_disponibilidad(self):
+        await self.async_client.aforce_login(self.empleado)
+        datos = (await self.async_client.get(reverse("citas_lista"), {"q": "firu"})).json()
+        self.assertEqual([c["nombre_mascota"] for c in datos["citas"]], ["Firulais"])
+
+        dia = (timezone.localdate() + timedelta(days=1)).isoformat()
+        datos = (await self.async_client.get(
+            reverse("citas_disponibilidad"), {"servicio": self.servicio.pk, "desde": dia}
+        )).json()
+        self.assertNotIn("10:00", datos["dias"][dia])
+
+    async def test_lista_requiere_rol(self):
+        await self.async_client.aforce_login(await User.objects.acreate(username="sinrol"))
+        self.assertEqual((await self.async_client.get(reverse("citas_lista"))).status_code, 302)
+
+
+class FilasCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        self.cita = _cita(self.servicio, _fecha(1, 10))
+        self.cita.save()
+
+    def _version(self):
+        return CITA_VETERINARIA.objects.get(pk=self.cita.pk).version
+
+    def test_version_sube_con_cada_cambio(self):
+        self.assertEqual(self._version(), 1)
+        self.cita.estatus = "Cancelada"
+        self.cita.save(update_fields=["estatus"])
+        self.assertEqual(self.cita.version, 2)  # diferido: se lee de la base
+        CITA_VETERINARIA.objects.filter(pk=self.cita.pk).update(motivo="Vacuna")
+        self.assertEqual(self._version(), 3)
+        self.servicio.nombre = "Consulta general"
+        self.servicio.save()
+        self.assertEqual(self._version(), 4)
+
+    def test_filas_salen_del_cache_hasta_que_cambia_la_cita(self):
+        citas = list(CITA_VETERINARIA.objects.select_related("servicio"))
+        with self.assertTemplateUsed(template_name=fragmentos.PLANTILLA_FILA):
+            admin = fragmentos.filas_citas(citas, es_admin=True)
+        self.assertIn("btn-delete", admin[0])
+        self.assertNotIn("btn-delete", fragmentos.filas_citas(citas, es_admin=False)[0])
+
+        with self.assertTemplateNotUsed(template_name=fragmentos.PLANTILLA_FILA):
+            self.assertEqual(fragmentos.filas_citas(citas, es_admin=True), admin)
+
+        CITA_VETERINARIA.objects.filter(pk=self.cita.pk).update(estatus="Completada")
+        citas = list(CITA_VETERINARIA.objects.select_related("servicio"))
+        nuevas = fragmentos.filas_citas(citas, es_admin=True)
+        self.assertIn("Completada", nuevas[0])
+        self.assertNotIn("btn-delete", nuevas[0])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class CambiosCitasTests(TestCase):
+    def setUp(self):
+        self.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+        self.cita = _cita(self.servicio, _fecha(1, 10))
+        self.cita.save()
+
+    def _ids(self, resultado):
+        return [c.pk for c in resultado["citas"]]
+
+    def test_altas_cambios_y_bajas(self):
+        token = cambios.token_actual()
+        self.assertEqual(cambios.cambios_desde(token)["citas"], [])
+
+        nueva = _cita(self.servicio, _fecha(1, 11))
+        nueva.save()
+        resultado = cambios.cambios_desde(token)
+        self.assertEqual(self._ids(resultado), [nueva.pk])
+        token = resultado["token"]
+
+        self.cita.estatus = "Cancelada"
+        self.cita.save()
+        resultado = cambios.cambios_desde(token)
+        self.assertEqual(self._ids(resultado), [self.cita.pk])
+        token = resultado["token"]
+
+        # La baja de la cita con la mayor secuencia no debe quedar atrás del token
+        pk = self.cita.pk
+        self.cita.delete()
+        CITA_VETERINARIA.objects.filter(pk=nueva.pk).delete()
+        resultado = cambios.cambios_desde(token)
+        self.assertEqual(resultado["citas"], [])
+        self.assertEqual(resultado["borradas"], [pk, nueva.pk])
+        self.assertEqual(cambios.cambios_desde(resultado["token"])["borradas"], [])
+
+    def test_lote_con_la_misma_secuencia_se_pagina_sin_perder_filas(self):
+        token = cambios.token_actual()
+        lote = CITA_VETERINARIA.objects.bulk_create([_cita(self.servicio, _fecha(2, h)) for h in range(9, 14)])
+        vistos = []
+        while True:
+            resultado = cambios.cambios_desde(token, limite=2)
+            vistos += self._ids(resultado)
+            token = resultado["token"]
+            if not resultado["hay_mas"]:
+                break
+        self.assertEqual(vistos, sorted(c.pk for c in lote))
+
+    def test_vista_json(self):
+        admin = User.objects.create_user("adm", password="x")
+        admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+        self.client.force_login(admin)
+        token = self.client.get(reverse("citas_cambios")).json()["token"]
+        CITA_VETERINARIA.objects.filter(pk=self.cita.pk).update(estatus="Completada")
+
+        datos = self.client.get(reverse("citas_cambios"), {"since": token, "html": "1"}).json()
+        self.assertEqual([c["estatus"] for c in datos["citas"]], ["Completada"])
+        self.assertIn(f'data-cita="{self.cita.pk}"', datos["citas"][0]["html"])
+        self.assertEqual(self.client.get(reverse("citas_cambios"), {"since": "nada"}).status_code, 400)
+
+
+class BusquedaServiciosTests(TestCase):
+    def _nombres(self, q):
+        return sorted(filtrar_servicios(SERVICIO.objects.all(), q).values_list("nombre", flat=True))
+
+    def test_subcadena_prefijo_y_precio(self):
+        SERVICIO.objects.create(nombre="Consulta general", precio=300, descripcion="a")
+        SERVICIO.objects.create(nombre="Vacunación", precio=450, descripcion="b")
+        SERVICIO.objects.bulk_create([SERVICIO(nombre="Baño medicado", precio=200, descripcion="c")])
+
+        self.assertEqual(self._nombres("GENERAL"), ["Consulta general"])  # subcadena (FTS)
+        self.assertEqual(self._nombres("vacunacion"), ["Vacunación"])
+        self.assertEqual(self._nombres("ba"), ["Baño medicado"])  # corta: por prefijo
+        self.assertEqual(self._nombres("me"), [])
+        self.assertEqual(self._nombres("200-300"), ["Baño medicado", "Consulta general"])
+
+        # Renombrar (save o update) y borrar mantienen el índice
+        vacuna = SERVICIO.objects.get(nombre="Vacunación")
+        vacuna.nombre = "Desparasitación"
+        vacuna.save()
+        SERVICIO.objects.filter(nombre="Baño medicado").update(nombre="Baño antipulgas")
+        self.assertEqual(self._nombres("vacuna"), [])
+        self.assertEqual(self._nombres("parasit"), ["Desparasitación"])
+        self.assertEqual(self._nombres("pulgas"), ["Baño antipulgas"])
+        SERVICIO.objects.filter(nombre="Consulta general").delete()
+        self.assertEqual(self._nombres("general"), [])
+
+    def test_renombrar_por_lote_rehace_la_busqueda_de_citas(self):
+        vacuna = SERVICIO.objects.create(nombre="Vacunación", precio=450, descripcion="b")
+        cita = _cita(vacuna, _fecha(1, 10))
+        cita.save()
+        version = CITA_VETERINARIA.objects.get(pk=cita.pk).version
+
+        SERVICIO.objects.filter(pk=vacuna.pk).update(nombre="Desparasitación")
+        citas = CITA_VETERINARIA.objects.all()
+        self.assertEqual(list(filtrar_citas(citas, "Desparasitacion")), [cita])
+        self.assertEqual(list(filtrar_citas(citas, "vacunacion")), [])
+        # Nueva versión: la fila cacheada del panel (fragmentos.py) no se reusa
+        self.assertEqual(CITA_VETERINARIA.objects.get(pk=cita.pk).version, version + 1)
+
+    def test_no_recorre_la_tabla(self):
+        for q in ("gen", "ba"):
+            sql, params = filtrar_servicios(SERVICIO.objects.all(), q).query.sql_with_params()
+            with connection.cursor() as cur:
+                cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = " | ".join(fila[-1] for fila in cur.fetchall())
+            self.assertNotRegex(plan, rf"SCAN {SERVICIO._meta.db_table}\b", q)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class ServiciosUnicosTests(TestCase):
+    def setUp(self):
+        self.servicio = SERVICIO.objects.create(nombre="Vacunación", precio=300, descripcion="Vacuna anual.")
+
+    def test_llaves_unicas_sin_acentos_ni_mayusculas(self):
+        for campo, datos in (
+            ("nombre", {"nombre": "VACUNACION", "descripcion": "Otra"}),
+            ("descripcion", {"nombre": "Otro", "descripcion": "vacuna  anual."}),
+        ):
+            with self.assertRaises(IntegrityError) as error, transaction.atomic():
+                SERVICIO.objects.create(precio=1, **datos)
+            self.assertEqual(campo_duplicado(error.exception), campo)
+        # Sin descripción no hay llave: se pueden repetir
+        SERVICIO.objects.bulk_create([SERVICIO(nombre="A", precio=1), SERVICIO(nombre="B", precio=1)])
+        self.assertEqual(SERVICIO.objects.filter(descripcion_hash__isnull=True).count(), 2)
+
+    def test_vista_una_sola_escritura_y_mensaje(self):
+        admin = User.objects.create_user("adm", password="x")
+        admin.groups.add(Group.objects.get_or_create(name=ROLE_ADMIN)[0])
+        self.client.force_login(admin)
+        datos = {"nombre": "vacunacion", "precio": "10", "descripcion": "Nueva"}
+        r = self.client.post(reverse("servicios"), datos)
+        self.assertContains(r, "Ya existe un servicio con ese nombre o descripción.")
+        self.assertEqual(SERVICIO.objects.count(), 1)
+
+        # Editar sin cambiar el nombre no choca consigo mismo; con el de otro, sí
+        otro = SERVICIO.objects.create(nombre="Baño", precio=150, descripcion="Estética")
+        datos = {"nombre": "Vacunación", "precio": "350", "descripcion": "Vacuna anual."}
+        self.assertRedirects(self.client.post(reverse("servicios_edit", args=[self.servicio.pk]), datos),
+                             reverse("servicios"), fetch_redirect_response=False)
+        r = self.client.post(reverse("servicios_edit", args=[otro.pk]), datos)
+        self.assertContains(r, "Ya existe OTRO servicio con ese nombre o descripción.")
+        self.assertEqual(SERVICIO.objects.get(pk=otro.pk).nombre, "Baño")
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class PacientesTests(TestCase):
+    def setUp(self):
+        self.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+
+    def test_mismo_dueño_y_mascota_sin_importar_acentos_ni_mayusculas(self):
+        a = _cita(self.servicio, _fecha(1, 10), nombre_dueño="Ana  López", nombre_mascota="Fido")
+        a.save()
+        b, c = CITA_VETERINARIA.objects.bulk_create([
+            _cita(self.servicio, _fecha(1, 11), nombre_dueño="ana lopez", nombre_mascota="FIDO "),
+            _cita(self.servicio, _fecha(1, 12), nombre_dueño="Ana López", nombre_mascota="Fido", especie="Gato"),
+        ])
+        self.assertEqual(DUEÑO.objects.count(), 1)
+        self.assertEqual(b.mascota_id, a.mascota_id)
+        self.assertNotEqual(c.mascota_id, a.mascota_id)  # otra especie, otra mascota
+        self.assertEqual([x.pk for x in MASCOTA.objects.get(pk=a.mascota_id).historial()], [b.pk, a.pk])
+
+        # Cambiar el texto vuelve a enlazar (save y update)
+        a = CITA_VETERINARIA.objects.get(pk=a.pk)
+        a.nombre_mascota = "Rex"
+        a.save()
+        self.assertNotEqual(a.mascota_id, b.mascota_id)
+        CITA_VETERINARIA.objects.filter(pk=b.pk).update(nombre_mascota="Rex")
+        self.assertEqual(CITA_VETERINARIA.objects.get(pk=b.pk).mascota_id, a.mascota_id)
+
+    def test_migracion_enlaza_por_bloques(self):
+        citas = CITA_VETERINARIA.objects.bulk_create([
+            _cita(self.servicio, _fecha(1, h), nombre_dueño=d) for h, d in ((9, "Luis"), (10, "LUIS"), (11, "Sofía"))
+        ])
+        CITA_VETERINARIA.objects.update(dueño=None, mascota=None)
+        MASCOTA.objects.all().delete()
+        DUEÑO.objects.all().delete()
+
+        migracion = import_module("app.migrations.0013_enlazar_pacientes")
+        with mock.patch.object(migracion, "BLOQUE", 2):
+            migracion.enlazar_citas(django_apps, types.SimpleNamespace(connection=connection))
+        ids = dict(CITA_VETERINARIA.objects.values_list("pk", "dueño_id"))
+        self.assertEqual(ids[citas[0].pk], ids[citas[1].pk])
+        self.assertEqual(DUEÑO.objects.count(), 2)
+        self.assertFalse(CITA_VETERINARIA.objects.filter(mascota__isnull=True).exists())
+
+    def test_autocompletar(self):
+        _cita(self.servicio, _fecha(1, 10), nombre_dueño="Ángela Ruiz", nombre_mascota="Luna").save()
+        _cita(self.servicio, _fecha(1, 11), nombre_dueño="Andrés Gil", nombre_mascota="Lulú", especie="Gato").save()
+        empleado = User.objects.create_user("emp", password="x")
+        empleado.groups.add(Group.objects.get_or_create(name=ROLE_EMP)[0])
+        self.client.force_login(empleado)
+        url = reverse("citas_autocompletar")
+
+        datos = self.client.get(url, {"campo": "dueno", "q": "an"}).json()
+        self.assertEqual([r["nombre"] for r in datos["resultados"]], ["Andrés Gil", "Ángela Ruiz"])
+        datos = self.client.get(url, {"campo": "mascota", "q": "lu", "dueno": "andres gil"}).json()
+        self.assertEqual([(r["nombre"], r["especie"]) for r in datos["resultados"]], [("Lulú", "Gato")])
+        self.assertEqual(self.client.get(url, {"campo": "otro"}).status_code, 400)
+
+
+@override_settings(AUDITORIA_HILO=False)
+class AuditoriaTests(TestCase):
+    def setUp(self):
+        self.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+
+    def tearDown(self):
+        auditoria.reiniciar()
+
+    def _confirmar(self, accion):
+        # Corre los on_commit y escribe la cola (sin el hilo de fondo)
+        with self.captureOnCommitCallbacks(execute=True):
+            accion()
+        auditoria.vaciar()
+
+    def test_cambio_de_estatus_guarda_antes_y_despues(self):
+        cita = _cita(self.servicio, _fecha(2, 11))
+        self._confirmar(cita.save)
+        cita = CITA_VETERINARIA.objects.get(pk=cita.pk)
+        cita.estatus = "Completada"
+        cita.motivo = cita.motivo  # sin cambio: no aparece en el diff
+        self._confirmar(cita.save)
+
+        alta, cambio = auditoria.historial("cita_veterinaria", cita.pk).order_by("id")
+        self.assertEqual(alta.accion, "alta")
+        self.assertEqual(cambio.cambios, {"estatus": ["Pendiente", "Completada"]})
+
+        self._confirmar(lambda: CITA_VETERINARIA.objects.filter(pk=cita.pk).update(estatus="Cancelada"))
+        ultimo = auditoria.historial("cita_veterinaria", cita.pk).first()
+        self.assertEqual(ultimo.cambios, {"estatus": ["Completada", "Cancelada"]})
+
+    def test_precio_de_servicio_sin_cambios_falsos(self):
+        self._confirmar(lambda: None)
+        servicio = SERVICIO.objects.get(pk=self.servicio.pk)
+        servicio.precio = "300"  # mismo valor que Decimal("300.00")
+        self._confirmar(servicio.save)
+        self.assertFalse(auditoria.historial("servicio", servicio.pk, accion="cambio").exists())
+
+        servicio.precio = "350.50"
+        self._confirmar(servicio.save)
+        evento = auditoria.historial("servicio", servicio.pk, accion="cambio").get()
+        self.assertEqual(evento.cambios, {"precio": ["300.00", "350.50"]})
+
+    def test_baja_y_bitacora_de_solo_insercion(self):
+        cita = _cita(self.servicio, _fecha(2, 11))
+        cita.save()
+        pk = cita.pk
+        self._confirmar(cita.delete)
+        evento = auditoria.historial("cita_veterinaria", pk, accion="baja").get()
+        self.assertEqual(evento.cambios["estatus"], ["Pendiente", None])
+        with self.assertRaises(ValueError):
+            evento.save()
+
+    def test_sin_commit_no_se_audita(self):
+        cita = _cita(self.servicio, _fecha(2, 11))
+        cita.save()  # el TestCase nunca hace commit: el evento no llega a la cola
+        self.assertEqual(auditoria.estado()["pendientes"], 0)
+
+    def test_estado_sin_cola_creada(self):
+        # /metricas/ antes del primer evento del proceso: estado() crea la cola
+        with mock.patch.object(auditoria, "_cola", None):
+            self.assertEqual(auditoria.estado()["pendientes"], 0)
+
+    def test_cola_llena(self):
+        evento = {"fecha": timezone.now(), "modelo": "servicio", "objeto_id": 1,
+                  "accion": "cambio", "cambios": {}, "usuario": ""}
+        with override_settings(AUDITORIA_SI_LLENA="descartar"):
+            with mock.patch.object(auditoria, "_cola", queue.Queue(maxsize=1)), self.assertLogs("app.auditoria", "WARNING"):
+                auditoria.encolar(evento)
+                auditoria.encolar(evento)
+                self.assertEqual(auditoria.estado()["descartados"], 1)
+        with mock.patch.object(auditoria, "_cola", queue.Queue(maxsize=1)):
+            auditoria.encolar(evento)
+            auditoria.encolar(evento)  # esperar: al no haber lugar lo escribe el request
+            self.assertEqual(auditoria.estado()["sincronos"], 1)
+        self.assertEqual(AUDITORIA.objects.count(), 1)
+
+
+class CatalogoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = SERVICIO.objects.create(nombre="Consulta", precio=300, descripcion="General")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_estable_y_compartida(self):
+        v = catalogo.version()
+        etag = self.client.get(reverse("index"))["ETag"]
+        # Que expire el cache (u otro proceso con su propio cache) no cambia la versión
+        cache.clear()
+        self.assertEqual(catalogo.version(), v)
+        self.assertEqual(self.client.get(reverse("index"))["ETag"], etag)
+        self.assertEqual(self.client.get(reverse("index"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_update_y_bulk_create_renuevan_la_version(self):
+        v = catalogo.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            SERVICIO.objects.filter(pk=self.servicio.pk).update(precio=350)
+        v2 = catalogo.version()
+        self.assertGreater(v2, v)
+        with self.captureOnCommitCallbacks(execute=True):
+            SERVICIO.objects.bulk_create([SERVICIO(nombre="Baño", precio=150, descripcion="Estética")])
+        self.assertGreater(catalogo.version(), v2)
+        # Sin filas afectadas no cambia
+        v3 = catalogo.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            SERVICIO.objects.filter(pk=0).update(precio=1)
+        self.assertEqual(catalogo.version(), v3)
+
+    def test_revertir_no_cambia_la_version(self):
+        v = catalogo.version()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.servicio.precio = 400
+            self.servicio.save()
+            SERVICIO.objects.create(nombre="consulta", precio=1, descripcion="Otra")
+        cache.clear()
+        self.assertEqual(catalogo.version(), v)
+
+    def test_json_inmutable_y_hash_viejo(self):
+        _, hash_viejo = catalogo.catalogo_json()
+        url = reverse("catalogo_servicios", args=[hash_viejo])
+        self.assertIn(url, self.client.get(reverse("index")).content.decode())
+
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta["Content-Type"], "application/json; charset=utf-8")
+        self.assertIn("immutable", respuesta["Cache-Control"])
+        self.assertIn("max-age=31536000", respuesta["Cache-Control"])
+        self.assertIn("Consulta", respuesta.content.decode())
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta["ETag"])
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertIn("immutable", respuesta["Cache-Control"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SERVICIO.objects.filter(pk=self.servicio.pk).update(precio=350)
+        _, hash_actual = catalogo.catalogo_json()
+        self.assertNotEqual(hash_actual, hash_viejo)
+        for hash_pedido in (hash_viejo, "no-existe"):
+            with self.subTest(hash_pedido=hash_pedido):
+                # La redirección sí se revalida: apunta a otro contenido cuando cambie el catálogo
+                respuesta = self.client.get(reverse("catalogo_servicios", args=[hash_pedido]))
+                self.assertRedirects(respuesta, reverse("catalogo_servicios", args=[hash_actual]),
+                                     fetch_redirect_response=False)
+                self.assertNotIn("immutable", respuesta["Cache-Control"])
+                self.assertIn("max-age=0", respuesta["Cache-Control"])
+        self.assertIn("350", self.client.get(reverse("catalogo_servicios", args=[hash_actual])).content.decode())
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "sesiones": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "sesiones-pruebas"},
+})
+class SesionesTests(TestCase):
+    def test_migrar_sesiones_las_copia_al_cache(self):
+        from django.contrib.sessions.backends.cached_db import SessionStore
+        from django.contrib.sessions.backends.db import SessionStore as SessionStoreDB
+
+        vieja = SessionStoreDB()
+        vieja["_auth_user_id"] = "7"
+        vieja.create()
+        call_command("migrar_sesiones", stdout=StringIO())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(vieja.session_key)["_auth_user_id"], "7")
+
+
+class RouterTests(SimpleTestCase):
+    def test_solo_paneles_van_a_lectura(self):
+        from django.contrib.sessions.models import Session
+
+        router = LecturaRouter()
+        for modelo in (CITA_VETERINARIA, SERVICIO, RESUMEN_DIARIO):
+            self.assertEqual(router.db_for_read(modelo), LECTURA)
+        # Sesiones, usuarios, roles y auditoría leen lo último que se escribió
+        for modelo in (Session, User, Group, AUDITORIA):
+            self.assertEqual(router.db_for_read(modelo), ESCRITURA)
+        with mock.patch.object(connection, "in_atomic_block", True):
+            self.assertEqual(router.db_for_read(CITA_VETERINARIA), ESCRITURA)
+
+
+class EstaticosTests(SimpleTestCase):
+    def test_collectstatic_hash_variantes_y_gzip(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as origen, tempfile.TemporaryDirectory() as destino:
+            os.makedirs(os.path.join(origen, "img"))
+            os.makedirs(os.path.join(origen, "css"))
+            Image.new("RGB", (1200, 600), "teal").save(os.path.join(origen, "img", "foto.png"))
+            with open(os.path.join(origen, "css", "a.css"), "w") as f:
+                f.write('.x { background: url("../img/foto.png"); }\n' * 50)
+
+            with override_settings(
+                STATICFILES_DIRS=[origen], STATIC_ROOT=destino, DEBUG=False, ALLOWED_HOSTS=["testserver"],
+                STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+                ESTATICOS_ANCHOS=(300, 600, 2000), ESTATICOS_FORMATOS=("webp",),
+            ):
+                call_command("collectstatic", interactive=False, verbosity=0)
+
+                css = staticfiles_storage.stored_name("css/a.css")
+                self.assertNotEqual(css, "css/a.css")
+                self.assertTrue(os.path.exists(os.path.join(destino, css + ".gz")))
+                # El ancho mayor que el original se topa en el original
+                anchos = [a for a, _ in staticfiles_storage.variantes["img/foto.png"]["webp"]]
+                self.assertEqual(anchos, [300, 600, 1200])
+
+                html = Template(
+                    "{% load imagenes %}{% imagen_responsiva 'img/foto.png' alt='Foto' sizes='50vw' class='x' %}"
+                ).render(Context())
+                self.assertIn('<source type="image/webp"', html)
+                self.assertIn(" 600w", html)
+                self.assertIn('sizes="50vw"', html)
+                self.assertIn(staticfiles_storage.url("img/foto.png"), html)
+
+                r = self.client.get("/static/" + css, HTTP_ACCEPT_ENCODING="gzip")
+                self.assertEqual(r["Content-Encoding"], "gzip")
+                self.assertIn("immutable", r["Cache-Control"])
+                self.assertIn("Accept-Encoding", r["Vary"])
+                r = self.client.get("/static/css/a.css")
+                self.assertNotIn("immutable", r["Cache-Control"])
+                r.close()
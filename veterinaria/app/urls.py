@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import RedirectView
 from django.contrib.staticfiles.storage import staticfiles_storage
-from app import views
+from app import estaticos, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,12 +14,26 @@ urlpatterns = [
         RedirectView.as_view(url=staticfiles_storage.url("img/logo.png")),
     ),
 
+    path('catalogo/<str:hash_catalogo>.json', views.catalogo_servicios, name='catalogo_servicios'),
+
     path('servicios/', views.servicios_panel, name='servicios'), # Panel o dashboard
     path('servicios/<int:id>/', views.servicios_panel, name='servicios_edit'),  # <- NUEVA
     path('eliminar/<int:id>/', views.eliminar_servicio, name='eliminar'),
     #path('marcar-listo/<int:pk>/', views.marcar_listo, name='marcar_listo'),
 
     path('citas/', views.citas_panel, name='citas'),
+    path('citas/lista.json', views.citas_lista, name='citas_lista'),
+    path('citas/cambios.json', views.citas_cambios, name='citas_cambios'),
+    path('citas/autocompletar.json', views.citas_autocompletar, name='citas_autocompletar'),
+    path('citas/disponibilidad/', views.citas_disponibilidad, name='citas_disponibilidad'),
+    path('citas/exportar/', views.exportar_citas, name='citas_exportar'),
     path('citas/<int:id>/', views.citas_panel, name='citas_edit'),
     path('citas/<int:id>/eliminar/', views.eliminar_cita, name='citas_eliminar'),
+
+    path('reportes/', views.reportes_panel, name='reportes'),  # Tablero de ingresos (solo admin)
+    path('metricas/', views.metricas_view, name='metricas'),  # Prometheus (solo staff)
+    path('reportes/graficas/<str:tipo>/<str:llave>.<str:formato>', views.reportes_grafica, name='reportes_grafica'),
+
+    # Estáticos con hash y precomprimidos (cuando no hay nginx enfrente)
+    path('static/<path:path>', estaticos.servir, name='estaticos'),
 ]
\ No newline at end of file
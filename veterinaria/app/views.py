@@ -1,62 +1,52 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from datetime import datetime, timedelta
+from urllib.parse import urlencode
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Q
-import unicodedata
-
-from .models import SERVICIO, CITA_VETERINARIA
-
-# Grupos para los roles
-ROLE_ADMIN = "Administrador"
-ROLE_EMP = "Empleado"
-
+from django.db import IntegrityError, transaction
+
+from . import auditoria, cambios, catalogo, exportar, fragmentos, graficas, metricas, pacientes, reportes
+from .models import (
+    SERVICIO, CITA_VETERINARIA, MSG_CHOQUE, MSG_SERVICIO_DUPLICADO, campo_duplicado, choque_de_bloque,
+)
+from .paginacion import apaginar_citas, paginar_citas, leer_por_pagina
+from .busqueda import filtrar_citas, filtrar_servicios, fts_disponible
+from .roles import ROLE_ADMIN, ROLE_EMP, atiene_rol, tiene_rol
+from .disponibilidad import SLOTS, MAX_DIAS, aslots_libres, parsear_dia
+
+# Grupos para los roles (se resuelven una vez por request, ver roles.py)
 def es_admin_user(user):
-    return user.is_authenticated and user.groups.filter(name=ROLE_ADMIN).exists()
+    return tiene_rol(user, ROLE_ADMIN)
 
 def es_empleado_user(user):
-    return user.is_authenticated and user.groups.filter(name=ROLE_EMP).exists()
+    return tiene_rol(user, ROLE_EMP)
 
 def es_empleado_o_admin_user(user):
-    return es_admin_user(user) or es_empleado_user(user)
+    return tiene_rol(user, ROLE_ADMIN, ROLE_EMP)
+
+def es_staff_user(user):
+    return user.is_staff
+
+async def aes_empleado_o_admin_user(user):
+    return await atiene_rol(user, ROLE_ADMIN, ROLE_EMP)
 
 def is_admin(user):
-    return user.is_superuser or user.groups.filter(name='Administrador').exists()
+    return user.is_superuser or tiene_rol(user, ROLE_ADMIN)
 
 def is_employee_or_admin(user):
-    return user.is_superuser or user.groups.filter(name__in=['Administrador', 'Empleado']).exists()
-
-# Helpers de tiempo para el select de las horas cada media.
-def build_half_hour_slots(start="08:00", end="18:00"):
-    t0 = datetime.strptime(start, "%H:%M")
-    t1 = datetime.strptime(end, "%H:%M")
-    out = []
-    t = t0
-    while t <= t1:
-        out.append(t.strftime("%H:%M"))
-        t += timedelta(minutes=30)
-    return out
-
-def floor_to_half_hour(dt):
-    minute = 0 if dt.minute < 30 else 30
-    return dt.replace(minute=minute, second=0, microsecond=0)
-
-def ceil_to_half_hour(dt):
-    m = dt.minute
-    if m in (0, 30):
-        return dt.replace(second=0, microsecond=0)
-    if m < 30:
-        return dt.replace(minute=30, second=0, microsecond=0)
-    return (dt + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-
-# Helper para filtrar
-def strip_accents(text):
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
-    return text
+    return user.is_superuser or tiene_rol(user, ROLE_ADMIN, ROLE_EMP)
 
 # Log in 
 def login_view(request):
@@ -79,9 +69,58 @@ def logout_view(request):
     messages.info(request, 'Sesión cerrada correctamente.')
     return redirect('index')  # página principal pública
 
-def index(request):
-    servicios = SERVICIO.objects.all().order_by('nombre')
-    return render(request, 'index.html', {'servicios': servicios})
+# Página pública (async): se cachea completa por versión del catálogo y
+# responde 304 si el navegador ya tiene esa versión. Con mensajes pendientes
+# (p. ej. "Sesión cerrada") se renderiza normal para poder mostrarlos.
+# La sesión y los context processors son síncronos, por eso esas partes
+# pasan por sync_to_async.
+def _hay_mensajes(request):
+    return len(messages.get_messages(request)) > 0
+
+def _render_index(request):
+    # Los servicios y el JSON del cotizador salen de la misma consulta
+    servicios, (_, hash_catalogo) = catalogo.servicios_y_json()
+    return render_to_string('index.html', {'servicios': servicios, 'hash_catalogo': hash_catalogo}, request)
+
+async def index(request):
+    if await sync_to_async(_hay_mensajes)(request):
+        response = HttpResponse(await sync_to_async(_render_index)(request))
+        add_never_cache_headers(response)
+        return response
+
+    version = await catalogo.aversion()
+    etag = f'"index-{version}"'
+    last_modified = catalogo.ultima_modificacion(version)
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if response is None:
+        key = f"index:html:{version}"
+        html = await cache.aget(key)
+        if html is None:
+            html = await sync_to_async(_render_index)(request)
+            await cache.aset(key, html, settings.CATALOGO_CACHE_SEGUNDOS)
+        response = HttpResponse(html)
+    response.headers.setdefault("ETag", etag)
+    response.headers.setdefault("Last-Modified", http_date(last_modified.timestamp()))
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+# Catálogo para el cotizador. La URL lleva el hash del contenido, así
+# que se puede cachear "para siempre"; un hash viejo redirige al actual.
+async def catalogo_servicios(request, hash_catalogo):
+    contenido, hash_actual = await catalogo.acatalogo_json()
+    if hash_catalogo != hash_actual:
+        response = redirect("catalogo_servicios", hash_catalogo=hash_actual)
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+    etag = f'"{hash_actual}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(contenido, content_type="application/json; charset=utf-8")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    return response
 
 # Servicios
 @login_required
@@ -100,49 +139,44 @@ def servicios_panel(request, id=None):
         precio = request.POST.get("precio", "").strip()
         descripcion = request.POST.get("descripcion", "").strip().capitalize()
         
-        # No aceptar duplicados nombre o descripcion
-        duplicate_query = Q(nombre=nombre) | Q(descripcion=descripcion)
-
         form_data_para_error = request.POST # Guardamos esto por si falla
 
-        if servicio:  # Editar
-            # Buscamos si existe otro servicio (excluyendo el actual) que coincida
-            if SERVICIO.objects.filter(duplicate_query).exclude(id=servicio.id).exists():
+        # Los duplicados (nombre o descripción, sin acentos ni mayúsculas) los
+        # rechazan los índices únicos: una sola escritura, sin revisar antes
+        try:
+            with transaction.atomic():
+                if servicio:  # Editar
+                    servicio.nombre = nombre
+                    servicio.precio = precio or 0
+                    servicio.descripcion = descripcion
+                    servicio.save()
+                else: # Crear
+                    SERVICIO.objects.create(
+                        nombre=nombre,
+                        precio=precio or 0,
+                        descripcion=descripcion
+                    )
+        except IntegrityError as e:
+            if campo_duplicado(e) is None:
+                raise
+            if servicio:
                 messages.error(request, "Ya existe OTRO servicio con ese nombre o descripción.")
             else:
-                servicio.nombre = nombre
-                servicio.precio = precio or 0
-                servicio.descripcion = descripcion
-                servicio.save()
+                messages.error(request, MSG_SERVICIO_DUPLICADO)
+        else:
+            if servicio:
                 messages.success(request, "Servicio actualizado correctamente.")
-                return redirect("servicios")
-        else: # Crear
-            # Buscamos si existe otro servicio (excluyendo el actual) que coincida
-            if SERVICIO.objects.filter(duplicate_query).exists():
-                messages.error(request, "Ya existe un servicio con ese nombre o descripción.")
             else:
-                SERVICIO.objects.create(
-                    nombre=nombre,
-                    precio=precio or 0,
-                    descripcion=descripcion
-                )
                 messages.success(request, "Servicio creado correctamente.")
-                return redirect("servicios")
+            return redirect("servicios")
 
     # 1. Obtener el término de búsqueda (q) de la URL (para GET)
     q = request.GET.get('q', '').strip()
     qs = SERVICIO.objects.all().order_by("nombre")
 
     if q:
-        q_normal = strip_accents(q.lower())
-        servicios_filtrados = []
-        for s in qs:
-            nombre_normal = strip_accents(s.nombre.lower())
-            precio_normal = str(s.precio) # Convertir precio a string
-            # Buscar en nombre O en precio
-            if q_normal in nombre_normal or q_normal in precio_normal:
-                servicios_filtrados.append(s)
-        lista_servicios = servicios_filtrados 
+        # Nombre normalizado o rango de precio ("350", "<500", "200-400")
+        lista_servicios = filtrar_servicios(qs, q)
     else:
         lista_servicios = qs
 
@@ -166,8 +200,6 @@ def eliminar_servicio(request, id):
 
 @login_required
 @user_passes_test(es_empleado_o_admin_user)
-@login_required
-@user_passes_test(is_employee_or_admin)
 def citas_panel(request, id=None):
     es_admin = is_admin(request.user)
 
@@ -175,7 +207,7 @@ def citas_panel(request, id=None):
     servicios = SERVICIO.objects.all()
     ahora_local = timezone.localtime()
 
-    slots = build_half_hour_slots("08:00", "18:00")
+    slots = SLOTS
 
     if cita:
         sel_hora = timezone.localtime(cita.fecha_cita).strftime("%H:%M")
@@ -190,22 +222,33 @@ def citas_panel(request, id=None):
     solo_estatus_rol = bool(cita and (not es_admin) and not bloqueada_total)
     solo_estatus = solo_estatus_fecha or solo_estatus_rol
 
-    qs = CITA_VETERINARIA.objects.all().select_related('servicio').order_by('fecha_cita')
+    qs = CITA_VETERINARIA.objects.all().select_related('servicio')
     q = (request.GET.get('q') or '').strip()
 
     if q:
-        q_normal = strip_accents(q.lower())
-        qs = [
-            c for c in qs
-            if q_normal in strip_accents(c.nombre_dueño.lower())
-            or q_normal in strip_accents(c.nombre_mascota.lower())
-            or q_normal in strip_accents(c.especie.lower())
-            or q_normal in strip_accents(c.estatus.lower())
-            or q_normal in strip_accents(c.servicio.nombre.lower())
-        ]
+        # El filtro corre en la base (columna normalizada / FTS5)
+        qs = filtrar_citas(qs, q)
+
+    # Solo se carga una página de citas (cursor sobre fecha_cita, id), y solo
+    # si se va a renderizar: los POST que terminan en redirect no la consultan
+    por_pagina = leer_por_pagina(request.GET.get('por_pagina'))
+    pagina = SimpleLazyObject(lambda: paginar_citas(
+        qs,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=por_pagina,
+    ))
 
     ctx = {
-        "citas": qs,
+        "citas": SimpleLazyObject(lambda: pagina["citas"]),
+        # Token del feed de cambios para que la tabla se actualice sola
+        "token_cambios": SimpleLazyObject(cambios.token_actual),
+        # Filas ya renderizadas (las que no cambiaron salen del cache); perezoso
+        # para no armarlas en los POST que terminan en redirect
+        "filas": SimpleLazyObject(lambda: fragmentos.filas_citas(pagina["citas"], es_admin)),
+        "cursor_siguiente": SimpleLazyObject(lambda: pagina["cursor_siguiente"]),
+        "cursor_anterior": SimpleLazyObject(lambda: pagina["cursor_anterior"]),
+        "por_pagina": por_pagina,
         "cita": cita,
         "editando": bool(cita),
         "servicios": servicios,
@@ -332,39 +375,266 @@ def citas_panel(request, id=None):
             messages.error(request, "Estatus no válido para la fecha seleccionada.")
             return render(request, "citas.html", ctx)
 
-        slot_inicio = floor_to_half_hour(fecha_cita_dt)
-        slot_fin = slot_inicio + timedelta(minutes=30)
-        choque = CITA_VETERINARIA.objects.filter(servicio=ser_obj, fecha_cita__gte=slot_inicio, fecha_cita__lt=slot_fin)
-        if cita:
-            choque = choque.exclude(pk=cita.pk)
-        if choque.exists():
-            messages.error(request, "Ya existe una cita para ese servicio en ese bloque de 30 minutos.")
+        # El choque de bloque lo detecta la restricción única (servicio, slot_inicio)
+        try:
+            with transaction.atomic():
+                if cita:
+                    cita.nombre_dueño = nombre_dueño
+                    cita.nombre_mascota = nombre_mascota
+                    cita.especie = especie_final
+                    cita.fecha_cita = fecha_cita_dt
+                    cita.motivo = motivo
+                    cita.estatus = estatus_final
+                    cita.servicio = ser_obj
+                    cita.save()
+                else:
+                    CITA_VETERINARIA.objects.create(
+                        nombre_dueño=nombre_dueño,
+                        nombre_mascota=nombre_mascota,
+                        especie=especie_final,
+                        fecha_cita=fecha_cita_dt,
+                        motivo=motivo,
+                        estatus="Pendiente",
+                        servicio=ser_obj,
+                    )
+        except IntegrityError as e:
+            if not choque_de_bloque(e):
+                raise
+            messages.error(request, MSG_CHOQUE)
             return render(request, "citas.html", ctx)
 
         if cita:
-            cita.nombre_dueño = nombre_dueño
-            cita.nombre_mascota = nombre_mascota
-            cita.especie = especie_final
-            cita.fecha_cita = fecha_cita_dt
-            cita.motivo = motivo
-            cita.estatus = estatus_final
-            cita.servicio = ser_obj
-            cita.save()
             messages.success(request, "La cita se actualizó correctamente.")
         else:
-            CITA_VETERINARIA.objects.create(
-                nombre_dueño=nombre_dueño,
-                nombre_mascota=nombre_mascota,
-                especie=especie_final,
-                fecha_cita=fecha_cita_dt,
-                motivo=motivo,
-                estatus="Pendiente",
-                servicio=ser_obj,
-            )
             messages.success(request, "La cita se registró correctamente.")
         return redirect("citas")
     return render(request, "citas.html", ctx)
 
+def _cita_json(c):
+    return {
+        "id": c.pk,
+        "fecha": timezone.localtime(c.fecha_cita).isoformat(),
+        "nombre_dueño": c.nombre_dueño,
+        "nombre_mascota": c.nombre_mascota,
+        "especie": c.especie,
+        "motivo": c.motivo,
+        "estatus": c.estatus,
+        "servicio": c.servicio.nombre if c.servicio else None,
+        "dueño_id": c.dueño_id,
+        "mascota_id": c.mascota_id,
+    }
+
+# Listado / búsqueda de citas en JSON (async; mismo cursor que el panel)
+@login_required
+@user_passes_test(aes_empleado_o_admin_user)
+async def citas_lista(request):
+    qs = CITA_VETERINARIA.objects.select_related('servicio')
+    # Historial de una mascota o de un dueño (índices (mascota|dueño, fecha_cita))
+    for param, campo in (("mascota", "mascota_id"), ("dueno", "dueño_id")):
+        valor = request.GET.get(param) or ""
+        if valor.isdigit():
+            qs = qs.filter(**{campo: int(valor)})
+    q = (request.GET.get('q') or '').strip()
+    if q:
+        # La primera vez revisa si existe la tabla FTS (consulta síncrona)
+        await sync_to_async(fts_disponible)()
+        qs = filtrar_citas(qs, q)
+
+    pagina = await apaginar_citas(
+        qs,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=leer_por_pagina(request.GET.get('por_pagina')),
+    )
+    return JsonResponse({
+        "citas": [_cita_json(c) for c in pagina["citas"]],
+        "cursor_siguiente": pagina["cursor_siguiente"],
+        "cursor_anterior": pagina["cursor_anterior"],
+        "por_pagina": pagina["por_pagina"],
+    })
+
+# Feed de cambios de citas desde un token (async). Sin `since` solo regresa
+# el token actual; con html=1 manda además la fila <tr> de cada cita.
+@login_required
+@user_passes_test(aes_empleado_o_admin_user)
+async def citas_cambios(request):
+    since = request.GET.get("since")
+    if not since:
+        return JsonResponse({"token": await sync_to_async(cambios.token_actual)(), "citas": [], "borradas": [],
+                             "hay_mas": False})
+    try:
+        resultado = await cambios.acambios_desde(since)
+    except cambios.TokenInvalido as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    citas = [_cita_json(c) | {"version": c.version} for c in resultado["citas"]]
+    if request.GET.get("html") == "1" and citas:
+        user = await request.auser()
+        es_admin = user.is_superuser or await atiene_rol(user, ROLE_ADMIN)
+        filas = await sync_to_async(fragmentos.filas_citas)(resultado["citas"], es_admin)
+        for datos, fila in zip(citas, filas):
+            datos["html"] = fila
+    return JsonResponse({
+        "token": resultado["token"],
+        "citas": citas,
+        "borradas": resultado["borradas"],
+        "hay_mas": resultado["hay_mas"],
+    })
+
+# Sugerencias para los campos de dueño y mascota del formulario (async).
+# campo=dueno|mascota, q = lo que lleva escrito; para mascota, `dueno` limita
+# a las de ese dueño.
+@login_required
+@user_passes_test(aes_empleado_o_admin_user)
+async def citas_autocompletar(request):
+    campo = request.GET.get("campo")
+    q = request.GET.get("q") or ""
+    if campo == "dueno":
+        qs = pacientes.sugerir_dueños(q)
+    elif campo == "mascota":
+        qs = pacientes.sugerir_mascotas(q, request.GET.get("dueno") or "")
+    else:
+        return JsonResponse({"error": "Campo no válido."}, status=400)
+    return JsonResponse({"resultados": [fila async for fila in qs]})
+
+# Horarios libres por servicio (JSON para el select de horas, async)
+@login_required
+@user_passes_test(aes_empleado_o_admin_user)
+async def citas_disponibilidad(request):
+    servicio_id = request.GET.get("servicio") or ""
+    if not servicio_id.isdigit():
+        return JsonResponse({"error": "Indica un servicio."}, status=400)
+
+    hoy = timezone.localdate()
+    desde = parsear_dia(request.GET.get("desde"), hoy)
+    hasta = parsear_dia(request.GET.get("hasta"), desde)
+    if hasta < desde:
+        return JsonResponse({"error": "Rango de fechas inválido."}, status=400)
+    hasta = min(hasta, desde + timedelta(days=MAX_DIAS - 1))
+
+    excluir = None
+    excluir_id = request.GET.get("excluir") or ""
+    if excluir_id.isdigit():
+        excluir = await CITA_VETERINARIA.objects.filter(pk=excluir_id).only("servicio_id", "fecha_cita", "estatus").afirst()
+
+    return JsonResponse({
+        "servicio": int(servicio_id),
+        "dias": await aslots_libres(int(servicio_id), desde, hasta, excluir=excluir),
+    })
+
+# Exportar citas (CSV o XLSX) para contabilidad
+@login_required
+@user_passes_test(es_admin_user)
+def exportar_citas(request):
+    formato = request.GET.get("formato", "csv")
+    servicio_id = request.GET.get("servicio") or ""
+    qs = exportar.citas_para_exportar(
+        desde=parsear_dia(request.GET.get("desde")),
+        hasta=parsear_dia(request.GET.get("hasta")),
+        estatus=(request.GET.get("estatus") or "").strip() or None,
+        servicio_id=int(servicio_id) if servicio_id.isdigit() else None,
+    )
+    nombre = f"citas_{timezone.localdate():%Y%m%d}"
+
+    if formato == "xlsx":
+        # Se manda mientras se arma (ver exportar.partes_xlsx)
+        response = StreamingHttpResponse(exportar.partes_xlsx(qs), content_type=exportar.XLSX_TIPO)
+        response["Content-Disposition"] = f'attachment; filename="{nombre}.xlsx"'
+        return response
+
+    response = StreamingHttpResponse(exportar.lineas_csv(qs), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nombre}.csv"'
+    return response
+
+# Reportes (leen solo RESUMEN_DIARIO, ver reportes.py)
+def _params_reporte(request):
+    hoy = timezone.localdate()
+    desde = parsear_dia(request.GET.get("desde"), hoy.replace(day=1))
+    hasta = parsear_dia(request.GET.get("hasta"), hoy)
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    periodo = request.GET.get("periodo", "dia")
+    if periodo not in reportes.PERIODOS:
+        periodo = "dia"
+    return {"desde": desde, "hasta": hasta, "periodo": periodo}
+
+def _url_grafica(tipo, llave, formato, params):
+    url = reverse("reportes_grafica", args=[tipo, llave, formato])
+    return f"{url}?{urlencode(params)}"
+
+@login_required
+@user_passes_test(es_admin_user)
+def reportes_panel(request):
+    params = _params_reporte(request)
+    desde, hasta, periodo = params["desde"], params["hasta"], params["periodo"]
+
+    # Las gráficas se encargan al pool sin esperar; el navegador las pide después
+    lista_graficas = []
+    for tipo, titulo in graficas.TIPOS.items():
+        serie = graficas.datos(tipo, **params)
+        llave_png, _ = graficas.encargar(tipo, "png", params, serie)
+        llave_svg, _ = graficas.encargar(tipo, "svg", params, serie)
+        lista_graficas.append({
+            "titulo": titulo,
+            "png": _url_grafica(tipo, llave_png, "png", params),
+            "svg": _url_grafica(tipo, llave_svg, "svg", params),
+        })
+
+    ingresos = reportes.ingresos_por_servicio(desde, hasta, periodo)
+    ctx = {
+        "es_admin": True,
+        "desde": desde,
+        "hasta": hasta,
+        "periodo": periodo,
+        "periodos": list(reportes.PERIODOS),
+        "graficas": lista_graficas,
+        "ingresos": ingresos,
+        "total_ingresos": sum((f["ingresos"] or 0) for f in ingresos),
+        "inasistencia": reportes.inasistencia_por_especie(desde, hasta),
+        "por_estatus": reportes.totales_por_estatus(desde, hasta),
+    }
+    return render(request, "reportes.html", ctx)
+
+@login_required
+@user_passes_test(es_admin_user)
+def reportes_grafica(request, tipo, llave, formato):
+    if tipo not in graficas.TIPOS or formato not in graficas.FORMATOS or not llave.isalnum():
+        raise Http404
+    ruta = graficas.ruta(llave, formato)
+    try:
+        # Se abre de una vez: la limpieza puede borrarlo entre revisar y abrir
+        archivo = open(ruta, "rb")
+    except FileNotFoundError:
+        params = _params_reporte(request)
+        serie = graficas.datos(tipo, **params)
+        actual = graficas.clave(tipo, formato, params, serie)
+        if actual != llave:
+            # Los datos cambiaron desde que se armó la página
+            return redirect(_url_grafica(tipo, actual, formato, params))
+        # No se espera al pool: mientras se dibuja va un marcador y el
+        # navegador vuelve a preguntar (js/graficas.js)
+        graficas.encargar(tipo, formato, params, serie)
+        try:
+            archivo = open(ruta, "rb")
+        except FileNotFoundError:
+            response = HttpResponse(graficas.MARCADOR, content_type=graficas.FORMATOS["svg"], status=202)
+            response["Retry-After"] = str(settings.GRAFICAS_REINTENTAR_SEGUNDOS)
+            add_never_cache_headers(response)
+            return response
+
+    # La llave cambia con los datos: el archivo nunca cambia bajo la misma URL
+    response = FileResponse(archivo, content_type=graficas.FORMATOS[formato])
+    patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
+
+# Histogramas por vista en formato de Prometheus (de este proceso)
+@login_required
+@user_passes_test(es_staff_user)
+def metricas_view(request):
+    response = HttpResponse(metricas.texto_prometheus() + auditoria.texto_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    add_never_cache_headers(response)
+    return response
+
 # Eliminar citas
 @login_required
 @user_passes_test(es_admin_user)
@@ -3,6 +3,12 @@ ASGI config for veterinaria project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las vistas de lectura (index, catálogo, citas/lista.json y disponibilidad)
+son async: con un servidor ASGI, los clientes lentos no ocupan un hilo cada
+uno. Por ejemplo:
+
+    uvicorn veterinaria.asgi:application --workers 2 --limit-concurrency 1000
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +18,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'veterinaria.settings')
+# Bajo ASGI cada request usa su propio hilo para el ORM, así que las
+# conexiones persistentes no se reutilizan: se cierran al final del request.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -42,11 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metricas.MetricasMiddleware',  # primero: mide el request completo
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.auditoria.AuditoriaMiddleware',  # usuario que queda en la bitácora
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,10 +57,19 @@ ROOT_URLCONF = 'veterinaria.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (ver app/metricas.py)
+        'BACKEND': 'app.metricas.DjangoTemplatesMedidos',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Plantillas compiladas una sola vez por proceso (Django lo activa
+            # solo si no hay 'loaders'; aquí queda explícito). En DEBUG el
+            # autoreload de runserver vacía este cache cuando cambia una plantilla.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -74,13 +85,50 @@ WSGI_APPLICATION = 'veterinaria.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite en modo WAL: los lectores no bloquean al escritor ni al revés.
+# synchronous=NORMAL es seguro con WAL (solo se puede perder la última
+# transacción si se va la luz). BEGIN IMMEDIATE toma el candado de escritura
+# al inicio de cada atomic(), así el busy timeout espera en lugar de fallar
+# con "database is locked" al querer escribir a media transacción.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA mmap_size=268435456;"  # 256 MB
+    "PRAGMA cache_size=-20000;"    # ~20 MB
+    "PRAGMA temp_store=MEMORY;"
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # busy timeout (segundos)
+        },
+        # Conexiones persistentes (segundos); se revisan antes de reutilizarlas
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Conexión aparte, de solo lectura, para las consultas de los paneles.
+# Se activa con DB_LECTURA=1 (ver app/routers.py).
+if os.environ.get('DB_LECTURA') == '1':
+    DATABASES['lectura'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'OPTIONS': {
+            'init_command': "PRAGMA query_only=1;PRAGMA mmap_size=268435456;PRAGMA cache_size=-20000;",
+            'timeout': 20,
+        },
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['app.routers.LecturaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,6 +170,20 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'app/static'),
 ]
 
+# collectstatic deja aquí los archivos con hash, las variantes WebP/AVIF de
+# las imágenes y las copias .gz/.br (ver app/estaticos.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.estaticos.EstaticosStorage'},
+}
+
+# Anchos (px) y formatos de las variantes de imágenes para srcset
+ESTATICOS_ANCHOS = (480, 960, 1600)
+ESTATICOS_FORMATOS = ('avif', 'webp')
+ESTATICOS_CARPETAS_IMAGENES = ('img/',)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -142,3 +204,78 @@ MESSAGE_TAGS = {
 LOGIN_URL = 'login'          # nombre de tu vista de login
 LOGIN_REDIRECT_URL = 'servicios'  # a dónde enviar tras iniciar sesión
 LOGOUT_REDIRECT_URL = 'index'     # a dónde enviar tras cerrar sesión
+
+# Paginación del panel de citas
+CITAS_POR_PAGINA = 25
+CITAS_POR_PAGINA_MAX = 200
+
+# Cache de roles entre requests (segundos). 0 = solo por request.
+# Con varios procesos conviene un cache compartido para que la invalidación llegue a todos.
+ROLES_CACHE_SEGUNDOS = 0
+
+# Cache local (un solo servidor). Con varios procesos conviene el de archivos
+# para que la invalidación se comparta:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'veterinaria',
+    },
+    # Sesiones: en archivos, compartido por todos los procesos del servidor
+    # (con locmem un logout en un proceso no se vería en los demás)
+    'sesiones': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'sesiones',
+        'TIMEOUT': 60 * 60 * 24 * 14,  # = SESSION_COOKIE_AGE
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Sesiones leídas del cache: la tabla django_session solo se toca al iniciar
+# o cerrar sesión (y si el cache no tiene la sesión, que se vuelve a cargar
+# de la base). Las sesiones que ya existían siguen valiendo; para no leerlas
+# de la base la primera vez: python manage.py migrar_sesiones
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sesiones'
+
+# Mensajes flash solo en cookie (firmada): sin la sesión como respaldo, un
+# messages.success() + redirect nunca escribe en la base
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Bitácora de auditoría (app/auditoria.py): se escribe en segundo plano, en
+# lotes, desde una cola con tope. Si la cola se llena: 'esperar' (el request
+# espera AUDITORIA_ESPERA_SEGUNDOS y, si sigue llena, escribe él mismo su
+# evento) o 'descartar' (se pierde el evento y queda en /metricas/).
+AUDITORIA_ACTIVA = True
+AUDITORIA_HILO = True
+AUDITORIA_COLA_MAX = 10000
+AUDITORIA_LOTE = 500
+AUDITORIA_INTERVALO_SEGUNDOS = 1.0
+AUDITORIA_SI_LLENA = 'esperar'
+AUDITORIA_ESPERA_SEGUNDOS = 0.05
+
+# Filas renderizadas de la tabla de citas (llave: cita, versión, rol)
+FILAS_CACHE_SEGUNDOS = 3600
+
+# Vigencia del cache de la página pública y del JSON del catálogo (segundos)
+CATALOGO_CACHE_SEGUNDOS = 300
+# Cuánto recuerda cada proceso la versión del catálogo antes de volver a leerla de la base
+CATALOGO_VERSION_SEGUNDOS = 5
+
+# Gráficas de reportes: se dibujan en procesos aparte y se guardan en disco
+GRAFICAS_DIR = BASE_DIR / 'cache' / 'graficas'
+GRAFICAS_PROCESOS = 2
+# Retry-After del marcador que se manda mientras se dibuja
+GRAFICAS_REINTENTAR_SEGUNDOS = 1
+# Limpieza de GRAFICAS_DIR (en el pool, como mucho cada GRAFICAS_LIMPIEZA_SEGUNDOS):
+# se borran las de más de GRAFICAS_MAX_DIAS y, si pasa de GRAFICAS_MAX_MB, las más viejas
+GRAFICAS_LIMPIEZA_SEGUNDOS = 600
+GRAFICAS_MAX_DIAS = 7
+GRAFICAS_MAX_MB = 200
+
+# Cierre automático: horas después de la cita para marcar una Pendiente como "No asistió"
+CIERRE_GRACIA_HORAS = 24
+
+# Header Server-Timing (db / tpl / app / total) en cada respuesta
+METRICAS_SERVER_TIMING = True